@@ -0,0 +1 @@
+"""Performance benchmarks; see run.py (analyzer stages) and startup.py (cold start)"""
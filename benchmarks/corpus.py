@@ -0,0 +1,193 @@
+"""
+Deterministic synthetic corpus for the benchmarks
+Every generator takes a target size in lines and a seed and returns the
+same text for the same arguments, so timings from different commits are
+measured on identical input.
+
+Python shapes:
+- deep_nesting:   functions nested a dozen blocks deep
+- long_functions: few functions, each hundreds of statements long
+- many_imports:   a long import block used by a small body
+- huge_file:      classes, methods, comments, strings and risky calls mixed
+Other languages get one C-like (or Ruby) shape with branches, loops and
+the patterns the language detectors look for.
+"""
+import random
+from typing import Callable, Dict, List
+
+SIZES = {'small': 200, 'medium': 2000, 'large': 20000}
+
+LANGUAGES = ('javascript', 'java', 'cpp', 'go', 'rust', 'ruby', 'php')
+
+_NAMES = ('value', 'total', 'items', 'result', 'count', 'data', 'index', 'buffer', 'node', 'key')
+
+
+def _name(rng: random.Random) -> str:
+    return f'{rng.choice(_NAMES)}_{rng.randrange(1000)}'
+
+
+def deep_nesting(lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out: List[str] = []
+    n = 0
+    while len(out) < lines:
+        out.append(f'def nested_{n}(a, b, items):')
+        depth = 1
+        # CPython allows 20 statically nested loops; mixing in ifs goes deeper
+        for level in range(12):
+            pad = '    ' * depth
+            kind = level % 3
+            if kind == 0:
+                out.append(f'{pad}if a > {rng.randrange(100)}:')
+            elif kind == 1:
+                out.append(f'{pad}for i_{level} in items:')
+            else:
+                out.append(f'{pad}while b < {rng.randrange(100)}:')
+                out.append(f'{pad}    b += 1')
+            depth += 1
+        out.append('    ' * depth + 'return a + b')
+        out.append('    return None')
+        out.append('')
+        n += 1
+    return '\n'.join(out) + '\n'
+
+
+def long_functions(lines: int, seed: int = 0, body: int = 300) -> str:
+    rng = random.Random(seed)
+    out: List[str] = []
+    n = 0
+    while len(out) < lines:
+        out.append(f'def long_function_{n}(x, y, data):')
+        out.append(f'    """Function {n}"""')
+        for _ in range(body):
+            roll = rng.random()
+            if roll < 0.5:
+                out.append(f'    {_name(rng)} = x * {rng.randrange(1, 50)} + y')
+            elif roll < 0.7:
+                out.append(f'    if x > {rng.randrange(100)}:')
+                out.append(f'        y = y + {rng.randrange(10)}')
+            elif roll < 0.85:
+                out.append('    data.append(x)')
+            else:
+                out.append(f'    for item in data[:{rng.randrange(1, 5)}]:')
+                out.append('        x += item')
+        out.append('    return x + y')
+        out.append('')
+        n += 1
+    return '\n'.join(out) + '\n'
+
+
+def many_imports(lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    modules = ('os', 'sys', 're', 'json', 'math', 'typing', 'collections', 'itertools', 'functools')
+    out: List[str] = []
+    names = []
+    for i in range(max(1, lines - 4)):
+        if rng.random() < 0.5:
+            names.append(f'alias_{i}')
+            out.append(f'import {rng.choice(modules)} as alias_{i}')
+        else:
+            names.append(f'name_{i}')
+            out.append(f'from {rng.choice(modules)} import name_{i}')
+    out.append('')
+    out.append('')
+    out.append('def main():')
+    # Only some imports are used, so the unused-import rule has work to do
+    out.append(f"    return [{', '.join(names[::7])}]")
+    return '\n'.join(out) + '\n'
+
+
+def huge_file(lines: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out: List[str] = ['import os', 'import subprocess', '', '']
+    n = 0
+    while len(out) < lines:
+        out.append(f'class Service{n}:')
+        out.append(f'    """Service number {n}"""')
+        out.append('')
+        for m in range(rng.randrange(3, 8)):
+            out.append(f'    def method_{m}(self, request, x=None):')
+            out.append('        # handle the request')
+            for _ in range(rng.randrange(3, 12)):
+                roll = rng.random()
+                var = _name(rng)
+                if roll < 0.05:
+                    out.append(f'        password = "secret{rng.randrange(1000)}"')
+                elif roll < 0.08:
+                    out.append('        os.system("ls " + request)')
+                elif roll < 0.1:
+                    out.append('        value = eval(request)')
+                elif roll < 0.4:
+                    out.append(f'        {var} = "{"text " * rng.randrange(1, 25)}"')
+                elif roll < 0.6:
+                    out.append(f'        if x and x > {rng.randrange(100)}:')
+                    out.append('            return x')
+                else:
+                    out.append(f'        {var} = self.method_{m}(request, x={rng.randrange(10)})')
+            out.append('        return None')
+            out.append('')
+        n += 1
+    return '\n'.join(out) + '\n'
+
+
+PYTHON_SHAPES: Dict[str, Callable[..., str]] = {
+    'deep_nesting': deep_nesting,
+    'long_functions': long_functions,
+    'many_imports': many_imports,
+    'huge_file': huge_file,
+}
+
+# (function header, if, for, close, statement, risky statement) per language
+_C_LIKE = {
+    'javascript': ('function {name}(a, b) {{', 'if (a > {n}) {{', 'for (let i = 0; i < {n}; i++) {{', '}}',
+                   'var {var} = a * {n};', 'eval(userInput); console.log(b);'),
+    'java': ('public int {name}(int a, int b) {{', 'if (a > {n}) {{', 'for (int i = 0; i < {n}; i++) {{', '}}',
+             'int {var} = a * {n};', 'System.out.println(b); Runtime.getRuntime().exec(cmd);'),
+    'cpp': ('int {name}(int a, int b) {{', 'if (a > {n}) {{', 'for (int i = 0; i < {n}; i++) {{', '}}',
+            'int {var} = a * {n};', 'char *p = (char*)malloc(10); strcpy(p, input);'),
+    'go': ('func {name}(a int, b int) int {{', 'if a > {n} {{', 'for i := 0; i < {n}; i++ {{', '}}',
+           '{var} := a * {n}', 'fmt.Println(b); panic("boom")'),
+    'rust': ('fn {name}(a: i32, b: i32) -> i32 {{', 'if a > {n} {{', 'for i in 0..{n} {{', '}}',
+             'let {var} = a * {n};', 'let v = opt.unwrap(); unsafe {{ ptr.read() }};'),
+    'php': ('function {name}($a, $b) {{', 'if ($a > {n}) {{', 'for ($i = 0; $i < {n}; $i++) {{', '}}',
+            '${var} = $a * {n};', 'mysql_query("SELECT * FROM t WHERE id = " . $_GET["id"]);'),
+    'ruby': ('def {name}(a, b)', 'if a > {n}', '{n}.times do |i|', 'end',
+             '{var} = a * {n}', 'eval(params[:code])'),
+}
+
+
+def c_like(language: str, lines: int, seed: int = 0) -> str:
+    header, if_, for_, close, stmt, risky = _C_LIKE[language]
+    rng = random.Random(seed)
+    out: List[str] = []
+    n = 0
+    while len(out) < lines:
+        out.append(header.format(name=f'func_{n}'))
+        depth = 1
+        for _ in range(rng.randrange(2, 30)):
+            pad = '    ' * depth
+            roll = rng.random()
+            if roll < 0.15 and depth < 6:
+                out.append(pad + (if_ if rng.random() < 0.5 else for_).format(n=rng.randrange(100)))
+                depth += 1
+            elif roll < 0.25 and depth > 1:
+                depth -= 1
+                out.append('    ' * depth + close.format())
+            elif roll < 0.3:
+                out.append(pad + risky.format())
+            else:
+                out.append(pad + stmt.format(var=_name(rng), n=rng.randrange(1, 50)))
+        while depth > 0:
+            depth -= 1
+            out.append('    ' * depth + close.format())
+        out.append('')
+        n += 1
+    return '\n'.join(out) + '\n'
+
+
+def generate(shape: str, size: str, seed: int = 0) -> str:
+    """Source for a Python shape or a language name at a named size"""
+    lines = SIZES[size]
+    if shape in PYTHON_SHAPES:
+        return PYTHON_SHAPES[shape](lines, seed)
+    return c_like(shape, lines, seed)
@@ -0,0 +1,204 @@
+"""
+Analyzer benchmark suite
+Times each analysis stage on the generated corpus at parameterized sizes
+and saves the timings as JSON, so a run on one commit can be compared
+with a run on another.
+
+    python benchmarks/run.py                         # small and medium inputs
+    python benchmarks/run.py --sizes small,large -k complexity
+    python benchmarks/run.py --out after.json --compare before.json
+
+Each case is prepared outside the timed region, run once to warm up and
+then timed for --rounds rounds; min, median, mean and stdev are reported
+in milliseconds. --compare prints the median ratio per case and exits 1
+when any case is slower than the baseline by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.corpus import LANGUAGES, PYTHON_SHAPES, SIZES, generate  # noqa: E402
+
+DEFAULT_MODEL = os.path.join(ROOT, 'models', 'code_quality_model.joblib')
+
+# A case is (name, setup); setup() returns the zero-argument callable to time
+Case = Tuple[str, Callable[[], Callable[[], object]]]
+
+
+def _detect_all(code: str):
+    from code_quality_analyzer.detectors import RuleBasedDetector
+    detector = RuleBasedDetector()
+    return lambda: detector.detect_all(code)
+
+
+def _detect_all_languages(code: str, language: str):
+    from code_quality_analyzer.detectors import RuleBasedDetector
+    detector = RuleBasedDetector()
+    return lambda: detector.detect_all_languages(code, language)
+
+
+def _complexity(code: str):
+    from code_quality_analyzer.complexity_analyzer import ComplexityAnalyzer
+    analyzer = ComplexityAnalyzer()
+    return lambda: analyzer.analyze(code)
+
+
+def _security(code: str):
+    from code_quality_analyzer.security_scanner import SecurityScanner
+    scanner = SecurityScanner()
+    return lambda: scanner.scan(code)
+
+
+def _autofix(code: str):
+    from code_quality_analyzer.auto_fixer import CodeAutoFixer
+    fixer = CodeAutoFixer()
+    return lambda: fixer.fix_all(code)
+
+
+def _quality_score(code: str):
+    from code_quality_analyzer.complexity_analyzer import ComplexityAnalyzer
+    from code_quality_analyzer.detectors import RuleBasedDetector
+    from code_quality_analyzer.quality_scorer import QualityScorer
+    from code_quality_analyzer.universal_security import UniversalSecurityScanner
+    # Only the scoring is timed; its inputs are computed once here
+    smells = RuleBasedDetector().run_rules(code, RuleBasedDetector().python_rules())
+    complexity = ComplexityAnalyzer().analyze(code)
+    security = UniversalSecurityScanner(language='python').scan(code)
+    scorer = QualityScorer()
+    return lambda: scorer.calculate_score(smells, complexity, security)
+
+
+def _predict(code: str, model_path: str):
+    from code_quality_analyzer.ml_classifier import get_model_registry, predict_code_quality
+    # Load the model during setup so only classification is timed
+    get_model_registry().get(model_path)
+    return lambda: predict_code_quality(code, model_path)
+
+
+def cases(sizes: List[str], model_path: Optional[str]) -> Iterator[Case]:
+    """Every benchmark case, named stage[input-size]"""
+    for size in sizes:
+        for shape in PYTHON_SHAPES:
+            code = generate(shape, size)
+            label = f'{shape}-{size}'
+            yield f'detect_all[{label}]', lambda code=code: _detect_all(code)
+            yield f'complexity[{label}]', lambda code=code: _complexity(code)
+            yield f'security_scan[{label}]', lambda code=code: _security(code)
+            yield f'autofix[{label}]', lambda code=code: _autofix(code)
+            yield f'quality_score[{label}]', lambda code=code: _quality_score(code)
+            if model_path:
+                yield f'predict[{label}]', lambda code=code: _predict(code, model_path)
+        for language in LANGUAGES:
+            code = generate(language, size)
+            yield (f'detect_all_languages[{language}-{size}]',
+                   lambda code=code, language=language: _detect_all_languages(code, language))
+
+
+def measure(fn: Callable[[], object], rounds: int) -> Dict:
+    fn()  # warm-up: imports, regex compilation, linter start-up
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'rounds': rounds,
+        'min_ms': round(min(times), 3),
+        'median_ms': round(statistics.median(times), 3),
+        'mean_ms': round(statistics.fmean(times), 3),
+        'stdev_ms': round(statistics.stdev(times), 3) if rounds > 1 else 0.0,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sizes: List[str], rounds: int, keyword: Optional[str] = None,
+        model_path: Optional[str] = None, log=sys.stderr) -> Dict:
+    results = {}
+    for name, setup in cases(sizes, model_path):
+        if keyword and keyword not in name:
+            continue
+        results[name] = measure(setup(), rounds)
+        print(f"{name:50s} {results[name]['median_ms']:12.3f} ms", file=log)
+    return {
+        'meta': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'sizes': {size: SIZES[size] for size in sizes},
+            'rounds': rounds,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print median ratios against baseline; returns the regressed case names"""
+    regressed = []
+    print(f"{'case':50s} {'baseline':>12s} {'current':>12s} {'ratio':>7s}")
+    for name, stats in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None or not base['median_ms']:
+            continue
+        ratio = stats['median_ms'] / base['median_ms']
+        flag = ''
+        if ratio > 1 + threshold:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:50s} {base['median_ms']:12.3f} {stats['median_ms']:12.3f} {ratio:7.2f}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time every analyzer stage on a generated corpus')
+    parser.add_argument('--sizes', default='small,medium',
+                        help=f"comma-separated from {', '.join(SIZES)}")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('-k', dest='keyword', required=False, help='only cases whose name contains this')
+    parser.add_argument('--model', default=DEFAULT_MODEL,
+                        help='model for the predict cases (skipped if the file is missing)')
+    parser.add_argument('--out', required=False, help='write the results JSON here')
+    parser.add_argument('--compare', required=False, help='baseline results JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed slowdown before a case counts as regressed')
+    args = parser.parse_args(argv)
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+    model_path = args.model if args.model and os.path.exists(args.model) else None
+
+    report = run(sizes, max(1, args.rounds), args.keyword, model_path)
+    if args.out:
+        with open(args.out, 'w', encoding='utf8') as fh:
+            json.dump(report, fh, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf8') as fh:
+            baseline = json.load(fh)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Startup-time benchmark
+Measures the cold start of short CLI invocations and of web workers:
+- cli_help:      python -m code_quality_analyzer.cli --help
+- wsgi_import:   importing code_quality_analyzer.wsgi (what every worker does)
+- gunicorn_boot: gunicorn with one worker until it answers its first request
+                 (skipped when gunicorn is not installed)
+
+Each case runs in a fresh interpreter several times; min/median/max wall
+times in milliseconds are printed as JSON.
+
+    python benchmarks/startup.py [--repeat 5] [--out startup.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    # Don't let a stale bytecode cache write skew the first run
+    env.setdefault('PYTHONDONTWRITEBYTECODE', '1')
+    return env
+
+
+def time_command(argv, repeat: int):
+    """Wall time in ms of each of repeat runs of argv"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, env=_env(), stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def time_gunicorn_boot(repeat: int, timeout: float = 60):
+    """ms from spawning gunicorn (one worker) until GET / succeeds"""
+    times = []
+    for _ in range(repeat):
+        port = _free_port()
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            [shutil.which('gunicorn'), 'code_quality_analyzer.wsgi:app', '-w', '1', '-b', f'127.0.0.1:{port}'],
+            cwd=ROOT, env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1).read()
+                    break
+                except OSError:
+                    if proc.poll() is not None or time.perf_counter() - start > timeout:
+                        raise RuntimeError('gunicorn did not come up')
+                    time.sleep(0.01)
+            times.append((time.perf_counter() - start) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return times
+
+
+def summarize(times):
+    return {
+        'runs': len(times),
+        'min_ms': round(min(times), 1),
+        'median_ms': round(statistics.median(times), 1),
+        'max_ms': round(max(times), 1),
+    }
+
+
+def run(repeat: int = 5):
+    python = sys.executable
+    results = {
+        'cli_help': summarize(time_command([python, '-m', 'code_quality_analyzer.cli', '--help'], repeat)),
+        'wsgi_import': summarize(time_command([python, '-c', 'import code_quality_analyzer.wsgi'], repeat)),
+    }
+    if shutil.which('gunicorn'):
+        results['gunicorn_boot'] = summarize(time_gunicorn_boot(repeat))
+    else:
+        results['gunicorn_boot'] = {'skipped': 'gunicorn is not installed'}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--out', required=False)
+    args = parser.parse_args(argv)
+    results = run(args.repeat)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf8') as fh:
+            fh.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Request admission control
+Guards the analysis endpoints against payloads and bursts that would tie
+up every worker:
+- snippets over ADMISSION_MAX_CODE_BYTES are rejected outright (413), and
+  request bodies over ADMISSION_MAX_BODY_BYTES (by default enough to carry
+  such a snippet) are refused by werkzeug before they are read
+- each language may run at most N analyses at once (ADMISSION_CONCURRENCY,
+  overridden per language by ADMISSION_LANGUAGE_LIMITS, e.g. "rust=1,java=2")
+- a request that finds its language busy waits in a bounded queue
+  (ADMISSION_QUEUE per language) for up to ADMISSION_WAIT seconds; a full
+  queue answers 429 and a wait that times out 503, both with Retry-After
+- a snippet over ADMISSION_FAST_CODE_BYTES gets the orchestrator's fast
+  profile instead of a full analysis; so does a request that finds every
+  running slot of its language taken (unless ADMISSION_FAST_ON_QUEUE=0),
+  which runs at once in a queue place instead of waiting for a slot
+- a batch of files holds one of ADMISSION_BATCH_CONCURRENCY batch slots
+  for its whole run; when every one is taken the batch is answered 429
+
+Slots are in-process semaphores by default. With ADMISSION_DIR set they
+are lock files in that directory, held with flock(), so the limits apply
+across all gunicorn workers and a crashed worker's slots free themselves.
+"""
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # No flock() (Windows): slots stay per process
+    fcntl = None
+
+from .metrics import REGISTRY
+
+# Languages with their own slots; anything else shares the 'other' slots,
+# so arbitrary language names can't create unbounded pools (or lock files)
+LANGUAGES = ('python', 'javascript', 'typescript', 'java', 'cpp', 'csharp', 'go', 'rust', 'ruby', 'php')
+# Slot group of /api/analyze/batch; not a language, so clients can't name it
+BATCH_GROUP = 'batch'
+
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    'cqa_admission_rejections_total', 'Analysis requests turned away by admission control',
+    ('language', 'reason'))
+
+
+def body_limit(code_bytes: int) -> int:
+    """Request body size that can carry code_bytes of source: URL-encoding
+    a form (or escaping JSON) can triple it, plus room for the other fields
+    """
+    return 3 * code_bytes + 64 * 1024
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; status and retry_after describe the HTTP answer"""
+    status = 503
+    reason = 'rejected'
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PayloadTooLarge(AdmissionRejected):
+    status = 413
+    reason = 'too_large'
+
+
+class AdmissionQueueFull(AdmissionRejected):
+    status = 429
+    reason = 'queue_full'
+
+
+class AdmissionTimeout(AdmissionRejected):
+    status = 503
+    reason = 'timeout'
+
+
+class MemorySlots:
+    """N slots shared by the threads of this process"""
+
+    def __init__(self, slots: int):
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._held = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float = 0):
+        """A token for a free slot, or None if none freed up within timeout"""
+        if timeout > 0:
+            acquired = self._semaphore.acquire(timeout=timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            return None
+        with self._lock:
+            self._held += 1
+        return True
+
+    def release(self, token):
+        with self._lock:
+            self._held -= 1
+        self._semaphore.release()
+
+    def in_use(self) -> int:
+        return self._held
+
+
+class FileSlots:
+    """N slots shared by every process using the same directory"""
+
+    def __init__(self, directory: str, name: str, slots: int, poll_interval: float = 0.05):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f'{name}.{i}.lock') for i in range(slots)]
+        self.poll_interval = poll_interval
+
+    def _try_acquire(self):
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    def acquire(self, timeout: float = 0):
+        deadline = time.monotonic() + timeout
+        while True:
+            fd = self._try_acquire()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(self.poll_interval)
+
+    def release(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def in_use(self) -> int:
+        """Slots currently held by any process"""
+        held = 0
+        for path in self.paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError:
+                continue  # never created, so never held
+            try:
+                # A shared probe only conflicts with holders, not with other probes
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except OSError:
+                held += 1
+            finally:
+                os.close(fd)
+        return held
+
+
+class AdmissionController:
+    """Size limit plus per-language running slots and waiting slots"""
+
+    def __init__(self, max_code_bytes: int = 1024 * 1024, concurrency: int = 4,
+                 language_limits: Optional[Dict[str, int]] = None, queue_size: int = 8,
+                 wait_timeout: float = 10, directory: Optional[str] = None,
+                 fast_code_bytes: int = 64 * 1024, fast_on_queue: bool = True,
+                 max_body_bytes: Optional[int] = None, batch_concurrency: int = 1):
+        self.max_code_bytes = max_code_bytes
+        self.max_body_bytes = max_body_bytes or body_limit(max_code_bytes)
+        self.fast_code_bytes = fast_code_bytes
+        self.fast_on_queue = fast_on_queue
+        self.concurrency = max(1, concurrency)
+        self.batch_concurrency = max(1, batch_concurrency)
+        self.language_limits = language_limits or {}
+        self.queue_size = max(0, queue_size)
+        self.wait_timeout = wait_timeout
+        self.directory = directory if fcntl is not None else None
+        self._slots: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'AdmissionController':
+        limits = {}
+        for item in os.environ.get('ADMISSION_LANGUAGE_LIMITS', '').split(','):
+            language, _, limit = item.partition('=')
+            if language.strip() and limit.strip():
+                limits[language.strip()] = int(limit)
+        return cls(
+            max_code_bytes=int(os.environ.get('ADMISSION_MAX_CODE_BYTES', str(1024 * 1024))),
+            concurrency=int(os.environ.get('ADMISSION_CONCURRENCY', '4')),
+            language_limits=limits,
+            queue_size=int(os.environ.get('ADMISSION_QUEUE', '8')),
+            wait_timeout=float(os.environ.get('ADMISSION_WAIT', '10')),
+            directory=os.environ.get('ADMISSION_DIR') or None,
+            fast_code_bytes=int(os.environ.get('ADMISSION_FAST_CODE_BYTES', str(64 * 1024))),
+            fast_on_queue=os.environ.get('ADMISSION_FAST_ON_QUEUE', '1') != '0',
+            max_body_bytes=int(os.environ.get('ADMISSION_MAX_BODY_BYTES', '0')) or None,
+            batch_concurrency=int(os.environ.get('ADMISSION_BATCH_CONCURRENCY', '1')),
+        )
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.wait_timeout))
+
+    def _slots_for(self, name: str, slots: int):
+        with self._lock:
+            pool = self._slots.get(name)
+            if pool is None:
+                if self.directory:
+                    pool = FileSlots(self.directory, name, slots)
+                else:
+                    pool = MemorySlots(slots)
+                self._slots[name] = pool
+            return pool
+
+    def _reject(self, error: AdmissionRejected, language: str):
+        ADMISSION_REJECTIONS.inc(language=language, reason=error.reason)
+        raise error
+
+    def check_size(self, code: str, language: str = ''):
+        """Raise PayloadTooLarge for a snippet over the size limit"""
+        # Cheap bound first: a str never encodes to fewer bytes than it has characters
+        if len(code) > self.max_code_bytes or len(code.encode('utf8')) > self.max_code_bytes:
+            self._reject(PayloadTooLarge(f'Code exceeds {self.max_code_bytes} bytes'), self.slot_group(language))
+
+    def degrade_reason(self, code: str) -> Optional[str]:
+        """'large_input' if code is big enough for the fast profile on its own, else None"""
+        if self.fast_code_bytes and len(code.encode('utf8')) > self.fast_code_bytes:
+            return 'large_input'
+        return None
+
+    def _running_slots(self, language: str):
+        return self._slots_for(language, self.language_limits.get(language, self.concurrency))
+
+    def usage(self, language: str) -> Tuple[int, int]:
+        """(running, waiting) analyses of language, across processes with ADMISSION_DIR"""
+        language = self.slot_group(language)
+        waiting = self._slots_for(f'{language}.queue', self.queue_size).in_use() if self.queue_size else 0
+        return self._running_slots(language).in_use(), waiting
+
+    def slot_group(self, language: str) -> str:
+        language = (language or '').lower()
+        return language if language in LANGUAGES or language in self.language_limits else 'other'
+
+    def acquire_batch(self) -> Callable[[], None]:
+        """Take a batch slot; returns the function that gives it back (safe to call twice).
+
+        Raises AdmissionQueueFull if every slot is taken: a batch is already
+        bulk work, so it neither waits nor degrades.
+        """
+        slots = self._slots_for(BATCH_GROUP, self.batch_concurrency)
+        token = slots.acquire()
+        if token is None:
+            self._reject(AdmissionQueueFull('Too many batch analyses running', self.retry_after), BATCH_GROUP)
+        released = []
+
+        def release():
+            if not released:
+                released.append(True)
+                slots.release(token)
+        return release
+
+    @contextmanager
+    def admit(self, language: str, code: str = '') -> Iterator[Optional[str]]:
+        """Admit an analysis of code for the duration of the block; yields
+        the reason to run the fast profile ('large_input' or 'load'), or None.
+
+        Holds one of language's running slots. If every slot is taken the
+        request takes a place in the language's queue: with fast_on_queue it
+        runs the fast profile at once, otherwise it waits there for a slot.
+        Raises AdmissionQueueFull or AdmissionTimeout if it can't get either.
+        """
+        reason = self.degrade_reason(code)
+        language = self.slot_group(language)
+        running = self._running_slots(language)
+        token = running.acquire()
+        if token is None:
+            waiting = self._slots_for(f'{language}.queue', self.queue_size) if self.queue_size else None
+            ticket = waiting.acquire() if waiting is not None else None
+            if ticket is None:
+                self._reject(AdmissionQueueFull(f'Too many {language} analyses waiting',
+                                                self.retry_after), language)
+            if self.fast_on_queue:
+                # The queue place bounds how many fast analyses run at once
+                try:
+                    yield reason or 'load'
+                finally:
+                    waiting.release(ticket)
+                return
+            try:
+                token = running.acquire(self.wait_timeout)
+            finally:
+                waiting.release(ticket)
+            if token is None:
+                self._reject(AdmissionTimeout(f'Timed out waiting for a {language} analysis slot',
+                                              self.retry_after), language)
+        try:
+            yield reason
+        finally:
+            running.release(token)
+
+
+_ADMISSION = None
+_ADMISSION_LOCK = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller configured from the ADMISSION_* variables"""
+    global _ADMISSION
+    with _ADMISSION_LOCK:
+        if _ADMISSION is None:
+            _ADMISSION = AdmissionController.from_env()
+        return _ADMISSION
@@ -0,0 +1,258 @@
+"""
+Batch analysis
+Reads many files from one request - a JSON array of {path, language,
+code} objects or a zip/tar archive - and analyzes them together: Python
+files are classified in a single batched model call, then every file is
+analyzed on the batch pool - BATCH_WORKERS threads of its own, so a big
+upload can't starve the interactive analysis pool - with at most that many
+files of one batch submitted at a time. The response carries the per-file
+records and an aggregate QualityScorer summary, either as one document or
+streamed one record per file as each finishes.
+"""
+import os
+import posixpath
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .detectors import RuleBasedDetector
+from .parser import detect_language
+from .project_scanner import SKIP_DIRS, ProjectSummary, analyze_source
+from .quality_scorer import QualityScorer
+
+
+class BatchError(ValueError):
+    """The batch request is malformed"""
+    pass
+
+
+class BatchTooLarge(BatchError):
+    """The batch exceeds BATCH_MAX_FILES or BATCH_MAX_BYTES"""
+    pass
+
+
+def batch_limits() -> Tuple[int, int]:
+    """(max files, max total bytes of source) from BATCH_MAX_FILES and BATCH_MAX_BYTES"""
+    return (
+        int(os.environ.get('BATCH_MAX_FILES', '1000')),
+        int(os.environ.get('BATCH_MAX_BYTES', str(20 * 1024 * 1024))),
+    )
+
+
+def batch_workers() -> int:
+    """Threads of the batch pool, from BATCH_WORKERS"""
+    return max(1, int(os.environ.get('BATCH_WORKERS', '2')))
+
+
+_EXECUTOR = None
+_EXECUTOR_PID = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_batch_executor() -> ThreadPoolExecutor:
+    """Process-wide pool for batch files, apart from the orchestrator's pool"""
+    global _EXECUTOR, _EXECUTOR_PID
+    with _EXECUTOR_LOCK:
+        # Created again after a fork, so each gunicorn worker owns its threads
+        if _EXECUTOR is None or _EXECUTOR_PID != os.getpid():
+            _EXECUTOR = ThreadPoolExecutor(max_workers=batch_workers(), thread_name_prefix='batch')
+            _EXECUTOR_PID = os.getpid()
+        return _EXECUTOR
+
+
+class _Budget:
+    def __init__(self, max_files: int, max_bytes: int):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.files = 0
+        self.bytes = 0
+
+    def take(self, size: int):
+        self.files += 1
+        self.bytes += size
+        if self.files > self.max_files:
+            raise BatchTooLarge(f'Batch has more than {self.max_files} files')
+        if self.bytes > self.max_bytes:
+            raise BatchTooLarge(f'Batch exceeds {self.max_bytes} bytes of source')
+
+
+def files_from_json(items, limits: Optional[Tuple[int, int]] = None) -> List[Dict]:
+    """Validate a JSON files array into [{path, language, code}]"""
+    if not isinstance(items, list):
+        raise BatchError("'files' must be an array")
+    budget = _Budget(*(limits or batch_limits()))
+    files = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('code'), str):
+            raise BatchError(f'files[{i}] needs a string "code"')
+        path = str(item.get('path') or f'file{i}')
+        budget.take(len(item['code'].encode('utf8')))
+        files.append({
+            'path': path,
+            'language': item.get('language') or detect_language(path),
+            'code': item['code'],
+        })
+    return files
+
+
+def _wanted(path: str) -> bool:
+    """Same directory filter as a project scan"""
+    parts = path.split('/')[:-1]
+    return not any(part in SKIP_DIRS or part.startswith('.') for part in parts)
+
+
+def _decode(data: bytes) -> Optional[str]:
+    try:
+        # utf-8-sig drops a leading BOM, which ast.parse rejects
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return None
+
+
+def files_from_archive(fileobj: BinaryIO, limits: Optional[Tuple[int, int]] = None) -> List[Dict]:
+    """Supported source files in a zip or (optionally compressed) tar archive.
+
+    Members are size-checked before they are read, so an archive can't
+    expand past the byte limit.
+    """
+    budget = _Budget(*(limits or batch_limits()))
+    members = []  # (path, size, read)
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        archive = zipfile.ZipFile(fileobj)
+        for info in archive.infolist():
+            if not info.is_dir():
+                members.append((info.filename, info.file_size,
+                                lambda info=info: archive.open(info).read(info.file_size + 1)))
+    else:
+        fileobj.seek(0)
+        try:
+            archive = tarfile.open(fileobj=fileobj, mode='r:*')
+        except tarfile.TarError:
+            raise BatchError('Upload is not a zip or tar archive')
+        for info in archive:
+            if info.isfile():
+                members.append((info.name, info.size,
+                                lambda info=info: archive.extractfile(info).read(info.size + 1)))
+
+    files = []
+    for name, size, read in members:
+        path = posixpath.normpath(name.replace('\\', '/')).lstrip('/')
+        language = detect_language(path)
+        if path.startswith('..') or language == 'unknown' or not _wanted(path):
+            continue
+        budget.take(size)
+        data = read()
+        if len(data) > size:
+            # Header lied about the size
+            raise BatchTooLarge(f'{path} is larger than its archive entry claims')
+        code = _decode(data)
+        if code is not None:
+            files.append({'path': path, 'language': language, 'code': code})
+    return files
+
+
+def _predictions(files: List[Dict], model_path: Optional[str]) -> Dict[int, Dict]:
+    """ml_classification for every Python file, from one batched model call"""
+    if not model_path or not os.path.exists(model_path):
+        return {}
+    from .ml_classifier import predict_code_quality, predict_code_quality_batch
+    indexes = [i for i, f in enumerate(files) if f['language'] == 'python']
+    if not indexes:
+        return {}
+    try:
+        pairs = predict_code_quality_batch([files[i]['code'] for i in indexes], model_path)
+        return {i: {'label': label, 'confidence': prob} for i, (label, prob) in zip(indexes, pairs)}
+    except Exception:
+        # One unparsable file fails the whole batch; classify one by one instead
+        predictions = {}
+        for i in indexes:
+            try:
+                label, prob = predict_code_quality(files[i]['code'], model_path)
+                predictions[i] = {'label': label, 'confidence': prob}
+            except Exception as e:
+                predictions[i] = {'error': str(e)}
+        return predictions
+
+
+def _file_analyzer(files: List[Dict], model_path: Optional[str]) -> Callable[[int], Dict]:
+    """analyze(index) -> the record for files[index]; never raises"""
+    predictions = _predictions(files, model_path)
+
+    def analyze(index: int) -> Dict:
+        f = files[index]
+        if f['language'] == 'unknown':
+            return {'file': f['path'], 'language': 'unknown', 'error': 'Unsupported language'}
+        try:
+            return analyze_source(f['path'], f['code'], f['language'], RuleBasedDetector(),
+                                  prediction=predictions.get(index), detailed=True)
+        except Exception as e:
+            return {'file': f['path'], 'language': f['language'], 'error': f'{type(e).__name__}: {e}'}
+
+    return analyze
+
+
+class _BatchTotals:
+    """Project summary and quality details gathered one record at a time"""
+
+    def __init__(self):
+        self.summary = ProjectSummary()
+        self.details: List[Dict] = []
+
+    def add(self, result: Dict):
+        self.summary.add(result)
+        if 'quality_details' in result:
+            self.details.append(result['quality_details'])
+
+    def to_dict(self) -> Dict:
+        return {'summary': self.summary.to_dict(), 'quality': QualityScorer().aggregate(self.details)}
+
+
+def _completed(analyze: Callable[[int], Dict], count: int, executor: Executor,
+               window: int) -> Iterator[Tuple[int, Dict]]:
+    """(index, record) as each file finishes, with at most window files submitted at once"""
+    pending = {}
+    submitted = 0
+    try:
+        while submitted < count or pending:
+            while submitted < count and len(pending) < window:
+                pending[executor.submit(analyze, submitted)] = submitted
+                submitted += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        # Client went away mid-stream: drop the files that have not started
+        for future in pending:
+            future.cancel()
+
+
+def analyze_batch(files: List[Dict], executor: Optional[Executor] = None, model_path: Optional[str] = None,
+                  window: Optional[int] = None) -> Dict:
+    """Analyze every file on executor (the batch pool by default); per-file
+    records in input order plus summaries"""
+    results: List[Optional[Dict]] = [None] * len(files)
+    for index, result in _completed(_file_analyzer(files, model_path), len(files),
+                                    executor or get_batch_executor(), window or batch_workers()):
+        results[index] = result
+    totals = _BatchTotals()
+    for result in results:
+        totals.add(result)
+    return dict(files=results, **totals.to_dict())
+
+
+def iter_batch(files: List[Dict], executor: Optional[Executor] = None, model_path: Optional[str] = None,
+               window: Optional[int] = None) -> Iterator[Dict]:
+    """Per-file records in completion order, then one final {summary, quality} record.
+
+    Only the small quality details are kept between records, so memory
+    does not grow with the size of the reports.
+    """
+    totals = _BatchTotals()
+    for _, result in _completed(_file_analyzer(files, model_path), len(files),
+                                executor or get_batch_executor(), window or batch_workers()):
+        totals.add(result)
+        yield result
+    yield totals.to_dict()
@@ -1,10 +1,13 @@
 import argparse
 import json
 import os
+import sys
 from .parser import extract_features_from_file
 from .detectors import RuleBasedDetector
 from .ml_classifier import train_model, load_dataset, predict_code_quality, compute_quality_score
 from .suggestion_engine import suggestions_for_smells, autofix_code
+from .ndjson import NDJSONWriter
+from .sarif import SARIFWriter
 
 
 def train_command(args):
@@ -14,30 +17,95 @@ def train_command(args):
     print(f'Trained model saved at {args.model_out} with test accuracy {acc:.3f}')
 
 
-def analyze_command(args):
-    with open(args.file, 'r', encoding='utf8') as fh:
+def _record_writer(fmt, root=None):
+    """Streaming stdout writer for --format ndjson or sarif"""
+    if fmt == 'sarif':
+        return SARIFWriter(sys.stdout, root=root)
+    return NDJSONWriter(sys.stdout)
+
+
+def _analyze_file(path, model):
+    with open(path, 'r', encoding='utf8') as fh:
         src = fh.read()
     detector = RuleBasedDetector()
-    if args.file.endswith('.java'):
+    if path.endswith('.java'):
         smells = detector.detect_java_issues(src)
     else:
         smells = detector.detect_all(src)
     suggestions = suggestions_for_smells(smells)
     result = {
-        'file': args.file,
+        'file': path,
         'smells': [s.to_dict() for s in smells],
         'suggestions': suggestions,
     }
-    if args.model:
+    if model:
         try:
-            label, prob = predict_code_quality(src, args.model)
+            label, prob = predict_code_quality(src, model)
             result['ml_classification'] = {'label': label, 'confidence': prob}
             result['quality_score'] = compute_quality_score(label, prob, smells)
         except Exception as e:
-            print('Error using ML model:', e)
+            # Recorded, not printed: stdout may be an ndjson or SARIF stream
+            result['ml_classification'] = {'error': str(e)}
+            result['quality_score'] = compute_quality_score(None, None, smells)
     else:
         result['quality_score'] = compute_quality_score(None, None, smells)
-    print(json.dumps(result, indent=2))
+    return result
+
+
+def analyze_command(args):
+    if args.profile or args.pstats:
+        from .profiling import profile_call
+        result, report = profile_call(lambda: _analyze_file(args.file, args.model), pstats_path=args.pstats)
+        result['profile'] = report
+    else:
+        result = _analyze_file(args.file, args.model)
+    if args.format == 'json':
+        print(json.dumps(result, indent=2))
+    else:
+        writer = _record_writer(args.format)
+        writer.write(result)
+        writer.close()
+
+
+def analyze_dir_command(args):
+    from .project_scanner import ProjectSummary, scan_directory
+    index = None
+    if args.incremental or args.base_ref:
+        from .incremental import INDEX_FILENAME, AnalysisIndex, index_fingerprint, scan_incremental
+        index_path = args.index or os.path.join(args.dir, INDEX_FILENAME)
+        index = AnalysisIndex(index_path, index_fingerprint(args.model))
+        results = scan_incremental(args.dir, index, args.model, workers=args.workers,
+                                   chunksize=args.chunksize, base_ref=args.base_ref)
+    else:
+        results = scan_directory(args.dir, args.model, workers=args.workers, chunksize=args.chunksize)
+    summary = ProjectSummary()
+    if args.format == 'json':
+        files = []
+        for result in results:
+            summary.add(result)
+            files.append(result)
+        report = {
+            'root': args.dir,
+            'summary': summary.to_dict(),
+            'files': files,
+        }
+    else:
+        # One record per file as it finishes, then the summary; nothing is kept
+        writer = _record_writer(args.format, root=args.dir)
+        for result in results:
+            summary.add(result)
+            writer.write(result)
+        report = {'root': args.dir, 'summary': summary.to_dict()}
+    if index is not None:
+        report['incremental'] = {'analyzed': index.analyzed, 'reused': index.reused}
+        if index.warning:
+            report['incremental']['warning'] = index.warning
+            print(f'warning: {index.warning}', file=sys.stderr)
+    if args.format == 'json':
+        print(json.dumps(report, indent=2))
+    else:
+        writer.write(report)
+        writer.close()
 
 
 def autofix_command(args):
@@ -74,8 +142,23 @@ def main():
     panalyze = sub.add_parser('analyze')
     panalyze.add_argument('--file', required=True)
     panalyze.add_argument('--model', required=False)
+    panalyze.add_argument('--format', choices=('json', 'ndjson', 'sarif'), default='json')
+    panalyze.add_argument('--profile', action='store_true',
+                          help='attach the top functions and allocation sites to the result')
+    panalyze.add_argument('--pstats', required=False, help='also dump the raw profile to this .pstats file')
     panalyze.set_defaults(func=analyze_command)
 
+    panalyze_dir = sub.add_parser('analyze-dir')
+    panalyze_dir.add_argument('--dir', required=True)
+    panalyze_dir.add_argument('--model', required=False)
+    panalyze_dir.add_argument('--workers', type=int, default=None)
+    panalyze_dir.add_argument('--chunksize', type=int, default=8)
+    panalyze_dir.add_argument('--incremental', action='store_true')
+    panalyze_dir.add_argument('--index', required=False)
+    panalyze_dir.add_argument('--base-ref', required=False, dest='base_ref')
+    panalyze_dir.add_argument('--format', choices=('json', 'ndjson', 'sarif'), default='json')
+    panalyze_dir.set_defaults(func=analyze_dir_command)
+
     pserve = sub.add_parser('serve')
     pserve.add_argument('--host', default='127.0.0.1')
     pserve.add_argument('--port', type=int, default=5000)
@@ -2,11 +2,181 @@
 Code Complexity Analysis using Radon and custom metrics
 Generates complexity heatmap data
 """
-from radon.complexity import cc_visit, cc_rank
-from radon.metrics import mi_visit, mi_rank
+from radon.complexity import cc_rank
+from radon.metrics import h_visit_ast, mi_compute, mi_rank
 from radon.raw import analyze
+from radon.visitors import ComplexityVisitor
 import ast
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .heatmap import Heatmap
+
+
+# Statements that open a block for the nesting-depth metric
+TRY_NODES = (ast.Try, ast.TryStar) if hasattr(ast, 'TryStar') else (ast.Try,)
+FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+
+class CognitiveVisitor:
+    """Per-function nesting depth and cognitive complexity in one pass.
+    
+    Cognitive complexity follows the SonarSource definition: if, loops,
+    except clauses, ternaries and match statements cost 1 plus the current
+    nesting level; elif/else cost a flat 1; each run of like boolean
+    operators and each recursive call cost 1. A nested function's score
+    also counts toward the functions enclosing it.
+    
+    nesting_depth is the deepest chain of if/for/while/with/try blocks in
+    a function, with elif continuing its if rather than nesting inside it.
+    The tree is walked with an explicit stack, so each node is visited
+    once and deeply nested code can't hit the recursion limit.
+    """
+    
+    def __init__(self):
+        self.functions: List[Dict] = []
+    
+    @classmethod
+    def from_ast(cls, tree: ast.AST) -> 'CognitiveVisitor':
+        visitor = cls()
+        visitor.visit(tree)
+        return visitor
+    
+    def visit(self, tree: ast.AST):
+        # (node, nesting level, block depth, enclosing function records, flag);
+        # flag marks an If that is an elif, or a BoolOp continuing its parent's run
+        stack = [(tree, 0, 0, (), False)]
+        while stack:
+            node, nesting, blocks, scopes, flag = stack.pop()
+            children = []
+            score = 0
+            
+            for record in scopes:
+                record['nesting_depth'] = max(record['nesting_depth'], blocks - record['_base'])
+            
+            if isinstance(node, FUNCTION_NODES):
+                record = {
+                    'name': node.name,
+                    'line': node.lineno,
+                    'nesting_depth': 0,
+                    'cognitive_complexity': 0,
+                    '_base': blocks,
+                }
+                self.functions.append(record)
+                children += [(child, nesting, blocks, False) for child in node.decorator_list]
+                children.append((node.args, nesting, blocks, False))
+                if node.returns:
+                    children.append((node.returns, nesting, blocks, False))
+                # A function defined inside another one is a nesting level of its parent
+                body_nesting = nesting + 1 if scopes else 0
+                children += [(child, body_nesting, blocks, False) for child in node.body]
+                scopes = scopes + (record,)
+            elif isinstance(node, ast.If):
+                if not flag:
+                    score += 1 + nesting
+                children.append((node.test, nesting, blocks, False))
+                children += [(child, nesting + 1, blocks + 1, False) for child in node.body]
+                orelse = node.orelse
+                # An elif's If starts in the same column as the if it continues
+                if (len(orelse) == 1 and isinstance(orelse[0], ast.If)
+                        and orelse[0].col_offset == node.col_offset and orelse[0].lineno != node.lineno):
+                    score += 1
+                    children.append((orelse[0], nesting, blocks, True))
+                elif orelse:
+                    score += 1
+                    children += [(child, nesting + 1, blocks + 1, False) for child in orelse]
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.While)):
+                score += 1 + nesting
+                if isinstance(node, ast.While):
+                    children.append((node.test, nesting, blocks, False))
+                else:
+                    children += [(node.target, nesting, blocks, False), (node.iter, nesting, blocks, False)]
+                children += [(child, nesting + 1, blocks + 1, False) for child in node.body]
+                if node.orelse:
+                    score += 1
+                    children += [(child, nesting + 1, blocks + 1, False) for child in node.orelse]
+            elif isinstance(node, TRY_NODES):
+                # try and finally add no complexity; each except clause does
+                children += [(child, nesting, blocks + 1, False) for child in node.body]
+                for handler in node.handlers:
+                    score += 1 + nesting
+                    if handler.type is not None:
+                        children.append((handler.type, nesting, blocks, False))
+                    children += [(child, nesting + 1, blocks + 1, False) for child in handler.body]
+                children += [(child, nesting, blocks + 1, False) for child in node.orelse + node.finalbody]
+            elif isinstance(node, (ast.With, ast.AsyncWith)):
+                children += [(item, nesting, blocks, False) for item in node.items]
+                children += [(child, nesting, blocks + 1, False) for child in node.body]
+            elif isinstance(node, ast.IfExp):
+                score += 1 + nesting
+                children += [(child, nesting + 1, blocks, False) for child in (node.test, node.body, node.orelse)]
+            elif isinstance(node, ast.Lambda):
+                children += [(node.args, nesting, blocks, False), (node.body, nesting + 1, blocks, False)]
+            elif isinstance(node, ast.BoolOp):
+                # "a and b and c" is one run of operators; "a and b or c" is two
+                if not flag:
+                    score += 1
+                children += [
+                    (value, nesting, blocks, isinstance(value, ast.BoolOp) and type(value.op) is type(node.op))
+                    for value in node.values
+                ]
+            elif hasattr(ast, 'Match') and isinstance(node, ast.Match):
+                score += 1 + nesting
+                children.append((node.subject, nesting, blocks, False))
+                for case in node.cases:
+                    children.append((case.pattern, nesting, blocks, False))
+                    if case.guard is not None:
+                        children.append((case.guard, nesting, blocks, False))
+                    children += [(child, nesting + 1, blocks + 1, False) for child in case.body]
+            else:
+                if isinstance(node, ast.Call) and scopes and self._is_recursive(node, scopes[-1]['name']):
+                    scopes[-1]['cognitive_complexity'] += 1
+                children += [(child, nesting, blocks, False) for child in ast.iter_child_nodes(node)]
+            
+            if score:
+                for record in scopes:
+                    record['cognitive_complexity'] += score
+            # Reversed so the stack pops children in source order
+            for child, child_nesting, child_blocks, child_flag in reversed(children):
+                stack.append((child, child_nesting, child_blocks, scopes, child_flag))
+        
+        for record in self.functions:
+            del record['_base']
+    
+    @staticmethod
+    def _is_recursive(call: ast.Call, name: str) -> bool:
+        func = call.func
+        if isinstance(func, ast.Name):
+            return func.id == name
+        # self.method(...) or cls.method(...) inside the method itself
+        return (isinstance(func, ast.Attribute) and func.attr == name
+                and isinstance(func.value, ast.Name) and func.value.id in ('self', 'cls'))
+
+
+class ComplexityContext:
+    """Everything the sub-metrics need from one source, computed once.
+    
+    The AST is parsed once and shared by radon's complexity visitor, the
+    Halstead visitor and the cognitive visitor; radon's raw metrics
+    tokenize the source once. A source that doesn't parse leaves tree,
+    visitor and blocks unset, and metrics that need them fall back.
+    """
+    
+    def __init__(self, code: str):
+        self.code = code
+        self.tree: Optional[ast.AST] = None
+        self.visitor: Optional[ComplexityVisitor] = None
+        self.blocks = []
+        self.raw = None
+        try:
+            self.tree = ast.parse(code)
+            self.visitor = ComplexityVisitor.from_ast(self.tree)
+            self.blocks = self.visitor.blocks
+        except (SyntaxError, ValueError):
+            pass
+        try:
+            self.raw = analyze(code)
+        except Exception:
+            pass
 
 
 class ComplexityAnalyzer:
@@ -14,22 +184,22 @@ class ComplexityAnalyzer:
     
     def analyze(self, code: str) -> Dict:
         """Comprehensive complexity analysis"""
+        ctx = ComplexityContext(code)
         results = {
-            'cyclomatic': self._cyclomatic_complexity(code),
-            'cognitive': self._cognitive_complexity(code),
-            'maintainability': self._maintainability_index(code),
-            'raw_metrics': self._raw_metrics(code),
-            'heatmap': self._generate_heatmap(code)
+            'cyclomatic': self._cyclomatic_complexity(ctx),
+            'cognitive': self._cognitive_complexity(ctx),
+            'maintainability': self._maintainability_index(ctx),
+            'raw_metrics': self._raw_metrics(ctx),
+            'heatmap_rle': self._generate_heatmap(ctx)
         }
         return results
     
-    def _cyclomatic_complexity(self, code: str) -> List[Dict]:
+    def _cyclomatic_complexity(self, ctx: ComplexityContext) -> List[Dict]:
         """Calculate cyclomatic complexity for all functions"""
         try:
-            complexity_data = cc_visit(code)
             results = []
             
-            for item in complexity_data:
+            for item in ctx.blocks:
                 results.append({
                     'name': item.name,
                     'line': item.lineno,
@@ -42,37 +212,35 @@ class ComplexityAnalyzer:
         except:
             return []
     
-    def _cognitive_complexity(self, code: str) -> Dict:
-        """Calculate cognitive complexity (custom metric)"""
+    def _cognitive_complexity(self, ctx: ComplexityContext) -> Dict:
+        """Calculate cognitive complexity and nesting depth per function"""
+        if ctx.tree is None:
+            return {'max_nesting': 0, 'average_nesting': 0, 'max_cognitive': 0, 'functions': []}
         try:
-            tree = ast.parse(code)
-            total_nesting = 0
-            max_nesting = 0
-            functions = []
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    nesting = self._calculate_nesting_depth(node)
-                    functions.append({
-                        'name': node.name,
-                        'line': node.lineno,
-                        'nesting_depth': nesting
-                    })
-                    max_nesting = max(max_nesting, nesting)
-                    total_nesting += nesting
+            functions = CognitiveVisitor.from_ast(ctx.tree).functions
+            nesting = [f['nesting_depth'] for f in functions]
             
             return {
-                'max_nesting': max_nesting,
-                'average_nesting': total_nesting / len(functions) if functions else 0,
+                'max_nesting': max(nesting, default=0),
+                'average_nesting': sum(nesting) / len(functions) if functions else 0,
+                'max_cognitive': max((f['cognitive_complexity'] for f in functions), default=0),
                 'functions': functions
             }
         except:
-            return {'max_nesting': 0, 'average_nesting': 0, 'functions': []}
+            return {'max_nesting': 0, 'average_nesting': 0, 'max_cognitive': 0, 'functions': []}
     
-    def _maintainability_index(self, code: str) -> Dict:
+    def _maintainability_index(self, ctx: ComplexityContext) -> Dict:
         """Calculate maintainability index"""
         try:
-            mi_score = mi_visit(code, multi=True)
+            # Same parameters as radon's mi_visit(code, multi=True), from the shared context
+            raw = ctx.raw
+            comments = (raw.comments + raw.multi) / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+            mi_score = mi_compute(
+                h_visit_ast(ctx.tree).total.volume,
+                ctx.visitor.total_complexity,
+                raw.lloc,
+                comments,
+            )
             rank = mi_rank(mi_score)
             
             return {
@@ -83,10 +251,10 @@ class ComplexityAnalyzer:
         except:
             return {'score': 0, 'rank': 'C', 'classification': 'Poor'}
     
-    def _raw_metrics(self, code: str) -> Dict:
+    def _raw_metrics(self, ctx: ComplexityContext) -> Dict:
         """Get raw code metrics"""
         try:
-            metrics = analyze(code)
+            metrics = ctx.raw
             return {
                 'loc': metrics.loc,  # Lines of code
                 'lloc': metrics.lloc,  # Logical lines of code
@@ -99,21 +267,22 @@ class ComplexityAnalyzer:
         except:
             return {}
     
-    def _generate_heatmap(self, code: str) -> List[Dict]:
-        """Generate complexity heatmap data for visualization"""
-        heatmap = []
+    def _generate_heatmap(self, ctx: ComplexityContext) -> Dict:
+        """Generate complexity heatmap data for visualization, run-length encoded"""
+        heatmap = Heatmap()
+        
+        # No heatmap for code that doesn't parse
+        if ctx.tree is None:
+            return heatmap.to_dict()
         
         try:
-            lines = code.split('\n')
-            complexity_items = cc_visit(code)
+            lines = ctx.code.split('\n')
             
             # Create line-by-line complexity map
             complexity_map = {}
-            for item in complexity_items:
+            for item in ctx.blocks:
                 complexity_map[item.lineno] = item.complexity
             
-            tree = ast.parse(code)
-            
             for i, line in enumerate(lines, 1):
                 # Calculate line score based on multiple factors
                 score = 0
@@ -144,27 +313,11 @@ class ComplexityAnalyzer:
                 elif indent > 8:
                     score += 1
                 
-                heatmap.append({
-                    'line': i,
-                    'score': score,
-                    'level': self._score_to_level(score),
-                    'issues': issues
-                })
+                heatmap.append(score, issues)
             
-            return heatmap
+            return heatmap.to_dict()
         except:
-            return []
-    
-    def _calculate_nesting_depth(self, node, depth=0) -> int:
-        """Calculate maximum nesting depth in a function"""
-        max_depth = depth
-        
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.For, ast.While, ast.With, ast.Try)):
-                child_depth = self._calculate_nesting_depth(child, depth + 1)
-                max_depth = max(max_depth, child_depth)
-        
-        return max_depth
+            return Heatmap().to_dict()
     
     def _classify_complexity(self, score: int) -> str:
         """Classify cyclomatic complexity score"""
@@ -188,17 +341,6 @@ class ComplexityAnalyzer:
         }
         return classifications.get(rank, 'Unknown')
     
-    def _score_to_level(self, score: int) -> str:
-        """Convert numerical score to severity level"""
-        if score == 0:
-            return 'clean'
-        elif score <= 2:
-            return 'low'
-        elif score <= 4:
-            return 'medium'
-        else:
-            return 'high'
-    
     def get_quality_score(self, analysis: Dict) -> float:
         """Calculate overall quality score (0-100) based on complexity metrics"""
         try:
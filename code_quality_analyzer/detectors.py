@@ -1,11 +1,30 @@
 import ast
 import re
 import os
+from collections import deque
 from typing import List, Dict, Optional
-from .parser import PythonFeatureExtractor, detect_language
+from .linter_pool import LinterDaemon, linter_timeout
+from .metrics import LINTER_FAILURES, span
+from .parser import detect_language
+from .source_buffer import SourceBuffer
 import subprocess
 import tempfile
 
+# Languages whose full detection runs flake8/pylint or an external linter,
+# so detect_fast only covers part of it
+LINTED_LANGUAGES = frozenset(['python', 'py', 'javascript', 'typescript', 'js', 'ts', 'java',
+                              'cpp', 'c', 'csharp', 'c++', 'go', 'rust', 'ruby', 'php'])
+
+# Resident servers for the linters that have one; used when installed
+ESLINT_DAEMON = LinterDaemon(
+    'eslint_d',
+    lambda path: ['eslint_d', path, '--format', 'json', '--no-eslintrc'],
+    ['eslint_d', 'stop'])
+RUBOCOP_DAEMON = LinterDaemon(
+    'rubocop',
+    lambda path: ['rubocop', '--server', '--format', 'json', path],
+    ['rubocop', '--stop-server'])
+
 
 class CodeSmell:
     def __init__(self, kind: str, message: str, lineno: int = None):
@@ -21,166 +40,301 @@ class CodeSmell:
         }
 
 
-class RuleBasedDetector:
-    def __init__(self, max_function_length=40, max_nesting=4):
-        self.max_function_length = max_function_length
+class PythonRule:
+    """Base class for AST rules driven by ParsedSource"""
+
+    def visit(self, node: ast.AST, parent: Optional[ast.AST]) -> None:
+        """Inspect a single node; called once per node in ast.walk order"""
+        pass
+
+    def finish(self) -> List[CodeSmell]:
+        """Return the smells collected while walking the tree"""
+        return []
+
+
+class LongFunctionRule(PythonRule):
+    """Flag functions longer than max_length lines"""
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+        self.smells: List[CodeSmell] = []
+
+    def visit(self, node, parent):
+        if isinstance(node, ast.FunctionDef):
+            start = node.lineno
+            end = getattr(node, 'end_lineno', None)
+            if end is None:
+                maxl = start
+                for n in ast.walk(node):
+                    if hasattr(n, 'lineno'):
+                        maxl = max(maxl, n.lineno)
+                end = maxl
+            length = end - start + 1
+            if length > self.max_length:
+                self.smells.append(CodeSmell('long_function', f'Function {node.name} is too long ({length} lines)', start))
+
+    def finish(self):
+        return self.smells
+
+
+class DeepNestingRule(PythonRule):
+    """Flag modules whose max block nesting exceeds max_nesting.
+
+    Mirrors PythonFeatureExtractor: depth resets inside each function and
+    grows with every if/for/while/with block.
+    """
+
+    NESTING_NODES = (ast.If, ast.For, ast.While, ast.With)
+
+    def __init__(self, max_nesting: int):
         self.max_nesting = max_nesting
+        self.deepest = 0
+        self._levels: Dict[int, int] = {}
 
-    def detect_long_functions(self, source: str) -> List[CodeSmell]:
-        smells = []
-        tree = ast.parse(source)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                start = node.lineno
-                end = getattr(node, 'end_lineno', None)
-                if end is None:
-                    maxl = start
-                    for n in ast.walk(node):
-                        if hasattr(n, 'lineno'):
-                            maxl = max(maxl, n.lineno)
-                    end = maxl
-                length = end - start + 1
-                if length > self.max_function_length:
-                    smells.append(CodeSmell('long_function', f'Function {node.name} is too long ({length} lines)', start))
-        return smells
+    def visit(self, node, parent):
+        base = self._levels.get(id(parent), 0) if parent is not None else 0
+        if isinstance(node, ast.FunctionDef):
+            level = 0
+        elif isinstance(node, self.NESTING_NODES):
+            level = base + 1
+            self.deepest = max(self.deepest, level)
+        else:
+            level = base
+        self._levels[id(node)] = level
 
-    def detect_deep_nesting(self, source: str) -> List[CodeSmell]:
-        extractor = PythonFeatureExtractor()
-        features = extractor.extract_features(source)
-        smells = []
-        if features.get('max_nesting', 0) > self.max_nesting:
-            smells.append(CodeSmell('deep_nesting', f'Max nesting depth is {features.get("max_nesting")}', None))
-        return smells
+    def finish(self):
+        if self.deepest > self.max_nesting:
+            return [CodeSmell('deep_nesting', f'Max nesting depth is {self.deepest}', None)]
+        return []
 
-    def detect_unused_imports(self, source: str) -> List[CodeSmell]:
-        tree = ast.parse(source)
-        imports = {}
-        usages = set()
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                for alias in node.names:
-                    imports[alias.asname or alias.name.split('.')[0]] = node.lineno
-            elif isinstance(node, ast.ImportFrom):
-                module = node.module or ''
-                for alias in node.names:
-                    imports[alias.asname or alias.name] = node.lineno
-            elif isinstance(node, ast.Name):
-                usages.add(node.id)
+
+class UnusedImportRule(PythonRule):
+    """Flag imported names that are never referenced"""
+
+    def __init__(self):
+        self.imports: Dict[str, int] = {}
+        self.usages = set()
+
+    def visit(self, node, parent):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                self.imports[alias.asname or alias.name.split('.')[0]] = node.lineno
+        elif isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                self.imports[alias.asname or alias.name] = node.lineno
+        elif isinstance(node, ast.Name):
+            self.usages.add(node.id)
+
+    def finish(self):
         smells = []
-        for name, lineno in imports.items():
-            if name not in usages:
+        for name, lineno in self.imports.items():
+            if name not in self.usages:
                 smells.append(CodeSmell('unused_import', f'Import {name} is unused', lineno))
         return smells
 
-    def detect_unused_variables(self, source: str) -> List[CodeSmell]:
-        # Basic heuristic: variable assigned but not used (in same file)
-        tree = ast.parse(source)
-        assigned = set()
-        used = set()
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Assign):
-                for t in node.targets:
-                    if isinstance(t, ast.Name):
-                        assigned.add(t.id)
-            elif isinstance(node, ast.AugAssign):
-                t = node.target
+
+class UnusedVariableRule(PythonRule):
+    """Basic heuristic: variable assigned but not used (in same file)"""
+
+    def __init__(self):
+        self.assigned = set()
+        self.used = set()
+
+    def visit(self, node, parent):
+        if isinstance(node, ast.Assign):
+            for t in node.targets:
                 if isinstance(t, ast.Name):
-                    assigned.add(t.id)
-            elif isinstance(node, ast.Name):
-                used.add(node.id)
+                    self.assigned.add(t.id)
+        elif isinstance(node, ast.AugAssign):
+            t = node.target
+            if isinstance(t, ast.Name):
+                self.assigned.add(t.id)
+        elif isinstance(node, ast.Name):
+            self.used.add(node.id)
+
+    def finish(self):
         smells = []
-        for var in assigned:
-            if var not in used:
+        for var in self.assigned:
+            if var not in self.used:
                 smells.append(CodeSmell('unused_variable', f'Variable {var} is assigned but never used'))
         return smells
-    
-    def detect_poor_naming(self, source: str) -> List[CodeSmell]:
-        """Detect poor variable and function names"""
-        tree = ast.parse(source)
-        smells = []
-        single_letter_vars = set()
-        
-        # Common 2-letter abbreviations that are acceptable
-        acceptable_2char = {'df', 'db', 'fs', 'os', 'np', 'pd', 'ax', 'id'}
-        
-        for node in ast.walk(tree):
-            # Check function names - be very strict
-            if isinstance(node, ast.FunctionDef):
-                if len(node.name) == 1 and node.name not in ['_']:
+
+
+class PoorNamingRule(PythonRule):
+    """Detect poor variable and function names"""
+
+    # Common 2-letter abbreviations that are acceptable
+    ACCEPTABLE_2CHAR = {'df', 'db', 'fs', 'os', 'np', 'pd', 'ax', 'id'}
+
+    def __init__(self):
+        self.smells: List[CodeSmell] = []
+        self.single_letter_vars = set()
+
+    def visit(self, node, parent):
+        acceptable_2char = self.ACCEPTABLE_2CHAR
+        smells = self.smells
+        single_letter_vars = self.single_letter_vars
+
+        # Check function names - be very strict
+        if isinstance(node, ast.FunctionDef):
+            if len(node.name) == 1 and node.name not in ['_']:
+                smells.append(CodeSmell(
+                    'poor_naming',
+                    f'Function name "{node.name}" is too short - use descriptive names',
+                    node.lineno
+                ))
+            elif len(node.name) == 2 and node.name not in acceptable_2char:
+                smells.append(CodeSmell(
+                    'poor_naming',
+                    f'Function name "{node.name}" is very short - use descriptive names',
+                    node.lineno
+                ))
+
+            # Check function parameters too!
+            for arg in node.args.args:
+                param_name = arg.arg
+                if len(param_name) == 1 and param_name != '_':
                     smells.append(CodeSmell(
                         'poor_naming',
-                        f'Function name "{node.name}" is too short - use descriptive names',
+                        f'Parameter "{param_name}" in function "{node.name}" is single-letter',
                         node.lineno
                     ))
-                elif len(node.name) == 2 and node.name not in acceptable_2char:
+                elif len(param_name) == 2 and param_name not in acceptable_2char:
                     smells.append(CodeSmell(
                         'poor_naming',
-                        f'Function name "{node.name}" is very short - use descriptive names',
+                        f'Parameter "{param_name}" in function "{node.name}" is very short',
                         node.lineno
                     ))
-                
-                # Check function parameters too!
-                for arg in node.args.args:
-                    param_name = arg.arg
-                    if len(param_name) == 1 and param_name != '_':
-                        smells.append(CodeSmell(
-                            'poor_naming',
-                            f'Parameter "{param_name}" in function "{node.name}" is single-letter',
-                            node.lineno
-                        ))
-                    elif len(param_name) == 2 and param_name not in acceptable_2char:
-                        smells.append(CodeSmell(
-                            'poor_naming',
-                            f'Parameter "{param_name}" in function "{node.name}" is very short',
-                            node.lineno
-                        ))
-            
-            # Check variable names - be strict on all single letters
-            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
-                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
-                for target in targets:
-                    if isinstance(target, ast.Name):
-                        name = target.id
-                        # Flag ALL single letter variables (no exceptions for i,j,k)
-                        if len(name) == 1 and name != '_':
-                            if name not in single_letter_vars:
-                                single_letter_vars.add(name)
-                                smells.append(CodeSmell(
-                                    'poor_naming',
-                                    f'Variable "{name}" is single-letter - use descriptive names',
-                                    target.lineno if hasattr(target, 'lineno') else None
-                                ))
-                        # Also flag very short 2-char names
-                        elif len(name) == 2 and name not in acceptable_2char:
-                            if name not in single_letter_vars:
-                                single_letter_vars.add(name)
-                                smells.append(CodeSmell(
-                                    'poor_naming',
-                                    f'Variable "{name}" is very short - use descriptive names',
-                                    target.lineno if hasattr(target, 'lineno') else None
-                                ))
-        
+
+        # Check variable names - be strict on all single letters
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            for target in targets:
+                if isinstance(target, ast.Name):
+                    name = target.id
+                    # Flag ALL single letter variables (no exceptions for i,j,k)
+                    if len(name) == 1 and name != '_':
+                        if name not in single_letter_vars:
+                            single_letter_vars.add(name)
+                            smells.append(CodeSmell(
+                                'poor_naming',
+                                f'Variable "{name}" is single-letter - use descriptive names',
+                                target.lineno if hasattr(target, 'lineno') else None
+                            ))
+                    # Also flag very short 2-char names
+                    elif len(name) == 2 and name not in acceptable_2char:
+                        if name not in single_letter_vars:
+                            single_letter_vars.add(name)
+                            smells.append(CodeSmell(
+                                'poor_naming',
+                                f'Variable "{name}" is very short - use descriptive names',
+                                target.lineno if hasattr(target, 'lineno') else None
+                            ))
+
+    def finish(self):
+        return self.smells
+
+
+class ParsedSource:
+    """Python source parsed once and walked once for every registered rule"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.tree = ast.parse(source)
+        self.rules: List[PythonRule] = []
+
+    def register(self, rule: PythonRule) -> PythonRule:
+        self.rules.append(rule)
+        return rule
+
+    def run(self) -> List[CodeSmell]:
+        """Walk the tree once, feeding every node to each rule in turn"""
+        rules = self.rules
+        # Same breadth-first order as ast.walk, but remembering each node's parent
+        todo = deque([(self.tree, None)])
+        while todo:
+            node, parent = todo.popleft()
+            todo.extend((child, node) for child in ast.iter_child_nodes(node))
+            for rule in rules:
+                rule.visit(node, parent)
+        smells = []
+        for rule in rules:
+            smells.extend(rule.finish())
         return smells
 
+
+class RuleBasedDetector:
+    def __init__(self, max_function_length=40, max_nesting=4, inprocess_linters=None):
+        self.max_function_length = max_function_length
+        self.max_nesting = max_nesting
+        # Run flake8/pylint through their Python APIs unless disabled;
+        # the subprocess path stays as a fallback
+        if inprocess_linters is None:
+            inprocess_linters = os.environ.get('INPROCESS_LINTERS', '1') != '0'
+        self.inprocess_linters = inprocess_linters
+
+    def python_rules(self) -> List[PythonRule]:
+        """Fresh instances of the AST rules run by detect_all"""
+        return [
+            LongFunctionRule(self.max_function_length),
+            DeepNestingRule(self.max_nesting),
+            UnusedImportRule(),
+            UnusedVariableRule(),
+            PoorNamingRule(),
+        ]
+
+    def run_rules(self, source: str, rules: List[PythonRule]) -> List[CodeSmell]:
+        with span('parse.ast', 'python'):
+            parsed = ParsedSource(source)
+        for rule in rules:
+            parsed.register(rule)
+        return parsed.run()
+
+    def detect_long_functions(self, source: str) -> List[CodeSmell]:
+        return self.run_rules(source, [LongFunctionRule(self.max_function_length)])
+
+    def detect_deep_nesting(self, source: str) -> List[CodeSmell]:
+        return self.run_rules(source, [DeepNestingRule(self.max_nesting)])
+
+    def detect_unused_imports(self, source: str) -> List[CodeSmell]:
+        return self.run_rules(source, [UnusedImportRule()])
+
+    def detect_unused_variables(self, source: str) -> List[CodeSmell]:
+        return self.run_rules(source, [UnusedVariableRule()])
+
+    def detect_poor_naming(self, source: str) -> List[CodeSmell]:
+        """Detect poor variable and function names"""
+        return self.run_rules(source, [PoorNamingRule()])
+
     def detect_all(self, source: str) -> List[CodeSmell]:
-        smells = []
-        smells.extend(self.detect_long_functions(source))
-        smells.extend(self.detect_deep_nesting(source))
-        smells.extend(self.detect_unused_imports(source))
-        smells.extend(self.detect_unused_variables(source))
-        smells.extend(self.detect_poor_naming(source))
+        # All AST rules share a single parse and a single walk
+        with span('detect.ast_rules', 'python'):
+            smells = self.run_rules(source, self.python_rules())
         # flake8 rule-based lints
         try:
-            smells.extend(self.detect_with_flake8(source))
+            with span('detect.flake8', 'python'):
+                smells.extend(self.detect_with_flake8(source))
         except Exception:
-            pass
+            LINTER_FAILURES.inc(language='python', reason='flake8')
         try:
-            smells.extend(self.detect_with_pylint(source))
+            with span('detect.pylint', 'python'):
+                smells.extend(self.detect_with_pylint(source))
         except Exception:
-            pass
+            LINTER_FAILURES.inc(language='python', reason='pylint')
         return smells
 
     def detect_with_flake8(self, source: str) -> List[CodeSmell]:
+        if self.inprocess_linters:
+            try:
+                from .inprocess_linters import flake8_messages
+                messages = flake8_messages(source)
+            except Exception:
+                # flake8 API unavailable or changed: use the CLI instead
+                return self._detect_with_flake8_subprocess(source)
+            return [CodeSmell('flake8', f'[{code}] {text.strip()}', row) for row, col, code, text in messages]
+        return self._detect_with_flake8_subprocess(source)
+
+    def _detect_with_flake8_subprocess(self, source: str) -> List[CodeSmell]:
         smells = []
         try:
             with tempfile.NamedTemporaryFile('w', delete=False, suffix='.py', encoding='utf8') as tmp:
@@ -189,7 +343,7 @@ class RuleBasedDetector:
                 tmp_fn = tmp.name
             import sys
             cmd = [sys.executable, '-m', 'flake8', tmp_fn, '--format=%(row)d:%(col)d:%(code)s:%(text)s']
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = subprocess.run(cmd, capture_output=True, text=True, timeout=linter_timeout(None))
             out = proc.stdout.strip()
             for line in out.splitlines():
                 if not line:
@@ -208,6 +362,19 @@ class RuleBasedDetector:
         return smells
 
     def detect_with_pylint(self, source: str) -> List[CodeSmell]:
+        if self.inprocess_linters:
+            try:
+                from .inprocess_linters import pylint_messages
+                messages = pylint_messages(source)
+            except TimeoutError:
+                # Another pylint run would take just as long
+                raise
+            except Exception:
+                return self._detect_with_pylint_subprocess(source)
+            return [CodeSmell('pylint', msg, row) for row, msg in messages]
+        return self._detect_with_pylint_subprocess(source)
+
+    def _detect_with_pylint_subprocess(self, source: str) -> List[CodeSmell]:
         smells = []
         try:
             with tempfile.NamedTemporaryFile('w', delete=False, suffix='.py', encoding='utf8') as tmp:
@@ -216,7 +383,7 @@ class RuleBasedDetector:
                 tmp_fn = tmp.name
             import sys
             cmd = [sys.executable, '-m', 'pylint', '--output-format', 'text', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = subprocess.run(cmd, capture_output=True, text=True, timeout=linter_timeout(None))
             out = proc.stdout.strip()
             for line in out.splitlines():
                 if ':' in line:
@@ -236,18 +403,20 @@ class RuleBasedDetector:
                 pass
         return smells
 
+    def _run_linter(self, language: str, filename: str, source: str, build_command, **kwargs):
+        """Run an external linter on one of the pool's workers"""
+        from .linter_pool import get_linter_pool
+        return get_linter_pool().run(language, filename, source, build_command, **kwargs)
+
     def detect_javascript_issues(self, source: str) -> List[CodeSmell]:
         """Detect JavaScript/TypeScript issues using ESLint if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.js', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
             # Try ESLint
-            cmd = ['eslint', tmp_fn, '--format', 'json', '--no-eslintrc']
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'javascript', 'snippet.js', source,
+                lambda path: ['eslint', path, '--format', 'json', '--no-eslintrc'],
+                daemon=ESLINT_DAEMON)
             if proc.returncode in [0, 1]:  # ESLint returns 1 if issues found
                 import json
                 results = json.loads(proc.stdout)
@@ -263,27 +432,19 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
-    def detect_java_issues(self, source: str) -> List[CodeSmell]:
+    def detect_java_issues(self, source) -> List[CodeSmell]:
         """Detect Java issues using Checkstyle or PMD if available"""
         smells = []
+        buffer = SourceBuffer.of(source)
+        source = buffer.text
         
         # Try Checkstyle
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.java', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            # Try checkstyle command
-            cmd = ['checkstyle', '-f', 'xml', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'java', 'Snippet.java', source,
+                lambda path: ['checkstyle', '-f', 'xml', path])
             if proc.returncode == 0 and '<error' in proc.stdout:
                 # Parse XML output for errors
                 import xml.etree.ElementTree as ET
@@ -296,21 +457,16 @@ class RuleBasedDetector:
                     ))
         except FileNotFoundError:
             # Checkstyle not installed, fallback to basic heuristics
-            smells.extend(self._java_basic_heuristics(source))
+            smells.extend(self._java_basic_heuristics(buffer))
         except Exception:
-            smells.extend(self._java_basic_heuristics(source))
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
+            smells.extend(self._java_basic_heuristics(buffer))
         
         return smells
 
-    def _java_basic_heuristics(self, source: str, max_method_length: int = 80, max_nesting: int = 4) -> List[CodeSmell]:
+    def _java_basic_heuristics(self, source, max_method_length: int = 80, max_nesting: int = 4) -> List[CodeSmell]:
         """Basic Java heuristics when linters not available"""
         smells = []
-        lines = source.splitlines()
+        lines = SourceBuffer.of(source).lines
         pattern = re.compile(r"\b(public|private|protected|static)\b.*\(.*\)\s*\{")
         i = 0
         while i < len(lines):
@@ -345,13 +501,9 @@ class RuleBasedDetector:
         """Detect C++ issues using cppcheck if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.cpp', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            cmd = ['cppcheck', '--enable=all', '--template={line}:{severity}:{message}', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'cpp', 'snippet.cpp', source,
+                lambda path: ['cppcheck', '--enable=all', '--template={line}:{severity}:{message}', path])
             output = proc.stderr  # cppcheck outputs to stderr
             
             for line in output.splitlines():
@@ -370,24 +522,15 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
     def detect_go_issues(self, source: str) -> List[CodeSmell]:
         """Detect Go issues using golangci-lint if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.go', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            cmd = ['golangci-lint', 'run', '--out-format', 'json', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'go', 'snippet.go', source,
+                lambda path: ['golangci-lint', 'run', '--out-format', 'json', path])
             
             if proc.stdout:
                 import json
@@ -402,24 +545,22 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
+    # Minimal crate each Rust worker keeps, so cargo's target dir stays warm
+    RUST_SCAFFOLD = {
+        'Cargo.toml': '[package]\nname = "snippet"\nversion = "0.1.0"\nedition = "2021"\n',
+    }
+
     def detect_rust_issues(self, source: str) -> List[CodeSmell]:
         """Detect Rust issues using clippy if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.rs', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            cmd = ['cargo', 'clippy', '--', '-W', 'clippy::all', '--message-format', 'json']
-            proc = subprocess.run(cmd, capture_output=True, text=True, cwd=os.path.dirname(tmp_fn))
+            proc = self._run_linter(
+                'rust', os.path.join('src', 'lib.rs'), source,
+                lambda path: ['cargo', 'clippy', '--message-format', 'json', '--', '-W', 'clippy::all'],
+                use_workspace_cwd=True,
+                scaffold=self.RUST_SCAFFOLD)
             
             for line in proc.stdout.splitlines():
                 if line.strip():
@@ -439,24 +580,16 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
     def detect_ruby_issues(self, source: str) -> List[CodeSmell]:
         """Detect Ruby issues using RuboCop if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.rb', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            cmd = ['rubocop', '--format', 'json', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'ruby', 'snippet.rb', source,
+                lambda path: ['rubocop', '--format', 'json', path],
+                daemon=RUBOCOP_DAEMON)
             
             if proc.stdout:
                 import json
@@ -472,24 +605,15 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
     def detect_php_issues(self, source: str) -> List[CodeSmell]:
         """Detect PHP issues using PHP_CodeSniffer if available"""
         smells = []
         try:
-            with tempfile.NamedTemporaryFile('w', delete=False, suffix='.php', encoding='utf8') as tmp:
-                tmp.write(source)
-                tmp.flush()
-                tmp_fn = tmp.name
-            
-            cmd = ['phpcs', '--report=json', tmp_fn]
-            proc = subprocess.run(cmd, capture_output=True, text=True)
+            proc = self._run_linter(
+                'php', 'snippet.php', source,
+                lambda path: ['phpcs', '--report=json', path])
             
             if proc.stdout:
                 import json
@@ -505,16 +629,16 @@ class RuleBasedDetector:
             pass
         except Exception:
             pass
-        finally:
-            try:
-                os.unlink(tmp_fn)
-            except Exception:
-                pass
         return smells
 
-    def detect_all_languages(self, source: str, language: str) -> List[CodeSmell]:
-        """Detect issues for any supported language"""
+    def detect_all_languages(self, source, language: str) -> List[CodeSmell]:
+        """Detect issues for any supported language.
+
+        source is the text or a SourceBuffer shared with other analyzers.
+        """
         smells = []
+        buffer = SourceBuffer.of(source)
+        source = buffer.text
         
         # Map language names to detection methods
         if language in ['python', 'py']:
@@ -522,7 +646,7 @@ class RuleBasedDetector:
         elif language in ['javascript', 'typescript', 'js', 'ts']:
             smells.extend(self.detect_javascript_issues(source))
         elif language == 'java':
-            smells.extend(self.detect_java_issues(source))
+            smells.extend(self.detect_java_issues(buffer))
         elif language in ['cpp', 'c', 'csharp', 'c++']:
             smells.extend(self.detect_cpp_issues(source))
         elif language == 'go':
@@ -535,32 +659,50 @@ class RuleBasedDetector:
             smells.extend(self.detect_php_issues(source))
         else:
             # For all other languages, use generic code analysis
-            smells.extend(self._generic_code_analysis(source, language))
+            smells.extend(self._generic_code_analysis(buffer, language))
         
         return smells
     
-    def _generic_code_analysis(self, source: str, language: str) -> List[CodeSmell]:
+    def detect_fast(self, source, language: str) -> List[CodeSmell]:
+        """In-process checks only, for large inputs or a busy server.
+
+        Python gets the AST rules, Java its heuristics and everything else
+        the generic analysis; no linter is run.
+        """
+        buffer = SourceBuffer.of(source)
+        if language in ['python', 'py']:
+            with span('detect.ast_rules', 'python'):
+                return self.run_rules(buffer.text, self.python_rules())
+        if language == 'java':
+            return self._java_basic_heuristics(buffer)
+        return self._generic_code_analysis(buffer, language)
+
+    def _generic_code_analysis(self, source, language: str) -> List[CodeSmell]:
         """Generic code analysis for any programming language"""
         smells = []
-        lines = source.splitlines()
+        buffer = SourceBuffer.of(source)
+        lines = buffer.lines
+        line_count = buffer.line_count
         
         # Generic code quality checks
         
         # 1. Check for very long lines (> 120 characters)
         for i, line in enumerate(lines, 1):
-            if len(line.strip()) > 120:
+            if buffer.ends[i - 1] - buffer.indents[i - 1] > 120:
+                # Buffer lines of CRLF sources keep their '\r', which isn't part of the line
+                length = len(line) - line.endswith('\r')
                 smells.append(CodeSmell(
                     'long_line',
-                    f'Line {i} exceeds 120 characters ({len(line)} chars)',
+                    f'Line {i} exceeds 120 characters ({length} chars)',
                     i
                 ))
         
         # 2. Check for deep nesting (count indentation)
         max_nesting = 0
         for i, line in enumerate(lines, 1):
-            if line.strip():
+            if not buffer.is_blank(i - 1):
                 # Count leading spaces/tabs
-                indent = len(line) - len(line.lstrip())
+                indent = buffer.indents[i - 1]
                 nesting_level = indent // 2 if ' ' in line[:indent] else indent
                 if nesting_level > max_nesting:
                     max_nesting = nesting_level
@@ -609,7 +751,7 @@ class RuleBasedDetector:
             
             # Check function lengths
             for idx, start in enumerate(func_starts):
-                end = func_starts[idx + 1] if idx + 1 < len(func_starts) else len(lines)
+                end = func_starts[idx + 1] if idx + 1 < len(func_starts) else line_count
                 func_length = end - start
                 if func_length > 50:
                     smells.append(CodeSmell(
@@ -631,23 +773,23 @@ class RuleBasedDetector:
         
         # 5. Check for commented out code (lines starting with // or # or /* )
         comment_count = 0
-        for i, line in enumerate(lines, 1):
-            stripped = line.strip()
+        for i in range(len(lines)):
+            stripped = buffer.stripped(i)
             if stripped.startswith(('///', '###', '/*', '<!--')) or \
                (stripped.startswith(('// ', '# ')) and '=' in stripped):
                 comment_count += 1
         
-        if comment_count > len(lines) * 0.2:  # More than 20% comments
+        if comment_count > line_count * 0.2:  # More than 20% comments
             smells.append(CodeSmell(
                 'excessive_comments',
-                f'File has {comment_count} commented lines ({comment_count/len(lines)*100:.1f}%)',
+                f'File has {comment_count} commented lines ({comment_count/line_count*100:.1f}%)',
                 None
             ))
         
         # 6. Check for trailing whitespace
         trailing_ws_count = 0
-        for i, line in enumerate(lines, 1):
-            if line.rstrip() != line and line.strip():
+        for i, line in enumerate(lines):
+            if buffer.ends[i] < len(line) - line.endswith('\r') and not buffer.is_blank(i):
                 trailing_ws_count += 1
         
         if trailing_ws_count > 5:
@@ -0,0 +1,100 @@
+"""
+Compact complexity heatmap
+Per-line scores and levels live in parallel typed arrays and issues are
+kept only for the lines that have any. The JSON form run-length encodes
+both arrays, since real files are mostly long runs of identical lines.
+Analyses carry it as complexity['heatmap_rle']; every web and API response gets the
+old per-line complexity['heatmap'] list from with_heatmap_rows().
+"""
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+LEVELS = ('clean', 'low', 'medium', 'high')
+
+
+def score_to_level(score: int) -> int:
+    """Index into LEVELS for a line score"""
+    if score == 0:
+        return 0
+    elif score <= 2:
+        return 1
+    elif score <= 4:
+        return 2
+    else:
+        return 3
+
+
+def run_length_encode(values: Sequence) -> List:
+    """[v0, n0, v1, n1, ...] for consecutive runs of equal values"""
+    encoded = []
+    previous, count = None, 0
+    for value in values:
+        if count and value == previous:
+            count += 1
+            continue
+        if count:
+            encoded += [previous, count]
+        previous, count = value, 1
+    if count:
+        encoded += [previous, count]
+    return encoded
+
+
+def run_length_decode(encoded: Sequence) -> Iterator:
+    for i in range(0, len(encoded), 2):
+        for _ in range(encoded[i + 1]):
+            yield encoded[i]
+
+
+class Heatmap:
+    """Line-by-line complexity heatmap"""
+
+    def __init__(self):
+        self.scores = array('H')
+        self.levels = array('B')
+        self.issues: Dict[int, List[str]] = {}  # line number -> issues
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def append(self, score: int, issues: Optional[List[str]] = None):
+        self.scores.append(score)
+        self.levels.append(score_to_level(score))
+        if issues:
+            self.issues[len(self.scores)] = issues
+
+    def rows(self) -> Iterator[Dict]:
+        """The per-line dicts of the old heatmap format, generated on demand"""
+        for i, (score, level) in enumerate(zip(self.scores, self.levels), 1):
+            yield {'line': i, 'score': score, 'level': LEVELS[level], 'issues': self.issues.get(i, [])}
+
+    def to_dict(self) -> Dict:
+        return {
+            'encoding': 'rle',
+            'lines': len(self.scores),
+            'scores': run_length_encode(self.scores),
+            'levels': run_length_encode([LEVELS[level] for level in self.levels]),
+            'issues': [[line, issues] for line, issues in sorted(self.issues.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Heatmap':
+        heatmap = cls()
+        heatmap.scores = array('H', run_length_decode(data.get('scores', [])))
+        heatmap.levels = array('B', (LEVELS.index(level) for level in run_length_decode(data.get('levels', []))))
+        heatmap.issues = {line: issues for line, issues in data.get('issues', [])}
+        return heatmap
+
+
+def heatmap_rows(data) -> List[Dict]:
+    """Expand an encoded heatmap (or pass through an old-style list) to per-line dicts"""
+    if isinstance(data, dict):
+        return list(Heatmap.from_dict(data).rows())
+    return list(data or [])
+
+
+def with_heatmap_rows(complexity):
+    """complexity plus the per-line 'heatmap' list, expanded from its 'heatmap_rle'"""
+    if not isinstance(complexity, dict) or 'heatmap_rle' not in complexity:
+        return complexity
+    return dict(complexity, heatmap=heatmap_rows(complexity['heatmap_rle']))
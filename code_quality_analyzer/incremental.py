@@ -0,0 +1,172 @@
+"""
+Incremental analysis for large repositories
+Keeps an on-disk index of per-file results keyed by language and git blob
+hash, so a run only re-analyzes files whose content changed since the last
+run and merges everything else in from the index. With a base ref, files
+git reports as unchanged since that ref are looked up by the blob id git
+records for them there, without reading them; if git can't answer (not a
+repository, unknown ref) every file is hashed instead.
+"""
+import hashlib
+import json
+import os
+import subprocess
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from . import __version__
+from .project_scanner import iter_source_files, scan_files
+from .result_cache import model_fingerprint
+
+INDEX_FILENAME = '.code-quality-index.json'
+
+
+def blob_hash(data: bytes) -> str:
+    """Same object id git computes for a blob with this content"""
+    digest = hashlib.sha1(b'blob %d\0' % len(data))
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class GitError(RuntimeError):
+    """Raised when git is missing or a git command fails"""
+    pass
+
+
+def _git(root: str, *args: str) -> List[str]:
+    """NUL-separated output of a git command, so paths come back unquoted"""
+    try:
+        proc = subprocess.run(['git', '-C', root] + list(args), capture_output=True, text=True, check=True)
+    except FileNotFoundError:
+        raise GitError('git is not installed')
+    except subprocess.CalledProcessError as e:
+        message = e.stderr.strip().splitlines()
+        raise GitError(message[0] if message else f'git {args[0]} exited with status {e.returncode}')
+    return [item for item in proc.stdout.split('\0') if item]
+
+
+def _relative_to(root: str, paths: List[str]) -> List[str]:
+    # git prints paths relative to the repository top level
+    toplevel = _git(root, 'rev-parse', '--show-toplevel')[0].strip()
+    root = os.path.realpath(root)
+    return [os.path.relpath(os.path.join(toplevel, p), root) for p in paths]
+
+
+def changed_files(root: str, base_ref: str) -> Set[str]:
+    """Paths (relative to root) that differ from base_ref, including untracked files"""
+    # Fails clearly for a directory outside a repository or an unknown ref
+    _git(root, 'rev-parse', '--verify', base_ref + '^{commit}')
+    paths = _git(root, 'diff', '-z', '--name-only', base_ref, '--') + \
+        _git(root, 'ls-files', '-z', '--others', '--exclude-standard')
+    return set(_relative_to(root, paths))
+
+
+def base_blobs(root: str, base_ref: str) -> Dict[str, str]:
+    """Blob id of every file at base_ref, keyed by path relative to root"""
+    entries = [entry.split('\t', 1) for entry in _git(root, 'ls-tree', '-r', '-z', '--full-tree', base_ref)]
+    # Each entry is "<mode> <type> <object>\t<path>"
+    files = [(meta.split()[2], path) for meta, path in entries if meta.split()[1] == 'blob']
+    return dict(zip(_relative_to(root, [path for _, path in files]), [blob for blob, _ in files]))
+
+
+class AnalysisIndex:
+    """Per-file results keyed by language and blob hash, persisted as JSON"""
+
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files: Dict[str, str] = {}    # relative path -> key
+        self.blobs: Dict[str, Dict] = {}   # key -> result
+        self.reused = 0
+        self.analyzed = 0
+        self.warning: Optional[str] = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf8') as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                data = {}
+            # A different analyzer version or model invalidates every entry
+            if data.get('fingerprint') == fingerprint:
+                self.files = data.get('files', {})
+                self.blobs = data.get('blobs', {})
+
+    @staticmethod
+    def key(language: str, blob: str) -> str:
+        # The same content is analyzed differently as another language
+        return f'{language}:{blob}'
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        return self.blobs.get(key)
+
+    def record(self, relpath: str, key: str, result: Dict):
+        self.files[relpath] = key
+        self.blobs[key] = result
+
+    def save(self, present: Optional[Set[str]] = None):
+        """Write the index atomically, dropping files that no longer exist"""
+        if present is not None:
+            self.files = {p: b for p, b in self.files.items() if p in present}
+        live = set(self.files.values())
+        self.blobs = {b: r for b, r in self.blobs.items() if b in live}
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf8') as fh:
+            json.dump({'fingerprint': self.fingerprint, 'files': self.files, 'blobs': self.blobs}, fh)
+        os.replace(tmp_path, self.path)
+
+
+def index_fingerprint(model_path: Optional[str]) -> str:
+    return f'{__version__}:{model_fingerprint(model_path) or "no-model"}'
+
+
+def scan_incremental(root: str, index: AnalysisIndex, model_path: Optional[str] = None,
+                     workers: Optional[int] = None, chunksize: int = 8,
+                     base_ref: Optional[str] = None) -> Iterator[Dict]:
+    """Like project_scanner.scan_directory, but reuse indexed results for
+    unchanged files. Results are yielded in the same order; the index is
+    updated in place and saved once the scan completes. If git can't
+    compare against base_ref, index.warning says why and every file is
+    hashed instead.
+    """
+    changed, at_base = None, {}
+    if base_ref:
+        try:
+            changed = changed_files(root, base_ref)
+            at_base = base_blobs(root, base_ref)
+        except GitError as e:
+            changed, at_base = None, {}
+            index.warning = f'cannot compare against {base_ref} ({e}); hashing every file instead'
+    plan: List[Tuple[str, str, Optional[Dict]]] = []
+    pending: List[Tuple[str, str]] = []
+    keys: Dict[str, str] = {}
+    present = set()
+
+    for path, language in iter_source_files(root):
+        relpath = os.path.relpath(path, root)
+        present.add(relpath)
+        reused = None
+        if changed is not None and relpath not in changed and relpath in at_base:
+            # Same content as at base_ref, so git already knows its blob id
+            keys[relpath] = index.key(language, at_base[relpath])
+            reused = index.lookup(keys[relpath])
+        if reused is None:
+            with open(path, 'rb') as fh:
+                keys[relpath] = index.key(language, blob_hash(fh.read()))
+            reused = index.lookup(keys[relpath])
+        if reused is None:
+            pending.append((path, language))
+        plan.append((path, relpath, reused))
+
+    fresh = scan_files(pending, model_path, workers, chunksize)
+    for path, relpath, reused in plan:
+        if reused is not None:
+            index.reused += 1
+            index.record(relpath, keys[relpath], reused)
+            # The same content may have been indexed under another path
+            yield dict(reused, file=path)
+        else:
+            result = next(fresh)
+            index.analyzed += 1
+            if 'error' not in result:
+                index.record(relpath, keys[relpath], result)
+            yield result
+    index.save(present)
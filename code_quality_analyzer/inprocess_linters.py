@@ -0,0 +1,234 @@
+"""
+In-process flake8 and warm pylint backends
+Lint a source string through the linters' Python APIs instead of spawning
+a new interpreter and writing a temporary file for every request.
+
+flake8 runs in the calling thread. pylint runs in long-lived worker
+processes (PYLINT_WORKERS per process) through its public Run and
+PyLinter.check API in --from-stdin mode, so the snippet is parsed from
+the string and never written to disk: astroid introspects live modules
+and caches every module a snippet imports, so it is kept away from the
+analysis threads, and its cache is cleared once it holds more than
+PYLINT_ASTROID_CACHE modules.
+"""
+import io
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from .linter_pool import linter_timeout
+
+SNIPPET_MODULE = 'snippet'
+SNIPPET_FILENAME = SNIPPET_MODULE + '.py'
+
+_flake8_app = None
+_flake8_lock = threading.Lock()
+
+
+def _get_flake8_app():
+    """Build flake8's application (options, plugins, decider) once per process"""
+    global _flake8_app
+    with _flake8_lock:
+        if _flake8_app is None:
+            from flake8.api import legacy
+            _flake8_app = legacy.get_style_guide()._application
+        return _flake8_app
+
+
+def flake8_messages(source: str) -> List[Tuple[int, int, str, str]]:
+    """Run flake8 on a source string; returns (row, col, code, text) tuples
+    in the same order and with the same selection as the flake8 CLI.
+    """
+    from flake8.checker import FileChecker
+    from flake8.processor import FileProcessor
+    from flake8.style_guide import Decision
+    from flake8.violation import Violation
+
+    class SourceFileChecker(FileChecker):
+        def __init__(self, lines, **kwargs):
+            self._lines = lines
+            super().__init__(**kwargs)
+
+        def _make_processor(self):
+            return FileProcessor(self.filename, self.options, lines=self._lines)
+
+    app = _get_flake8_app()
+    checker = SourceFileChecker(
+        source.splitlines(True),
+        filename=SNIPPET_FILENAME,
+        plugins=app.plugins.checkers,
+        options=app.options,
+    )
+    filename, results, _ = checker.run_checks()
+    decider = app.guide.default_style_guide.decider
+
+    messages = []
+    for code, row, col, text, physical_line in sorted(results, key=lambda r: (r[1], r[2])):
+        if decider.decision_for(code) is not Decision.Selected:
+            continue
+        # flake8 reports 1-based columns
+        violation = Violation(code, filename, row, col + 1, text, physical_line)
+        if violation.is_inline_ignored(False):
+            continue
+        messages.append((row, col + 1, code, text))
+    return messages
+
+
+def serve_pylint(requests, replies, cache_limit: int):
+    """Worker process loop: lint each JSON-encoded source line read from
+    requests with a PyLinter configured once, answering one JSON line each
+    on replies: {"messages": [[row, message], ...]} or {"error": text}.
+    """
+    from astroid import MANAGER
+    from pylint.lint import Run
+    from pylint.reporters import CollectingReporter
+
+    linter = None
+    for line in requests:
+        try:
+            # --from-stdin: pylint reads the module's source from sys.stdin
+            sys.stdin = io.TextIOWrapper(io.BytesIO(json.loads(line).encode('utf8')), encoding='utf8')
+            reporter = CollectingReporter()
+            if linter is None:
+                linter = Run(['--from-stdin', SNIPPET_FILENAME, '--persistent=n', '--score=n'],
+                             reporter=reporter, exit=False).linter
+            else:
+                linter.set_reporter(reporter)
+                linter.check([SNIPPET_FILENAME])
+            # Every job is the same module name, so astroid must not keep the last one;
+            # it also caches every module the snippets import, so start over past the limit
+            MANAGER.astroid_cache.pop(SNIPPET_MODULE, None)
+            if len(MANAGER.astroid_cache) > cache_limit:
+                MANAGER.clear_cache()
+            reply = {'messages': [(m.line, f'{m.msg_id}: {m.msg} ({m.symbol})') for m in reporter.messages]}
+        except Exception as e:
+            reply = {'error': f'{type(e).__name__}: {e}'}
+        replies.write(json.dumps(reply) + '\n')
+        replies.flush()
+
+
+class PylintWorker:
+    """One warm pylint process, started on first use and after a crash or timeout"""
+
+    def __init__(self, cache_limit: int):
+        self.cache_limit = cache_limit
+        self._process = None
+        self._buffer = b''
+
+    def _start(self):
+        # The worker imports this package, wherever the parent was started from
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        pythonpath = os.pathsep.join(filter(None, [package_parent, os.environ.get('PYTHONPATH')]))
+        # Unbuffered bytes: replies are read straight from the pipe's descriptor
+        self._process = subprocess.Popen(
+            [sys.executable, '-m', __name__, str(self.cache_limit)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0,
+            env=dict(os.environ, PYTHONPATH=pythonpath),
+        )
+        self._buffer = b''
+
+    def _read_reply(self, timeout: float) -> Optional[bytes]:
+        """The next reply line; b'' if the worker exited, None if no whole
+        line arrived within timeout seconds"""
+        deadline = time.monotonic() + timeout
+        fd = self._process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                return None
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return b''
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line
+
+    def run(self, source: str, timeout: float) -> List[Tuple[Optional[int], str]]:
+        if self._process is None or self._process.poll() is not None:
+            self.stop()
+            self._start()
+        try:
+            self._process.stdin.write((json.dumps(source) + '\n').encode('utf8'))
+            line = self._read_reply(timeout)
+        except (OSError, ValueError) as e:
+            self.stop()
+            raise RuntimeError(f'pylint worker failed: {e}')
+        if line is None:
+            self.stop()
+            raise TimeoutError(f'pylint did not finish within {timeout:g}s')
+        if not line:
+            self.stop()
+            raise RuntimeError('pylint worker exited')
+        reply = json.loads(line)
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return [(row, message) for row, message in reply['messages']]
+
+    def stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.communicate()
+            self._process = None
+
+
+class PylintPool:
+    """Bounded set of pylint worker processes shared by this process's threads"""
+
+    def __init__(self, workers: int = 1, timeout: float = 30, cache_limit: int = 200):
+        self.timeout = timeout
+        self._pid = os.getpid()
+        self._idle: 'queue.LifoQueue[PylintWorker]' = queue.LifoQueue()
+        for _ in range(max(1, workers)):
+            self._idle.put(PylintWorker(cache_limit))
+
+    def run(self, source: str) -> List[Tuple[Optional[int], str]]:
+        deadline = time.monotonic() + linter_timeout(self.timeout)
+        try:
+            worker = self._idle.get(timeout=deadline - time.monotonic())
+        except queue.Empty:
+            raise TimeoutError('no pylint worker became free')
+        try:
+            return worker.run(source, max(0.0, deadline - time.monotonic()))
+        finally:
+            self._idle.put(worker)
+
+
+_pylint_pool = None
+_pylint_lock = threading.Lock()
+
+
+def get_pylint_pool() -> PylintPool:
+    """Process-wide pool sized from PYLINT_WORKERS, PYLINT_TIMEOUT and PYLINT_ASTROID_CACHE"""
+    global _pylint_pool
+    with _pylint_lock:
+        # Workers inherited through fork belong to the parent
+        if _pylint_pool is None or _pylint_pool._pid != os.getpid():
+            _pylint_pool = PylintPool(
+                workers=int(os.environ.get('PYLINT_WORKERS', '1')),
+                timeout=float(os.environ.get('PYLINT_TIMEOUT', os.environ.get('LINTER_TIMEOUT', '30'))),
+                cache_limit=int(os.environ.get('PYLINT_ASTROID_CACHE', '200')),
+            )
+        return _pylint_pool
+
+
+def pylint_messages(source: str) -> List[Tuple[Optional[int], str]]:
+    """Run pylint on a source string; returns (row, message) tuples where
+    message matches the CLI text format, e.g. 'C0114: Missing module
+    docstring (missing-module-docstring)'.
+
+    Raises TimeoutError if no worker is free or the run takes longer than
+    PYLINT_TIMEOUT.
+    """
+    return get_pylint_pool().run(source)
+
+
+if __name__ == '__main__':
+    # Replies own stdout; anything pylint prints goes to stderr
+    replies, sys.stdout = sys.stdout, sys.stderr
+    serve_pylint(sys.stdin, replies, int(sys.argv[1]) if len(sys.argv) > 1 else 200)
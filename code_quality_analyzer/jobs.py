@@ -0,0 +1,360 @@
+"""
+Background analysis jobs
+A job runs one analysis on a bounded in-process executor, so the request
+that submits it returns immediately. Each finished stage is recorded as a
+'section' event and the merged analysis as a final 'done' event; clients
+poll the job or follow its events as a Server-Sent-Events stream.
+
+Job state lives in memory by default, and jobs run in the process that
+took the request. With JOBS_REDIS_URL set (any Redis-compatible server)
+Redis holds both the state and a shared queue: a job is pushed there and
+run by JOB_WORKERS threads in whichever worker process pops it first, and
+any worker can answer for it. In-memory jobs only work with a single
+worker process: with WEB_CONCURRENCY > 1 and no Redis,
+JobManager.from_env raises JobStoreUnavailable.
+
+An event stream holds a worker thread, so it ends after
+JOB_STREAM_SECONDS with a 'timeout' event; clients then poll the job (or
+reconnect with Last-Event-ID).
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+TERMINAL_EVENTS = ('done', 'failed')
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the job executor's queue is saturated"""
+    pass
+
+
+class JobStoreUnavailable(RuntimeError):
+    """Raised when jobs would need a shared store that isn't configured"""
+    pass
+
+
+class MemoryJobStore:
+    """Job status and events in this process's memory"""
+
+    shared_queue = False
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict] = {}
+        self._changed = threading.Condition()
+
+    def create(self, job_id: str):
+        now = time.time()
+        with self._changed:
+            # Forget finished jobs once they are older than the TTL
+            expired = [jid for jid, job in self._jobs.items()
+                       if job['status'] in TERMINAL_EVENTS and job['created'] < now - self.ttl]
+            for jid in expired:
+                del self._jobs[jid]
+            self._jobs[job_id] = {'id': job_id, 'status': 'queued', 'created': now, 'events': []}
+
+    def set_status(self, job_id: str, status: str):
+        with self._changed:
+            self._jobs[job_id]['status'] = status
+            self._changed.notify_all()
+
+    def add_event(self, job_id: str, event: str, data):
+        with self._changed:
+            job = self._jobs[job_id]
+            job['events'].append({'id': len(job['events']) + 1, 'event': event, 'data': data})
+            if event in TERMINAL_EVENTS:
+                job['status'] = event
+            self._changed.notify_all()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return dict(job, events=list(job['events']))
+
+    def wait_events(self, job_id: str, after: int, timeout: float) -> List[Dict]:
+        """Events with id > after, waiting up to timeout for one to arrive"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    return []
+                if len(job['events']) > after or job['status'] in TERMINAL_EVENTS:
+                    return job['events'][after:]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+
+
+class RedisJobStore:
+    """Job status, events and the queue of waiting jobs in Redis, shared by every worker process"""
+
+    shared_queue = True
+    QUEUE_KEY = 'cqa:jobs:queue'
+
+    def __init__(self, client, ttl: float = 3600, poll_interval: float = 0.2):
+        self.client = client
+        self.ttl = int(ttl)
+        self.poll_interval = poll_interval
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f'cqa:job:{job_id}'
+
+    def create(self, job_id: str):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={'status': 'queued', 'created': time.time()})
+        pipe.expire(key, self.ttl)
+        pipe.execute()
+
+    def delete(self, job_id: str):
+        self.client.delete(self._key(job_id), self._key(job_id) + ':events')
+
+    def enqueue(self, job_id: str, payload: Dict, limit: int) -> bool:
+        """Push the job onto the shared queue; False if limit jobs are already waiting"""
+        item = json.dumps({'id': job_id, 'payload': payload})
+        if self.client.rpush(self.QUEUE_KEY, item) > limit:
+            self.client.lrem(self.QUEUE_KEY, 1, item)
+            return False
+        return True
+
+    def dequeue(self, timeout: float) -> Optional[Tuple[str, Dict]]:
+        """(job id, payload) of the oldest waiting job, or None after timeout seconds"""
+        popped = self.client.blpop([self.QUEUE_KEY], timeout=max(1, int(timeout)))
+        if popped is None:
+            return None
+        job = json.loads(popped[1])
+        return job['id'], job['payload']
+
+    def set_status(self, job_id: str, status: str):
+        self.client.hset(self._key(job_id), 'status', status)
+
+    def add_event(self, job_id: str, event: str, data):
+        key = self._key(job_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key + ':events', json.dumps({'event': event, 'data': data}))
+        pipe.expire(key + ':events', self.ttl)
+        if event in TERMINAL_EVENTS:
+            pipe.hset(key, 'status', event)
+        pipe.execute()
+
+    def _events(self, job_id: str, after: int) -> List[Dict]:
+        raw = self.client.lrange(self._key(job_id) + ':events', after, -1)
+        return [dict(json.loads(item), id=after + i) for i, item in enumerate(raw, 1)]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        meta = self.client.hgetall(self._key(job_id))
+        if not meta:
+            return None
+        meta = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+                for k, v in meta.items()}
+        return {'id': job_id, 'status': meta['status'], 'created': float(meta['created']),
+                'events': self._events(job_id, 0)}
+
+    def wait_events(self, job_id: str, after: int, timeout: float) -> List[Dict]:
+        deadline = time.monotonic() + timeout
+        while True:
+            # Status before events: add_event pushes the terminal event and
+            # sets the status in one transaction, so a terminal status read
+            # first guarantees the lrange below sees that event
+            status = self.client.hget(self._key(job_id), 'status')
+            events = self._events(job_id, after)
+            if events:
+                return events
+            if status is None or status in (b'done', b'failed', 'done', 'failed'):
+                return []
+            if time.monotonic() >= deadline:
+                return []
+            time.sleep(self.poll_interval)
+
+
+class JobManager:
+    """Run analysis jobs in the background and report on them.
+
+    runner(payload, on_section) does the analysis: it calls
+    on_section(stage, fragment) as stages finish and returns the merged
+    result. With a store that has a shared queue, `workers` threads in every
+    process pull jobs from it; otherwise jobs run on this process's executor.
+    """
+
+    def __init__(self, runner: Callable[[Dict, Callable[[str, Dict], None]], Dict], store=None,
+                 workers: int = 2, queue_size: int = 16, logger: Optional[logging.Logger] = None,
+                 stream_seconds: float = 30):
+        self.runner = runner
+        self.store = store or MemoryJobStore()
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.stream_seconds = stream_seconds
+        # Running jobs plus queued jobs may never exceed workers + queue_size;
+        # a shared queue holds at most that many waiting jobs instead
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, queue_size))
+        self.logger = logger or logging.getLogger(__name__)
+        self._executor = None
+        self._pid = None
+        self._consumers_pid = None
+        self._lock = threading.Lock()
+        self._ensure_consumers()
+
+    @classmethod
+    def from_env(cls, runner, logger: Optional[logging.Logger] = None) -> 'JobManager':
+        """Configured from JOB_WORKERS, JOB_QUEUE, JOB_TTL, JOB_STREAM_SECONDS and JOBS_REDIS_URL.
+
+        Raises JobStoreUnavailable if WEB_CONCURRENCY says there is more than
+        one worker process but no Redis store can be used: status polls and
+        event streams would reach workers that never saw the job.
+        """
+        logger = logger or logging.getLogger(__name__)
+        ttl = float(os.environ.get('JOB_TTL', '3600'))
+        store = None
+        redis_url = os.environ.get('JOBS_REDIS_URL')
+        if redis_url:
+            if redis is None:
+                logger.warning('JOBS_REDIS_URL is set but the redis package is not installed; '
+                               'keeping jobs in memory')
+            else:
+                store = RedisJobStore(redis.Redis.from_url(redis_url), ttl=ttl)
+        processes = int(os.environ.get('WEB_CONCURRENCY', '1'))
+        if store is None and processes > 1:
+            raise JobStoreUnavailable(
+                f'analysis jobs need JOBS_REDIS_URL (and the redis package) with {processes} worker processes')
+        return cls(
+            runner,
+            store=store or MemoryJobStore(ttl=ttl),
+            workers=int(os.environ.get('JOB_WORKERS', '2')),
+            queue_size=int(os.environ.get('JOB_QUEUE', '16')),
+            logger=logger,
+            stream_seconds=float(os.environ.get('JOB_STREAM_SECONDS', '30')),
+        )
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created lazily, and again after a fork, so each gunicorn worker owns its threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _ensure_consumers(self):
+        # Started again after a fork, so every worker process pulls from the shared queue
+        if not self.store.shared_queue:
+            return
+        with self._lock:
+            if self._consumers_pid == os.getpid():
+                return
+            self._consumers_pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._consume, name=f'job-{i}', daemon=True).start()
+
+    def _consume(self):
+        while True:
+            try:
+                job = self.store.dequeue(timeout=5)
+            except Exception as e:
+                self.logger.error(f'Analysis job queue unavailable: {e}')
+                time.sleep(1)
+                continue
+            if job is not None:
+                self._run(*job)
+
+    def submit(self, payload: Dict) -> str:
+        """Queue an analysis and return its job id; raises JobQueueFull"""
+        if self.store.shared_queue:
+            self._ensure_consumers()
+            job_id = uuid.uuid4().hex
+            self.store.create(job_id)
+            if not self.store.enqueue(job_id, payload, self.workers + self.queue_size):
+                self.store.delete(job_id)
+                raise JobQueueFull('analysis job queue is full')
+            return job_id
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull('analysis job queue is full')
+        job_id = uuid.uuid4().hex
+        try:
+            self.store.create(job_id)
+            future = self.executor.submit(self._run, job_id, payload)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return job_id
+
+    def _run(self, job_id: str, payload: Dict):
+        self.store.set_status(job_id, 'running')
+        try:
+            result = self.runner(
+                payload,
+                lambda stage, fragment: self.store.add_event(job_id, 'section', {'stage': stage, 'data': fragment}),
+            )
+        except Exception as e:
+            self.logger.error(f'Analysis job {job_id} failed: {e}', exc_info=True)
+            self.store.add_event(job_id, 'failed', {'error': str(e)})
+        else:
+            self.store.add_event(job_id, 'done', result)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """The job's status, the sections finished so far and, once done, the result"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        report = {'id': job_id, 'status': job['status'], 'sections': {}}
+        for event in job['events']:
+            if event['event'] == 'section':
+                report['sections'].update(event['data']['data'])
+            elif event['event'] == 'done':
+                report['result'] = event['data']
+            elif event['event'] == 'failed':
+                report['error'] = event['data']['error']
+        return report
+
+    def stream(self, job_id: str, last_event_id: int = 0, heartbeat: float = 15) -> Iterator[str]:
+        """Server-Sent-Events text for the job, from last_event_id until it ends.
+
+        After stream_seconds the stream ends with a 'timeout' event carrying
+        the job's status; the client then polls the job instead.
+        """
+        after = last_event_id
+        deadline = time.monotonic() + self.stream_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                job = self.store.get(job_id)
+                status = job['status'] if job else 'unknown'
+                yield f"event: timeout\ndata: {json.dumps({'status': status})}\n\n"
+                return
+            events = self.store.wait_events(job_id, after, min(heartbeat, remaining))
+            if not events:
+                job = self.store.get(job_id)
+                if job is None:
+                    return
+                if job['status'] in TERMINAL_EVENTS:
+                    # The job may have ended since wait_events looked: send what it recorded
+                    events = [event for event in job['events'] if event['id'] > after]
+                    if not events:
+                        return
+            if not events:
+                if time.monotonic() >= deadline:
+                    continue
+                # Comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            for event in events:
+                after = event['id']
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                if event['event'] in TERMINAL_EVENTS:
+                    return
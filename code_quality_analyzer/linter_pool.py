@@ -0,0 +1,276 @@
+"""
+Worker pool for the external linters
+Each language gets a small set of long-lived worker threads with a bounded
+job queue. A worker keeps its own scratch workspace between jobs, so there
+is no temp-file churn per snippet and tools with on-disk state (cargo's
+target directory for clippy) stay warm across requests.
+
+Only linters with a resident server mode run warm: when a LinterDaemon's
+client is installed (eslint_d, rubocop --server) jobs go through it and the
+server is stopped after a timeout or crash so the next job starts a fresh
+one. Every other linter is still spawned once per job; for those the pool
+only bounds concurrency and reuses workspaces.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .metrics import LINTER_FAILURES, span
+
+
+_deadline = threading.local()
+
+
+@contextmanager
+def linter_deadline(seconds: float) -> Iterator[None]:
+    """Cap the timeout of every linter run by this thread for the next
+    seconds, so a stage that ran out of time stops instead of lingering"""
+    previous = getattr(_deadline, 'at', None)
+    _deadline.at = time.monotonic() + seconds
+    if previous is not None:
+        _deadline.at = min(_deadline.at, previous)
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+def linter_timeout(timeout: Optional[float]) -> Optional[float]:
+    """timeout, shortened to what is left of this thread's linter_deadline"""
+    at = getattr(_deadline, 'at', None)
+    if at is None:
+        return timeout
+    remaining = max(0.0, at - time.monotonic())
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+class LinterPoolFull(RuntimeError):
+    """Raised when a language's job queue is saturated"""
+    pass
+
+
+class LinterDaemon:
+    """Resident server mode of a linter, used instead of the plain command
+    when its client executable is on PATH"""
+
+    def __init__(self, executable: str, build_command: Callable[[str], List[str]],
+                 stop_command: List[str]):
+        self.executable = executable
+        self.build_command = build_command
+        self.stop_command = stop_command
+
+    def available(self) -> bool:
+        return shutil.which(self.executable) is not None
+
+    def stop(self, cwd: Optional[str] = None):
+        """Stop the server; the client starts a new one on the next job"""
+        try:
+            subprocess.run(self.stop_command, capture_output=True, timeout=10, cwd=cwd)
+        except Exception:
+            pass
+
+
+class _LanguageWorkers:
+    """Workers and bounded queue for a single language"""
+
+    def __init__(self, language: str, workers: int, queue_size: int, scaffold: Optional[Dict[str, str]] = None):
+        self.language = language
+        self.workers = workers
+        self.scaffold = scaffold or {}
+        self.queue_size = queue_size
+        # Running jobs plus waiting jobs may never exceed workers + queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._workspaces: List[str] = []
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._daemon_available: Optional[bool] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix=f'linter-{self.language}',
+        )
+
+    def _ensure_running(self):
+        # Threads don't survive fork (e.g. gunicorn --preload), so a pool
+        # inherited from the parent process is replaced with a fresh one. So
+        # are the slots: the parent's in-flight jobs never finish here to
+        # release theirs.
+        with self._lock:
+            if self._pid != os.getpid():
+                self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+                self._local = threading.local()
+                self._workspaces = []
+                self._start()
+
+    def _use_daemon(self, daemon: Optional[LinterDaemon]) -> bool:
+        if daemon is None:
+            return False
+        if self._daemon_available is None:
+            self._daemon_available = daemon.available()
+        return self._daemon_available
+
+    def submit(self, filename: str, source: str, build_command: Callable[[str], List[str]],
+               timeout: float, use_workspace_cwd: bool, daemon: Optional[LinterDaemon] = None):
+        self._ensure_running()
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            LINTER_FAILURES.inc(language=self.language, reason='queue_full')
+            raise LinterPoolFull(f'{self.language} linter queue is full')
+        try:
+            try:
+                future = self._executor.submit(
+                    self._run, filename, source, build_command, timeout, use_workspace_cwd, daemon)
+            except RuntimeError:
+                # Executor was shut down underneath us; restart it once
+                with self._lock:
+                    self._start()
+                future = self._executor.submit(
+                    self._run, filename, source, build_command, timeout, use_workspace_cwd, daemon)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _workspace(self) -> str:
+        workspace = getattr(self._local, 'workspace', None)
+        if workspace is None or not os.path.isdir(workspace):
+            workspace = tempfile.mkdtemp(prefix=f'cqa-{self.language}-')
+            for rel_path, content in self.scaffold.items():
+                path = os.path.join(workspace, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w', encoding='utf8') as fh:
+                    fh.write(content)
+            self._local.workspace = workspace
+            with self._lock:
+                self._workspaces.append(workspace)
+        return workspace
+
+    def _reset_workspace(self):
+        """Throw away the worker's workspace after a crash or timeout"""
+        workspace = getattr(self._local, 'workspace', None)
+        self._local.workspace = None
+        if workspace:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def _run(self, filename, source, build_command, timeout, use_workspace_cwd, daemon):
+        workspace = self._workspace()
+        cwd = workspace if use_workspace_cwd else None
+        if self._use_daemon(daemon):
+            build_command = daemon.build_command
+        else:
+            daemon = None
+        path = os.path.join(workspace, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf8') as fh:
+            fh.write(source)
+        try:
+            with span('linter', self.language):
+                proc = subprocess.run(
+                    build_command(path),
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout,
+                    cwd=cwd,
+                )
+        except FileNotFoundError:
+            # Linter not installed; the workspace is still fine
+            LINTER_FAILURES.inc(language=self.language, reason='not_installed')
+            raise
+        except subprocess.TimeoutExpired:
+            LINTER_FAILURES.inc(language=self.language, reason='timeout')
+            self._reset(daemon, cwd)
+            raise
+        except Exception:
+            LINTER_FAILURES.inc(language=self.language, reason='error')
+            self._reset(daemon, cwd)
+            raise
+        if proc.returncode < 0:
+            # Killed by a signal: start the next job from a clean workspace
+            LINTER_FAILURES.inc(language=self.language, reason='killed')
+            self._reset(daemon, cwd)
+        return proc
+
+    def _reset(self, daemon: Optional[LinterDaemon], cwd: Optional[str]):
+        if daemon is not None:
+            # A hung or dead server would fail every later job too
+            daemon.stop(cwd)
+        self._reset_workspace()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for workspace in self._workspaces:
+                shutil.rmtree(workspace, ignore_errors=True)
+            self._workspaces = []
+
+
+class LinterPool:
+    """Dispatch linter jobs to per-language workers"""
+
+    def __init__(self, workers: int = 2, queue_size: int = 8, timeout: float = 30):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self._languages: Dict[str, _LanguageWorkers] = {}
+        self._lock = threading.Lock()
+
+    def _workers_for(self, language: str, scaffold: Optional[Dict[str, str]]) -> _LanguageWorkers:
+        with self._lock:
+            workers = self._languages.get(language)
+            if workers is None:
+                workers = _LanguageWorkers(language, self.workers, self.queue_size, scaffold)
+                self._languages[language] = workers
+            return workers
+
+    def run(self, language: str, filename: str, source: str,
+            build_command: Callable[[str], List[str]],
+            use_workspace_cwd: bool = False,
+            scaffold: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None,
+            daemon: Optional[LinterDaemon] = None) -> subprocess.CompletedProcess:
+        """Write source to filename inside a worker's workspace, run the
+        command returned by build_command(path) and return its result. If
+        daemon's client is installed, its command is run instead.
+
+        Raises LinterPoolFull when the language's queue is saturated,
+        subprocess.TimeoutExpired when the job exceeds its timeout and
+        FileNotFoundError when the linter isn't installed.
+        """
+        timeout = linter_timeout(self.timeout if timeout is None else timeout)
+        future = self._workers_for(language, scaffold).submit(
+            filename, source, build_command, timeout, use_workspace_cwd, daemon)
+        return future.result()
+
+    def shutdown(self):
+        with self._lock:
+            languages = list(self._languages.values())
+            self._languages = {}
+        for workers in languages:
+            workers.shutdown()
+
+
+_LINTER_POOL = None
+_LINTER_POOL_LOCK = threading.Lock()
+
+
+def get_linter_pool() -> LinterPool:
+    """Process-wide pool, sized from LINTER_WORKERS, LINTER_QUEUE and LINTER_TIMEOUT"""
+    global _LINTER_POOL
+    with _LINTER_POOL_LOCK:
+        if _LINTER_POOL is None:
+            _LINTER_POOL = LinterPool(
+                workers=int(os.environ.get('LINTER_WORKERS', '2')),
+                queue_size=int(os.environ.get('LINTER_QUEUE', '8')),
+                timeout=float(os.environ.get('LINTER_TIMEOUT', '30')),
+            )
+        return _LINTER_POOL
@@ -0,0 +1,282 @@
+"""
+Pipeline metrics
+Timing spans, histograms and counters for the analysis stages, rendered
+in the Prometheus text format by the web app's /metrics endpoint.
+
+Every process keeps its own series in memory. With METRICS_DIR set, each
+process also snapshots them to METRICS_DIR/metrics-<pid>.json (at most
+every METRICS_FLUSH_INTERVAL seconds, and shortly after the last update,
+from a timer thread so requests never wait on the disk),
+and /metrics sums the snapshots of all processes, so any gunicorn worker
+reports for the whole server. Clear the directory when the server starts.
+
+Language labels go through language_label(), so a client sending made-up
+language names can't create new series.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# The languages the app offers; any other name is labelled 'other'
+LANGUAGE_LABELS = frozenset((
+    'python', 'javascript', 'typescript', 'java', 'cpp', 'csharp', 'go', 'rust', 'ruby', 'php',
+    'swift', 'kotlin', 'scala', 'html', 'css',
+))
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    def __init__(self, registry: 'MetricsRegistry', name: str, description: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, amount: float = 1, **labels):
+        self.registry._update(self, labels, amount)
+
+
+class Histogram(Counter):
+    def __init__(self, registry: 'MetricsRegistry', name: str, description: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        self.registry._update(self, labels, value)
+
+
+class MetricsRegistry:
+    """Series of one process, optionally shared through a directory"""
+
+    def __init__(self, directory: Optional[str] = None, flush_interval: float = 1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics: Dict[str, Counter] = {}
+        # name -> {label values: count} for counters,
+        # {label values: [per-bucket counts..., +Inf count, sum]} for histograms
+        self._series: Dict[str, Dict[Tuple[str, ...], object]] = {}
+        self._lock = threading.Lock()
+        # Serializes snapshot writes, so an older snapshot never replaces a newer one
+        self._write_lock = threading.Lock()
+        self._pid = os.getpid()
+        self._last_flush = 0.0
+        self._timer = None
+        # The flush timer takes the lock at any time; holding it across a
+        # fork means a child never inherits it mid-flush
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(before=self._lock.acquire, after_in_parent=self._lock.release,
+                                after_in_child=self._after_fork_in_child)
+
+    @classmethod
+    def from_env(cls) -> 'MetricsRegistry':
+        """Shared through METRICS_DIR if set, flushed every METRICS_FLUSH_INTERVAL seconds"""
+        return cls(os.environ.get('METRICS_DIR') or None,
+                   float(os.environ.get('METRICS_FLUSH_INTERVAL', '1')))
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, description, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+            self._series.setdefault(metric.name, {})
+        return metric
+
+    def _after_fork_in_child(self):
+        self._lock.release()
+        # The parent's timer may have been mid-write when it forked
+        self._write_lock = threading.Lock()
+
+    def _check_fork(self):
+        # A forked worker must not re-report what its parent recorded
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._series = {name: {} for name in self._metrics}
+            self._last_flush = 0.0
+            self._timer = None
+
+    def _update(self, metric: Counter, labels: Dict, value: float):
+        key = tuple(str(labels.get(name, '')) for name in metric.labelnames)
+        with self._lock:
+            self._check_fork()
+            series = self._series[metric.name]
+            if isinstance(metric, Histogram):
+                counts = series.get(key)
+                if counts is None:
+                    counts = series[key] = [0] * (len(metric.buckets) + 1) + [0.0]
+                # First bucket whose upper bound is >= value; len(buckets) is +Inf
+                counts[bisect_left(metric.buckets, value)] += 1
+                counts[-1] += value
+            else:
+                series[key] = series.get(key, 0) + value
+            if self.directory:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        # Called with the lock held; only ever starts the timer, which does the writing
+        if self._timer is None:
+            wait = max(0.0, self._last_flush + self.flush_interval - time.monotonic())
+            self._timer = threading.Timer(wait, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _snapshot(self) -> Dict[str, List]:
+        # Called with the lock held; copies, as histogram counts change in place
+        return {name: [[list(key), list(value) if isinstance(value, list) else value]
+                       for key, value in series.items()]
+                for name, series in self._series.items()}
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def _write_snapshot(self, snapshot: Dict[str, List], pid: int):
+        # Called without the lock, so updates carry on during the write
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(pid)
+            tmp = f'{path}.{threading.get_ident()}.tmp'
+            with open(tmp, 'w', encoding='utf8') as fh:
+                json.dump(snapshot, fh)
+            # Atomic, so a reader never sees a half-written file
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def flush(self):
+        """Write this process's snapshot now (no-op without a directory)"""
+        if not self.directory:
+            return
+        with self._lock:
+            self._check_fork()
+            write_lock = self._write_lock
+        with write_lock:
+            with self._lock:
+                self._last_flush = time.monotonic()
+                self._timer = None
+                snapshot, pid = self._snapshot(), self._pid
+            self._write_snapshot(snapshot, pid)
+
+    def _collect(self) -> Dict[str, Dict[Tuple[str, ...], object]]:
+        """Series summed over this process and every other process's snapshot"""
+        with self._lock:
+            self._check_fork()
+            merged = {name: {key: list(value) if isinstance(value, list) else value
+                             for key, value in series.items()}
+                      for name, series in self._series.items()}
+            own = self._path(self._pid) if self.directory else None
+        if not self.directory:
+            return merged
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path, 'r', encoding='utf8') as fh:
+                    snapshot = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for name, entries in snapshot.items():
+                if name not in merged:
+                    continue
+                series = merged[name]
+                for key, value in entries:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        current = series.get(key)
+                        series[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        series[key] = series.get(key, 0) + value
+        return merged
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        merged = self._collect()
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+            lines.append(f'# HELP {name} {metric.description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = [f'{label}="{_escape(v)}"' for label, v in zip(metric.labelnames, key)]
+                if kind == 'counter':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _number(bound)
+                    bucket_labels = labels + ['le="' + le + '"']
+                    lines.append(f'{name}_bucket{_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels: List[str]) -> str:
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+REGISTRY = MetricsRegistry.from_env()
+atexit.register(REGISTRY.flush)
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'cqa_stage_duration_seconds', 'Time spent in each analysis stage', ('stage', 'language'))
+STAGE_ERRORS = REGISTRY.counter(
+    'cqa_stage_errors_total', 'Analysis stages that raised', ('stage', 'language'))
+CACHE_REQUESTS = REGISTRY.counter(
+    'cqa_cache_requests_total', 'Result cache lookups by outcome', ('result',))
+LINTER_FAILURES = REGISTRY.counter(
+    'cqa_linter_failures_total', 'Linter runs that did not produce a report', ('language', 'reason'))
+DEGRADED_ANALYSES = REGISTRY.counter(
+    'cqa_degraded_analyses_total', 'Analyses run with the fast profile', ('language', 'reason'))
+
+
+def language_label(language: str) -> str:
+    """language as a metric label: one of LANGUAGE_LABELS, 'other', or '' for none"""
+    language = (language or '').lower()
+    return language if not language or language in LANGUAGE_LABELS else 'other'
+
+
+@contextmanager
+def span(stage: str, language: str = '') -> Iterator[None]:
+    """Time the block into cqa_stage_duration_seconds{stage, language}"""
+    language = language_label(language)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage, language=language)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, stage=stage, language=language)
+
+
+def timed(stage: str, language: str, fn: Callable) -> Callable:
+    """fn wrapped in a span"""
+    def wrapper(*args, **kwargs):
+        with span(stage, language):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -1,21 +1,17 @@
 import os
 import csv
-from typing import Tuple
-try:
-    import pandas as pd
-    PANDAS_AVAILABLE = True
-except ImportError:
-    PANDAS_AVAILABLE = False
-    pd = None
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.linear_model import LogisticRegression
-from sklearn.pipeline import FeatureUnion
-from sklearn.preprocessing import StandardScaler
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
-from joblib import dump, load
-import numpy as np
+import hashlib
+import threading
+from collections import OrderedDict
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+# pandas, numpy, scikit-learn and joblib take over a second to import, so
+# they are imported inside the functions that need them; importing this
+# module (as the CLI and every web worker do) stays cheap
+PANDAS_AVAILABLE = find_spec('pandas') is not None
+if TYPE_CHECKING:
+    import numpy as np
+from .metrics import span
 from .parser import ASTFeatureExtractor
 
 
@@ -37,6 +33,7 @@ def extract_numeric_features(src: str) -> dict:
 def load_dataset(path: str):
     """Load dataset from CSV. Returns dict with 'code' and 'label' lists."""
     if PANDAS_AVAILABLE:
+        import pandas as pd
         df = pd.read_csv(path)
         # convert literal "\\n" sequences to real newlines
         if 'code' in df.columns:
@@ -62,8 +59,10 @@ def load_dataset(path: str):
         return SimpleDataFrame(data)
 
 
-def featurize_dataframe(df) -> Tuple[dict, np.ndarray]:
+def featurize_dataframe(df) -> Tuple[dict, 'np.ndarray']:
     """Extract features from dataset (works with pandas DataFrame or SimpleDataFrame)"""
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
     # numeric features
     numeric_features = []
     for src in df['code']:
@@ -85,6 +84,10 @@ def featurize_dataframe(df) -> Tuple[dict, np.ndarray]:
 
 def train_model(df, output_path: str):
     """Train model on dataset (works with pandas DataFrame or SimpleDataFrame)"""
+    from joblib import dump
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
     components, y = featurize_dataframe(df)
     numeric = components['numeric']
     tokens, vect = components['tokens']
@@ -110,20 +113,149 @@ def train_model(df, output_path: str):
 
 
 def load_model(path: str):
+    from joblib import load
     data = load(path)
     return data['model'], data['vectorizer'], data['scaler']
 
 
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models, keyed by file path.
+
+    Each path is unpickled once and kept in memory. A cheap stat() on every
+    lookup notices when the file is replaced: if mtime or size changed the
+    file is re-hashed and only reloaded when its content actually differs.
+    Hashing and loading happen outside the registry lock, one thread per
+    path, so a slow load never holds up lookups of other models. Least
+    recently used models and hashes are evicted beyond max_models.
+    """
+
+    def __init__(self, max_models: int = 4):
+        self.max_models = max(1, max_models)
+        self._entries = OrderedDict()
+        self._hashes = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str):
+        """Return (model, vectorizer, scaler) for path, loading it if needed"""
+        return self._entry(path)['model']
+
+    def model_hash(self, path: str) -> str:
+        """SHA-256 of the model file at path, without unpickling it"""
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        return self._hash(key, (st.st_mtime_ns, st.st_size))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hashes.clear()
+
+    def _hash(self, key: str, stamp) -> str:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['stamp'] == stamp:
+                return entry['hash']
+            cached = self._hashes.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._hashes.move_to_end(key)
+                return cached[1]
+        digest = _file_hash(key)
+        with self._lock:
+            self._hashes[key] = (stamp, digest)
+            self._hashes.move_to_end(key)
+            while len(self._hashes) > self.max_models:
+                self._hashes.popitem(last=False)
+        return digest
+
+    def _cached(self, key: str, stamp) -> Optional[dict]:
+        # Caller holds self._lock
+        entry = self._entries.get(key)
+        if entry is None or entry['stamp'] != stamp:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _entry(self, path: str) -> dict:
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._cached(key, stamp)
+            if entry is not None:
+                return entry
+            guard = self._loading.setdefault(key, threading.Lock())
+        with guard:
+            try:
+                return self._load(key, stamp)
+            finally:
+                with self._lock:
+                    if self._loading.get(key) is guard:
+                        del self._loading[key]
+
+    def _load(self, key: str, stamp) -> dict:
+        # Caller holds the path's load guard
+        with self._lock:
+            # Loaded by the thread we waited for
+            entry = self._cached(key, stamp)
+            if entry is not None:
+                return entry
+            entry = self._entries.get(key)
+        digest = self._hash(key, stamp)
+        if entry is None or entry['hash'] != digest:
+            with span('ml.load', 'python'):
+                model = load_model(key)
+            entry = {'model': model, 'hash': digest, 'stamp': stamp}
+        else:
+            # Rewritten with the same bytes: keep the loaded model
+            entry = dict(entry, stamp=stamp)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_models:
+                self._entries.popitem(last=False)
+        return entry
+
+
+_MODEL_REGISTRY = ModelRegistry(int(os.environ.get('MODEL_CACHE_SIZE', '4')))
+
+
+def get_model_registry() -> ModelRegistry:
+    return _MODEL_REGISTRY
+
+
 def predict_code_quality(code: str, model_path: str):
-    model, vect, scaler = load_model(model_path)
-    numeric = np.array([list(extract_numeric_features(code).values())])
-    numeric_scaled = scaler.transform(numeric)
-    tokens = vect.transform([code])
+    return predict_code_quality_batch([code], model_path)[0]
+
+
+def predict_code_quality_batch(codes: List[str], model_path: str) -> List[Tuple[str, float]]:
+    """Classify many snippets with one vectorizer/scaler/model pass.
+
+    Returns a (label, confidence) pair per input, in input order.
+    """
+    if not codes:
+        return []
+    import numpy as np
     from scipy.sparse import hstack
-    X = hstack([tokens, numeric_scaled])
-    pred = model.predict(X)[0]
-    prob = model.predict_proba(X).max()
-    return pred, float(prob)
+    model, vect, scaler = _MODEL_REGISTRY.get(model_path)
+    with span('ml.predict', 'python'):
+        numeric = np.array([list(extract_numeric_features(code).values()) for code in codes])
+        numeric_scaled = scaler.transform(numeric)
+        tokens = vect.transform(codes)
+        X = hstack([tokens, numeric_scaled]).tocsr()
+        proba = model.predict_proba(X)
+        best = proba.argmax(axis=1)
+        labels = model.classes_[best]
+        confidences = proba[np.arange(len(codes)), best]
+    return [(label, float(conf)) for label, conf in zip(labels, confidences)]
 
 
 def compute_quality_score(label, confidence, smells):
@@ -0,0 +1,46 @@
+"""
+Newline-delimited JSON output
+One compact JSON record per line, written and flushed as soon as it is
+ready, so a consumer can start reading before a large run finishes and
+the writer never holds more than one record.
+"""
+import json
+from typing import Dict, IO, Iterable, Iterator
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def ndjson_line(record: Dict) -> str:
+    """record as a single line of JSON, newline included"""
+    # Compact separators; json.dumps escapes newlines inside strings
+    return json.dumps(record, separators=(',', ':'), default=str) + '\n'
+
+
+class NDJSONWriter:
+    """Write records to a text stream as NDJSON, flushing after each one"""
+
+    def __init__(self, stream: IO[str], flush: bool = True):
+        self.stream = stream
+        self.flush = flush
+        self.records = 0
+
+    def write(self, record: Dict):
+        self.stream.write(ndjson_line(record))
+        if self.flush:
+            self.stream.flush()
+        self.records += 1
+
+    def write_all(self, records: Iterable[Dict]) -> int:
+        """Write every record; returns how many were written"""
+        for record in records:
+            self.write(record)
+        return self.records
+
+    def close(self):
+        self.stream.flush()
+
+
+def iter_ndjson(records: Iterable[Dict]) -> Iterator[str]:
+    """NDJSON lines for a streamed (chunked) HTTP response"""
+    for record in records:
+        yield ndjson_line(record)
@@ -0,0 +1,266 @@
+"""
+Analysis orchestrator
+Runs the independent stages of an analysis (smells, ML, complexity,
+security, auto-fix) concurrently on a shared pool and merges the results
+into the analysis dict rendered by the web app.
+
+A degraded analysis runs the fast profile instead: in-process smell
+detection, complexity and (if enabled) the compiled security scan, with no
+linters, ML or auto-fix, so its latency stays bounded for huge inputs or
+under load. The analysis dict's 'degraded' entry says why and which
+sections are partial or skipped.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from .detectors import LINTED_LANGUAGES, RuleBasedDetector
+from .linter_pool import linter_deadline
+from .suggestion_engine import suggestions_for_smells
+from .metrics import DEGRADED_ANALYSES, language_label, span, timed
+from .quality_scorer import QualityScorer
+from .source_buffer import SourceBuffer
+
+
+class StageTimeout(Exception):
+    """Raised for a stage that didn't finish within the stage timeout"""
+    pass
+
+
+class AnalysisOrchestrator:
+    """Run analysis stages in parallel on a shared thread pool.
+
+    Threads fit the workload: most stage time is spent waiting on linter
+    subprocesses, and the pool is shared by every request in the process.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, stage_timeout: Optional[float] = None):
+        self.max_workers = max_workers or int(os.environ.get('ANALYSIS_WORKERS', '8'))
+        self.stage_timeout = stage_timeout or float(os.environ.get('STAGE_TIMEOUT', '60'))
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created lazily, and again after a fork, so each gunicorn worker owns its threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='analysis')
+                self._pid = os.getpid()
+            return self._executor
+
+    def run_stages(self, stages: Dict[str, Callable[[], Any]],
+                   on_error: Dict[str, Callable[[Exception], Any]],
+                   timeout: Optional[float] = None,
+                   on_result: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+        """Run every stage concurrently and return {name: result}.
+
+        A stage that raises, or that is still running timeout seconds after
+        it started, is replaced by on_error[name](exc); the other stages are
+        unaffected. Time spent waiting for a pool thread doesn't count, and
+        the linters a stage runs are cut off at its deadline, so a timed-out
+        stage gives its thread back instead of running on. on_result(name,
+        result) is called from the calling thread as each stage finishes.
+        """
+        timeout = self.stage_timeout if timeout is None else timeout
+        executor = self.executor
+        futures = {}
+        starts = {}
+        for name, fn in stages.items():
+            started = Future()
+            futures[executor.submit(_run_stage, fn, timeout, started)] = name
+            starts[started] = name
+        deadlines = {}
+        results = {}
+
+        def finish(name, result):
+            results[name] = result
+            if on_result is not None:
+                on_result(name, result)
+
+        running = set(futures)
+        pending = running | set(starts)
+        while running:
+            times = [deadlines[futures[f]] for f in running if futures[f] in deadlines]
+            wait_for = max(0.0, min(times) - time.monotonic()) if times else None
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in starts:
+                    deadlines[starts[future]] = future.result() + timeout
+                    continue
+                running.discard(future)
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = on_error[name](e)
+                finish(name, result)
+            now = time.monotonic()
+            expired = [f for f in running if futures[f] in deadlines and deadlines[futures[f]] <= now]
+            for future in expired:
+                running.discard(future)
+                pending.discard(future)
+                name = futures[future]
+                finish(name, on_error[name](StageTimeout(f'{name} timed out after {timeout:g}s')))
+        # Same order as the stages were given in
+        return {name: results[name] for name in stages}
+
+
+def _run_stage(fn: Callable[[], Any], timeout: float, started: Future) -> Any:
+    # The stage's clock starts here, on its pool thread, not when it was queued
+    started.set_result(time.monotonic())
+    with linter_deadline(timeout):
+        return fn()
+
+
+_ORCHESTRATOR = AnalysisOrchestrator()
+
+
+def get_orchestrator() -> AnalysisOrchestrator:
+    return _ORCHESTRATOR
+
+
+def run_analysis(code: str, lang: str, enable_autofix: bool = False, enable_security: bool = False,
+                 model_path: Optional[str] = None, logger: Optional[logging.Logger] = None,
+                 orchestrator: Optional[AnalysisOrchestrator] = None,
+                 on_section: Optional[Callable[[str, Dict], None]] = None,
+                 degraded: Optional[str] = None) -> Dict:
+    """Full web analysis of one snippet; returns the dict the template renders.
+
+    If given, on_section(stage, fragment) is called as each stage finishes,
+    with the keys that stage contributes to the analysis dict. With
+    degraded set (the reason, e.g. 'large_input' or 'load') the fast
+    profile runs instead of every stage.
+    """
+    logger = logger or logging.getLogger(__name__)
+    orchestrator = orchestrator or _ORCHESTRATOR
+    # Line index shared by every line-oriented stage
+    with span('parse', lang):
+        buffer = SourceBuffer(code)
+
+    def detect_smells():
+        detector = RuleBasedDetector()
+        if degraded:
+            return detector.detect_fast(buffer, lang)
+        return detector.detect_all_languages(buffer, lang)
+
+    def classify():
+        if model_path and os.path.exists(model_path):
+            from .ml_classifier import predict_code_quality
+            try:
+                label, prob = predict_code_quality(code, model_path)
+                return {'label': label, 'confidence': prob}
+            except Exception as e:
+                return {'error': f'ML prediction failed: {str(e)}'}
+        if model_path:
+            return {'error': f'Model file not found: {model_path}'}
+        return None
+
+    def analyze_complexity():
+        from .universal_complexity import UniversalComplexityAnalyzer
+        complexity_analyzer = UniversalComplexityAnalyzer(language=lang)
+        return complexity_analyzer.analyze(buffer)
+
+    def scan_security():
+        from .universal_security import UniversalSecurityScanner
+        security_scanner = UniversalSecurityScanner(language=lang)
+        return security_scanner.scan(buffer)
+
+    def auto_fix():
+        from .universal_autofixer import UniversalAutoFixer
+        auto_fixer = UniversalAutoFixer(language=lang)
+        fixed_code, fixes = auto_fixer.fix_all(buffer)
+        return {'fixed_code': fixed_code, 'fixes': fixes}
+
+    errors = {}
+
+    def smells_failed(e):
+        logger.error(f'Smell detection error: {e}')
+        errors['smells'] = f'Smell detection failed: {str(e)}'
+        return []
+
+    def ml_failed(e):
+        return {'error': f'ML prediction failed: {str(e)}'}
+
+    def complexity_failed(e):
+        logger.error(f'Complexity analysis error: {e}')
+        return {'error': f'Complexity analysis failed: {str(e)}'}
+
+    def security_failed(e):
+        logger.error(f'Security scan error: {e}')
+        return {'error': f'Security scan failed: {str(e)}', 'vulnerabilities': []}
+
+    def auto_fix_failed(e):
+        logger.error(f'Auto-fix error: {e}')
+        return {'error': f'Auto-fix failed: {str(e)}', 'fixes': []}
+
+    stages = {'smells': detect_smells, 'ml': classify, 'complexity': analyze_complexity}
+    on_error = {'smells': smells_failed, 'ml': ml_failed, 'complexity': complexity_failed}
+    if enable_security:
+        stages['security'] = scan_security
+        on_error['security'] = security_failed
+    if enable_autofix:
+        stages['auto_fix'] = auto_fix
+        on_error['auto_fix'] = auto_fix_failed
+    skipped = []
+    if degraded:
+        DEGRADED_ANALYSES.inc(language=language_label(lang), reason=degraded)
+        if model_path:
+            skipped.append('ml_classification')
+        if enable_autofix:
+            skipped.append('auto_fix')
+        for name in ('ml', 'auto_fix'):
+            stages.pop(name, None)
+
+    def stage_done(name, result):
+        if name == 'smells':
+            fragment = {'smells': [s.to_dict() for s in result], 'suggestions': suggestions_for_smells(result)}
+        elif name == 'ml':
+            fragment = {'ml_classification': result}
+        else:
+            fragment = {name: result}
+        on_section(name, fragment)
+
+    # Each stage is timed on the thread that runs it
+    stages = {name: timed(name, lang, fn) for name, fn in stages.items()}
+    results = orchestrator.run_stages(stages, on_error, on_result=stage_done if on_section else None)
+    smells = results['smells']
+    complexity_data = results['complexity']
+    security_data = results.get('security')
+    auto_fix_report = results.get('auto_fix')
+
+    quality_scorer = QualityScorer()
+    with span('scoring', lang):
+        quality_score_data = quality_scorer.calculate_score(
+            smells,
+            complexity_data,
+            security_data,
+            auto_fix_report
+        )
+
+    analysis = {
+        'smells': [s.to_dict() for s in smells],
+        'suggestions': suggestions_for_smells(smells),
+        'ml_classification': results.get('ml'),
+        'quality_score': quality_score_data.get('total_score', 75),
+        'quality_details': quality_score_data,
+        'complexity': complexity_data,
+        'security': security_data,
+        'auto_fix': auto_fix_report,
+    }
+    if errors:
+        analysis['errors'] = errors
+    if degraded:
+        if enable_autofix:
+            analysis['auto_fix'] = {'info': 'Auto-fix is skipped in fast mode', 'fixes': []}
+        analysis['degraded'] = {
+            'reason': degraded,
+            'partial': ['smells'] if lang in LINTED_LANGUAGES else [],
+            'skipped': skipped,
+        }
+    return analysis
@@ -0,0 +1,109 @@
+"""
+Opt-in profiling of a single analysis
+Runs a callable under cProfile and tracemalloc and reports the functions
+with the most cumulative time and the allocation sites holding the most
+memory, optionally dumping the raw profile as a .pstats file for
+snakeviz/pstats.
+
+Profiled runs are serialized by a process-wide lock: tracemalloc is global
+to the interpreter and profiling slows the analysis down several times,
+so one profiled run at a time is all a worker should carry.
+
+cProfile only sees the calling thread; profile code that runs inline, not
+code that fans out to the orchestrator's pool.
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_PROFILE_LOCK = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when another profiled run holds the profiler"""
+    pass
+
+
+def top_functions(stats: pstats.Stats, limit: int) -> List[Dict]:
+    """The limit functions with the most cumulative time"""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        'function': name,
+        'file': filename,
+        'line': line,
+        'calls': calls,
+        'primitive_calls': primitive,
+        'total_time': round(total, 6),
+        'cumulative_time': round(cumulative, 6),
+    } for (filename, line, name), (primitive, calls, total, cumulative, _) in rows]
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> List[Dict]:
+    """The limit source lines holding the most memory allocated during the run"""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    return [{
+        'file': stat.traceback[0].filename,
+        'line': stat.traceback[0].lineno,
+        'size_bytes': stat.size,
+        'count': stat.count,
+    } for stat in snapshot.statistics('lineno')[:limit]]
+
+
+def profile_call(fn: Callable[[], Any], limit: int = 25, pstats_path: Optional[str] = None,
+                 blocking: bool = True) -> Tuple[Any, Dict]:
+    """Run fn() under cProfile and tracemalloc; returns (fn's result, report).
+
+    With blocking=False raises ProfilerBusy instead of waiting for another
+    profiled run. With pstats_path the raw profile is dumped there too.
+    """
+    if not _PROFILE_LOCK.acquire(blocking=blocking):
+        raise ProfilerBusy('another profiled analysis is running')
+    try:
+        # Someone else (e.g. PYTHONTRACEMALLOC) may already be tracing
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            result = fn()
+        finally:
+            profiler.disable()
+            wall = time.perf_counter() - start
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+    finally:
+        _PROFILE_LOCK.release()
+
+    stats = pstats.Stats(profiler)
+    report = {
+        'wall_time': round(wall, 6),
+        'peak_memory_bytes': peak,
+        'top_functions': top_functions(stats, limit),
+        'top_allocations': top_allocations(snapshot, limit),
+    }
+    if pstats_path:
+        stats.dump_stats(pstats_path)
+        report['pstats_file'] = pstats_path
+    return result, report
+
+
+def pstats_path_from_env() -> Optional[str]:
+    """A fresh .pstats file name under PROFILE_DIR, or None if it isn't set"""
+    directory = os.environ.get('PROFILE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.pstats")
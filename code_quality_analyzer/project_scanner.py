@@ -0,0 +1,186 @@
+"""
+Repository-scale analysis
+Walks a source tree, detects each file's language and analyzes the files
+on a process pool. Each worker process keeps its own RuleBasedDetector
+and loaded model; per-file results are folded into a project report.
+"""
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .detectors import RuleBasedDetector
+from .parser import detect_language
+from .source_buffer import SourceBuffer
+from .suggestion_engine import suggestions_for_smells
+
+# Directories that never hold first-party sources
+SKIP_DIRS = {
+    '.git', '.hg', '.svn', '__pycache__', 'node_modules', '.venv', 'venv',
+    '.tox', '.mypy_cache', '.pytest_cache', 'build', 'dist', 'target',
+}
+
+
+def iter_source_files(root: str) -> Iterator[Tuple[str, str]]:
+    """Yield (path, language) for every supported file under root, in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS and not d.startswith('.'))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            language = detect_language(path)
+            if language != 'unknown':
+                yield path, language
+
+
+def analyze_source(path: str, source: str, language: str, detector: RuleBasedDetector,
+                   model_path: Optional[str] = None, prediction: Optional[Dict] = None,
+                   detailed: bool = False) -> Dict:
+    """Analyze one file's source; the per-file record of a project report.
+
+    prediction is an ml_classification computed by the caller (e.g. in one
+    batch for many files), used instead of classifying with model_path.
+    detailed adds the QualityScorer breakdown as quality_details.
+    """
+    from .ml_classifier import compute_quality_score
+    from .universal_complexity import UniversalComplexityAnalyzer
+    from .universal_security import UniversalSecurityScanner
+
+    buffer = SourceBuffer(source)
+    smells = detector.detect_all_languages(buffer, language)
+    complexity = UniversalComplexityAnalyzer(language=language).analyze(buffer)
+    # Per-line heatmaps are for the web UI; they'd dominate a project report
+    complexity.pop('heatmap_rle', None)
+    result = {
+        'file': path,
+        'language': language,
+        'smells': [s.to_dict() for s in smells],
+        'suggestions': suggestions_for_smells(smells),
+        'complexity': complexity,
+        'security': UniversalSecurityScanner(language=language).scan(buffer),
+    }
+    label, prob = None, None
+    if prediction is not None:
+        result['ml_classification'] = prediction
+        label, prob = prediction.get('label'), prediction.get('confidence')
+    # The classifier's numeric features come from the Python AST
+    elif model_path and language == 'python':
+        from .ml_classifier import predict_code_quality
+        try:
+            label, prob = predict_code_quality(source, model_path)
+            result['ml_classification'] = {'label': label, 'confidence': prob}
+        except Exception as e:
+            result['ml_classification'] = {'error': str(e)}
+    result['quality_score'] = compute_quality_score(label, prob, smells)
+    if detailed:
+        from .quality_scorer import QualityScorer
+        result['quality_details'] = QualityScorer().calculate_score(smells, complexity, result['security'])
+    return result
+
+
+# Per-process state set up by _init_worker
+_WORKER = {}
+
+
+def _init_worker(model_path: Optional[str]):
+    _WORKER['detector'] = RuleBasedDetector()
+    _WORKER['model_path'] = model_path
+    if model_path and os.path.exists(model_path):
+        from .ml_classifier import get_model_registry
+        try:
+            get_model_registry().get(model_path)
+        except Exception:
+            # predict_code_quality will report the error per file
+            pass
+
+
+def analyze_path(item: Tuple[str, str]) -> Dict:
+    """Read and analyze one (path, language) item inside a worker"""
+    path, language = item
+    if 'detector' not in _WORKER:
+        _init_worker(None)
+    try:
+        # utf-8-sig drops a leading BOM, which ast.parse rejects
+        with open(path, 'r', encoding='utf-8-sig') as fh:
+            source = fh.read()
+        return analyze_source(path, source, language, _WORKER['detector'], _WORKER['model_path'])
+    except Exception as e:
+        return {'file': path, 'language': language, 'error': f'{type(e).__name__}: {e}'}
+
+
+def scan_files(files: Iterable[Tuple[str, str]], model_path: Optional[str] = None,
+               workers: Optional[int] = None, chunksize: int = 8) -> Iterator[Dict]:
+    """Analyze (path, language) items on a process pool, yielding results in input order"""
+    files = list(files)
+    if workers == 1 or len(files) <= 1:
+        _init_worker(model_path)
+        for item in files:
+            yield analyze_path(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path,)) as executor:
+        # Chunking amortizes pickling/IPC over several small files per task
+        yield from executor.map(analyze_path, files, chunksize=max(1, chunksize))
+
+
+def scan_directory(root: str, model_path: Optional[str] = None,
+                   workers: Optional[int] = None, chunksize: int = 8) -> Iterator[Dict]:
+    """Analyze every supported file under root"""
+    return scan_files(iter_source_files(root), model_path, workers, chunksize)
+
+
+class ProjectSummary:
+    """Aggregate per-file results incrementally into project-level totals"""
+
+    def __init__(self, worst_files: int = 10):
+        self.files = 0
+        self.failed = 0
+        self.languages: Dict[str, int] = {}
+        self.smells_by_kind: Dict[str, int] = {}
+        self.total_smells = 0
+        self.vulnerabilities: Dict[str, int] = {}
+        self.total_vulnerabilities = 0
+        self._score_sum = 0.0
+        self._scored = 0
+        self._worst_limit = worst_files
+        self._worst: List[Tuple[float, str]] = []
+
+    def add(self, result: Dict):
+        self.files += 1
+        language = result.get('language', 'unknown')
+        self.languages[language] = self.languages.get(language, 0) + 1
+        if 'error' in result:
+            self.failed += 1
+            return
+        for smell in result.get('smells', []):
+            kind = smell.get('kind', 'unknown')
+            self.smells_by_kind[kind] = self.smells_by_kind.get(kind, 0) + 1
+            self.total_smells += 1
+        for vuln in (result.get('security') or {}).get('vulnerabilities', []):
+            severity = vuln.get('severity', 'MEDIUM')
+            self.vulnerabilities[severity] = self.vulnerabilities.get(severity, 0) + 1
+            self.total_vulnerabilities += 1
+        score = result.get('quality_score')
+        if score is not None:
+            self._score_sum += score
+            self._scored += 1
+            # Bounded heap of the lowest scores; its root is the best file kept so far
+            entry = (-score, result['file'])
+            if len(self._worst) < self._worst_limit:
+                heapq.heappush(self._worst, entry)
+            elif entry > self._worst[0]:
+                heapq.heapreplace(self._worst, entry)
+
+    def to_dict(self) -> Dict:
+        return {
+            'files': self.files,
+            'failed': self.failed,
+            'languages': self.languages,
+            'total_smells': self.total_smells,
+            'smells_by_kind': self.smells_by_kind,
+            'total_vulnerabilities': self.total_vulnerabilities,
+            'vulnerabilities_by_severity': self.vulnerabilities,
+            'average_quality_score': round(self._score_sum / self._scored, 2) if self._scored else None,
+            'worst_files': [
+                {'file': path, 'quality_score': -neg_score}
+                for neg_score, path in sorted(self._worst, reverse=True)
+            ],
+        }
@@ -79,6 +79,37 @@ class QualityScorer:
             )
         }
     
+    def aggregate(self, reports: List[Dict]) -> Dict:
+        """Combine per-file calculate_score() results into one summary"""
+        if not reports:
+            return {'files': 0, 'total_score': None, 'grade': None, 'grades': {}, 'components': {}, 'recommendations': []}
+        
+        components = {}
+        for name in self.weights:
+            scores = [r['components'][name]['score'] for r in reports]
+            components[name] = {
+                'score': round(sum(scores) / len(scores), 2),
+                'min': round(min(scores), 2),
+                'weight': self.weights[name]
+            }
+        
+        grades = {}
+        for r in reports:
+            grades[r['grade']] = grades.get(r['grade'], 0) + 1
+        
+        total_score = sum(r['total_score'] for r in reports) / len(reports)
+        return {
+            'files': len(reports),
+            'total_score': round(total_score, 2),
+            'grade': self._score_to_grade(total_score),
+            'grades': grades,
+            'components': components,
+            'recommendations': self._generate_recommendations(
+                *(components[name]['score'] for name in
+                  ('style', 'maintainability', 'complexity', 'security', 'documentation'))
+            )
+        }
+    
     def _calculate_style_score(self, smells: List, auto_fix_report: Dict) -> float:
         """Calculate PEP8 compliance score"""
         if not smells:
@@ -0,0 +1,177 @@
+"""
+Content-addressed cache for whole analyses
+Results are keyed by a hash of everything that can change them: the
+source, the language, the enabled options, the analyzer version and the
+model file's stamp. An in-memory LRU tier serves repeat submissions within a
+worker; an optional SQLite tier (ANALYSIS_CACHE_DB) is shared between
+gunicorn workers.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from . import __version__
+from .metrics import CACHE_REQUESTS
+
+
+def model_fingerprint(model_path: Optional[str]) -> Optional[str]:
+    """Stamp of the model file at model_path, or None without a readable model.
+
+    The stamp is the file's real path, size and mtime, so it is cheap to
+    compute on every request; a directory, device or unreadable path has
+    none, and the ML stage reports the error itself.
+    """
+    if not model_path:
+        return None
+    try:
+        path = os.path.realpath(model_path)
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f'{path}:{st.st_size}:{st.st_mtime_ns}'
+
+
+class ResultCache:
+    """Two-tier (memory LRU + optional SQLite) cache of analysis dicts"""
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None, max_disk_entries: int = 10000):
+        self.max_entries = max(0, max_entries)
+        self.db_path = db_path
+        self.max_disk_entries = max_disk_entries
+        # Values are stored serialized so cached results can't be mutated by callers
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS results ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+                )
+
+    @staticmethod
+    def make_key(source: str, language: str, options: Dict, model_hash: Optional[str] = None) -> str:
+        payload = json.dumps({
+            'source': source,
+            'language': language,
+            'options': options,
+            'version': __version__,
+            'model': model_hash,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf8')).hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+        if value is None and self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                value = row[0]
+                self._remember(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(result='miss')
+                return None
+            self.hits += 1
+            CACHE_REQUESTS.inc(result='hit')
+        return json.loads(value)
+
+    def put(self, key: str, result: Dict):
+        value = json.dumps(result)
+        self._remember(key, value)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        'INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)',
+                        (key, value, time.time()))
+                    self._puts += 1
+                    if self._puts % 100 == 0:
+                        conn.execute(
+                            'DELETE FROM results WHERE key IN ('
+                            'SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)',
+                            (self.max_disk_entries,))
+            except sqlite3.Error:
+                # The disk tier is best effort; the memory tier still has it
+                pass
+
+    def _remember(self, key: str, value: str):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict],
+                       cacheable: Callable[[Dict], bool] = lambda result: True) -> Dict:
+        """Return the cached result for key, or compute, store and return it"""
+        result = self.get(key)
+        if result is not None:
+            return result
+        result = compute()
+        if cacheable(result):
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM results')
+
+
+_RESULT_CACHE = None
+_RESULT_CACHE_LOCK = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide cache configured from ANALYSIS_CACHE_SIZE and ANALYSIS_CACHE_DB"""
+    global _RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if _RESULT_CACHE is None:
+            _RESULT_CACHE = ResultCache(
+                max_entries=int(os.environ.get('ANALYSIS_CACHE_SIZE', '256')),
+                db_path=os.environ.get('ANALYSIS_CACHE_DB') or None,
+            )
+        return _RESULT_CACHE
+
+
+def is_complete(analysis: Dict) -> bool:
+    """Only cache analyses where no section failed, timed out or was skipped"""
+    if analysis.get('errors') or analysis.get('degraded'):
+        return False
+    for section in analysis.values():
+        if isinstance(section, dict) and 'error' in section:
+            return False
+    return True
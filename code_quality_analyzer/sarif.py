@@ -0,0 +1,243 @@
+"""
+SARIF 2.1.0 export
+Turns per-file analysis records into one SARIF log for CI code-scanning
+tools. Smells, security findings and poor complexity rankings become
+results; the rules they refer to are collected along the way.
+
+The log is written incrementally: results are emitted as each record
+arrives and the tool section (with the rules) is written last, so only
+the rule table - not the findings - is held in memory.
+"""
+import json
+import os
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from . import __version__
+
+SARIF_VERSION = '2.1.0'
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+SARIF_MIMETYPE = 'application/sarif+json'
+
+SEVERITY_LEVELS = {'CRITICAL': 'error', 'HIGH': 'error', 'MEDIUM': 'warning', 'LOW': 'note'}
+# Numeric scores code-scanning UIs use to bucket security rules
+SECURITY_SEVERITY = {'CRITICAL': '9.5', 'HIGH': '7.5', 'MEDIUM': '5.0', 'LOW': '2.0'}
+# Ranks A and B are not findings
+RANK_LEVELS = {'C': 'note', 'D': 'warning', 'E': 'error', 'F': 'error'}
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+def _slug(text: str) -> str:
+    return '-'.join(text.lower().split()) or 'unknown'
+
+
+def _region(line) -> Optional[Dict]:
+    if isinstance(line, int) and line > 0:
+        return {'startLine': line}
+    return None
+
+
+def smell_finding(smell: Dict) -> Tuple[Dict, Dict]:
+    """(rule, result) for a CodeSmell.to_dict()"""
+    kind = smell.get('kind') or 'unknown'
+    rule = {
+        'id': f'smell/{kind}',
+        'name': kind,
+        'shortDescription': {'text': kind.replace('_', ' ')},
+        'defaultConfiguration': {'level': 'warning'},
+        'properties': {'tags': ['maintainability']},
+    }
+    result = {'level': 'warning', 'message': {'text': smell.get('message') or kind},
+              'region': _region(smell.get('lineno'))}
+    return rule, result
+
+
+def security_finding(vuln: Dict) -> Tuple[Dict, Dict]:
+    """(rule, result) for a SecurityScanner or UniversalSecurityScanner vulnerability"""
+    name = vuln.get('test_name') or vuln.get('test_id') or 'unknown'
+    severity = str(vuln.get('severity', 'MEDIUM')).upper()
+    level = SEVERITY_LEVELS.get(severity, 'warning')
+    rule = {
+        # Bandit and the custom checks carry a test_id; the pattern scanner only a name
+        'id': vuln.get('test_id') or f'security/{_slug(name)}',
+        'name': name,
+        'shortDescription': {'text': name},
+        'defaultConfiguration': {'level': level},
+        'properties': {'tags': ['security'], 'security-severity': SECURITY_SEVERITY.get(severity, '5.0')},
+    }
+    properties = {'severity': severity}
+    if vuln.get('confidence'):
+        properties['confidence'] = vuln['confidence']
+    result = {'level': level, 'message': {'text': vuln.get('message') or name},
+              'region': _region(vuln.get('line')), 'properties': properties}
+    return rule, result
+
+
+def complexity_findings(complexity: Dict) -> Iterator[Tuple[Dict, Dict]]:
+    """(rule, result) for every function ranked C or worse, and for poor maintainability"""
+    for item in complexity.get('cyclomatic') or []:
+        level = RANK_LEVELS.get(item.get('rank'))
+        if level is None:
+            continue
+        rule = {
+            'id': 'complexity/cyclomatic',
+            'name': 'cyclomatic-complexity',
+            'shortDescription': {'text': 'Function has high cyclomatic complexity'},
+            'defaultConfiguration': {'level': 'warning'},
+            'properties': {'tags': ['complexity']},
+        }
+        text = (f"{item.get('name')} has cyclomatic complexity {item.get('complexity')} "
+                f"(rank {item['rank']}, {item.get('classification')})")
+        yield rule, {'level': level, 'message': {'text': text}, 'region': _region(item.get('line')),
+                     'properties': {'rank': item['rank'], 'complexity': item.get('complexity')}}
+    maintainability = complexity.get('maintainability') or {}
+    level = RANK_LEVELS.get(maintainability.get('rank'))
+    if level is not None:
+        rule = {
+            'id': 'complexity/maintainability',
+            'name': 'maintainability-index',
+            'shortDescription': {'text': 'File has a low maintainability index'},
+            'defaultConfiguration': {'level': 'warning'},
+            'properties': {'tags': ['maintainability']},
+        }
+        text = (f"Maintainability index {maintainability.get('score')} "
+                f"(rank {maintainability['rank']}, {maintainability.get('classification')})")
+        yield rule, {'level': level, 'message': {'text': text}, 'region': None,
+                     'properties': {'rank': maintainability['rank'], 'score': maintainability.get('score')}}
+
+
+def record_findings(record: Dict) -> Iterator[Tuple[Dict, Dict]]:
+    """Every (rule, result) in one per-file analysis record"""
+    for smell in record.get('smells') or []:
+        yield smell_finding(smell)
+    for vuln in (record.get('security') or {}).get('vulnerabilities') or []:
+        yield security_finding(vuln)
+    yield from complexity_findings(record.get('complexity') or {})
+
+
+class SARIFEncoder:
+    """Produces a SARIF log as a sequence of text chunks.
+
+    begin(), then encode(record) per analysis record, then end(). Records
+    without a 'file' key (summaries) become run properties, or a failed
+    invocation if they carry an 'error'.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root
+        self.rules: List[Dict] = []
+        self._rule_index: Dict[str, int] = {}
+        self.notifications: List[Dict] = []
+        self.properties: Dict = {}
+        self.successful = True
+        self.results = 0
+
+    def begin(self) -> str:
+        return f'{{"version":"{SARIF_VERSION}","$schema":"{SARIF_SCHEMA}","runs":[{{"results":['
+
+    def _location(self, path: str, region: Optional[Dict]) -> Dict:
+        uri = os.path.relpath(path, self.root) if self.root else path
+        artifact = {'uri': quote(uri.replace(os.sep, '/'))}
+        if self.root:
+            artifact['uriBaseId'] = 'SRCROOT'
+        location = {'artifactLocation': artifact}
+        if region:
+            location['region'] = region
+        return {'physicalLocation': location}
+
+    def _rule(self, rule: Dict) -> int:
+        index = self._rule_index.get(rule['id'])
+        if index is None:
+            index = self._rule_index[rule['id']] = len(self.rules)
+            self.rules.append(rule)
+        return index
+
+    def encode(self, record: Dict) -> str:
+        """Comma-separated results for one record ('' if it has none)"""
+        path = record.get('file')
+        if path is None:
+            if 'error' in record:
+                # The run itself failed part-way
+                self.successful = False
+                self.notifications.append({'level': 'error', 'message': {'text': str(record['error'])}})
+            else:
+                self.properties.update(record)
+            return ''
+        if 'error' in record:
+            self.notifications.append({
+                'level': 'error',
+                'message': {'text': f"{path}: {record['error']}"},
+                'locations': [self._location(path, None)],
+            })
+            return ''
+        chunks = []
+        for rule, finding in record_findings(record):
+            result = {
+                'ruleId': rule['id'],
+                'ruleIndex': self._rule(rule),
+                'level': finding['level'],
+                'message': finding['message'],
+                'locations': [self._location(path, finding['region'])],
+            }
+            if finding.get('properties'):
+                result['properties'] = finding['properties']
+            chunks.append(_dumps(result))
+        if not chunks:
+            return ''
+        text = ',\n'.join(chunks)
+        if self.results:
+            text = ',\n' + text
+        self.results += len(chunks)
+        return text
+
+    def end(self) -> str:
+        run_tail = {
+            'invocations': [{
+                'executionSuccessful': self.successful,
+                'toolExecutionNotifications': self.notifications,
+            }],
+            'tool': {'driver': {
+                'name': 'code-quality-analyzer',
+                'version': __version__,
+                'rules': self.rules,
+            }},
+        }
+        if self.root:
+            run_tail['originalUriBaseIds'] = {
+                'SRCROOT': {'uri': 'file://' + quote(os.path.abspath(self.root).replace(os.sep, '/').rstrip('/') + '/')}}
+        if self.properties:
+            run_tail['properties'] = self.properties
+        # Splice the tail into the still-open run object
+        return '],' + _dumps(run_tail)[1:] + ']}\n'
+
+
+class SARIFWriter:
+    """Write a SARIF log to a text stream one record at a time"""
+
+    def __init__(self, stream: IO[str], root: Optional[str] = None):
+        self.stream = stream
+        self.encoder = SARIFEncoder(root)
+        self.stream.write(self.encoder.begin())
+
+    def write(self, record: Dict):
+        text = self.encoder.encode(record)
+        if text:
+            self.stream.write(text)
+
+    def close(self):
+        self.stream.write(self.encoder.end())
+        self.stream.flush()
+
+
+def iter_sarif(records: Iterable[Dict], root: Optional[str] = None) -> Iterator[str]:
+    """SARIF text chunks for a streamed (chunked) HTTP response"""
+    encoder = SARIFEncoder(root)
+    yield encoder.begin()
+    for record in records:
+        text = encoder.encode(record)
+        if text:
+            yield text
+    yield encoder.end()
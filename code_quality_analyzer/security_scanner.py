@@ -8,6 +8,8 @@ import os
 import json
 from typing import Dict, List
 
+from .source_buffer import SourceBuffer
+
 
 class SecurityScanner:
     """Scan code for security vulnerabilities"""
@@ -15,8 +17,10 @@ class SecurityScanner:
     def __init__(self):
         self.severity_levels = ['LOW', 'MEDIUM', 'HIGH']
     
-    def scan(self, code: str) -> Dict:
-        """Scan code for security vulnerabilities using Bandit"""
+    def scan(self, code) -> Dict:
+        """Scan code (text or a shared SourceBuffer) for security vulnerabilities using Bandit"""
+        buffer = SourceBuffer.of(code)
+        code = buffer.text
         try:
             # Create temporary file
             with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
@@ -43,7 +47,7 @@ class SecurityScanner:
                         pass
                 
                 # Add custom security checks
-                custom_checks = self._custom_security_checks(code)
+                custom_checks = self._custom_security_checks(buffer)
                 
                 return {
                     'vulnerabilities': vulnerabilities + custom_checks,
@@ -58,7 +62,7 @@ class SecurityScanner:
         except Exception as e:
             # Still run custom checks even if Bandit fails
             try:
-                custom_checks = self._custom_security_checks(code)
+                custom_checks = self._custom_security_checks(buffer)
                 return {
                     'vulnerabilities': custom_checks,
                     'summary': self._generate_summary(custom_checks),
@@ -92,11 +96,13 @@ class SecurityScanner:
         
         return vulnerabilities
     
-    def _custom_security_checks(self, code: str) -> List[Dict]:
+    def _custom_security_checks(self, code) -> List[Dict]:
         """Custom security pattern matching"""
         import re
         vulnerabilities = []
-        lines = code.split('\n')
+        buffer = SourceBuffer.of(code)
+        code = buffer.text
+        lines = buffer.lines
         
         # Check for hardcoded passwords/secrets (more patterns)
         password_patterns = [
@@ -0,0 +1,68 @@
+"""
+Shared line index over one source text
+Built once per analysis and handed to every line-oriented analyzer, so
+the source is split into lines, measured for indentation and stripped
+only once instead of once per stage.
+"""
+from array import array
+from typing import Dict, Tuple, Union
+
+
+class SourceBuffer:
+    """Immutable view of a source text as '\\n'-separated lines.
+
+    lines[i] is exactly text.split('\\n')[i]; line_starts[i] is its offset
+    in text; indents[i] is its leading whitespace width; the stripped text
+    of a line is lines[i][indents[i]:ends[i]].
+    """
+
+    __slots__ = ('text', 'lines', 'line_starts', 'indents', 'ends', '_comment_masks')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines: Tuple[str, ...] = tuple(text.split('\n'))
+        self.line_starts = array('Q')
+        self.indents = array('L')
+        self.ends = array('L')
+        offset = 0
+        for line in self.lines:
+            self.line_starts.append(offset)
+            offset += len(line) + 1
+            self.indents.append(len(line) - len(line.lstrip()))
+            self.ends.append(len(line.rstrip()))
+        self._comment_masks: Dict[Tuple[str, ...], bytearray] = {}
+
+    @classmethod
+    def of(cls, source: Union[str, 'SourceBuffer']) -> 'SourceBuffer':
+        """Use source as-is if it is already a buffer, else index it"""
+        if isinstance(source, cls):
+            return source
+        return cls(source)
+
+    def __len__(self) -> int:
+        return len(self.lines)
+
+    @property
+    def line_count(self) -> int:
+        """Number of lines as str.splitlines() counts them (no empty line after a final newline)"""
+        if not self.text:
+            return 0
+        return len(self.lines) - 1 if self.text.endswith('\n') else len(self.lines)
+
+    def stripped(self, index: int) -> str:
+        return self.lines[index][self.indents[index]:self.ends[index]]
+
+    def is_blank(self, index: int) -> bool:
+        return self.ends[index] == 0
+
+    def comment_mask(self, prefixes: Tuple[str, ...]) -> bytearray:
+        """1 for every line whose stripped text starts with one of prefixes
+        (computed once per prefix set)"""
+        mask = self._comment_masks.get(prefixes)
+        if mask is None:
+            mask = bytearray(
+                1 if line.startswith(prefixes, indent) else 0
+                for line, indent in zip(self.lines, self.indents)
+            )
+            self._comment_masks[prefixes] = mask
+        return mask
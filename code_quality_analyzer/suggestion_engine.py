@@ -44,3 +44,10 @@ def suggestions_for_smells(smells: List[CodeSmell]):
             'suggestions': suggestions_for_smell(s)
         })
     return results
+
+
+def autofix_code(source: str) -> str:
+    """Apply the automatic fixes from CodeAutoFixer and return the fixed source"""
+    from .auto_fixer import CodeAutoFixer
+    fixed, _ = CodeAutoFixer().fix_all(source)
+    return fixed
@@ -4,6 +4,8 @@ Universal Auto-Fixer for Multiple Languages
 import re
 from typing import Tuple, List, Dict
 
+from .source_buffer import SourceBuffer
+
 
 class UniversalAutoFixer:
     def __init__(self, language='python'):
@@ -11,25 +13,24 @@ class UniversalAutoFixer:
         self.fixes_applied = []
     
     def fix_all(self, code):
-        fixed = code
+        """code is source text or a SourceBuffer shared with other analyzers"""
+        buffer = SourceBuffer.of(code)
         self.fixes_applied = []
         
-        # Apply language-specific fixes
-        fixed = self._fix_whitespace(fixed)
+        # Every pass works on the list of lines; the text is joined once at the end
+        fixed = self._fix_whitespace(buffer)
         fixed = self._fix_long_lines(fixed)
         fixed = self._add_missing_semicolons(fixed)
         fixed = self._fix_indentation(fixed)
         
-        return fixed, self.fixes_applied
+        return '\n'.join(fixed), self.fixes_applied
     
-    def _fix_whitespace(self, code):
-        lines = code.split('\n')
+    def _fix_whitespace(self, buffer):
         fixed_lines = []
         
-        for i, line in enumerate(lines):
-            original = line
+        for i, (original, end) in enumerate(zip(buffer.lines, buffer.ends)):
             # Remove trailing whitespace
-            line = line.rstrip()
+            line = original[:end]
             
             if line != original:
                 self.fixes_applied.append({
@@ -40,12 +41,10 @@ class UniversalAutoFixer:
             
             fixed_lines.append(line)
         
-        return '\n'.join(fixed_lines)
+        return fixed_lines
     
-    def _fix_long_lines(self, code):
+    def _fix_long_lines(self, lines):
         # Just log long lines, don't actually break them (complex logic)
-        lines = code.split('\n')
-        
         for i, line in enumerate(lines, 1):
             if len(line) > 120:
                 self.fixes_applied.append({
@@ -54,13 +53,12 @@ class UniversalAutoFixer:
                     'line': i
                 })
         
-        return code
+        return lines
     
-    def _add_missing_semicolons(self, code):
+    def _add_missing_semicolons(self, lines):
         if self.language not in ['javascript', 'typescript', 'java', 'cpp', 'csharp', 'css']:
-            return code
+            return lines
         
-        lines = code.split('\n')
         fixed_lines = []
         
         for i, line in enumerate(lines):
@@ -87,10 +85,9 @@ class UniversalAutoFixer:
             
             fixed_lines.append(line)
         
-        return '\n'.join(fixed_lines)
+        return fixed_lines
     
-    def _fix_indentation(self, code):
-        lines = code.split('\n')
+    def _fix_indentation(self, lines):
         indent_size = self._detect_indent_size(lines)
         fixed_lines = []
         
@@ -115,7 +112,7 @@ class UniversalAutoFixer:
             else:
                 fixed_lines.append(line)
         
-        return '\n'.join(fixed_lines)
+        return fixed_lines
     
     def _detect_indent_size(self, lines):
         indents = []
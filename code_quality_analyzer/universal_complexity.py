@@ -4,6 +4,9 @@ Universal Code Complexity Analyzer for Multiple Languages
 import re
 from typing import Dict, List
 
+from .heatmap import Heatmap
+from .source_buffer import SourceBuffer
+
 
 class UniversalComplexityAnalyzer:
     FUNCTION_PATTERNS = {
@@ -42,41 +45,60 @@ class UniversalComplexityAnalyzer:
         'css': ['media', 'supports', 'container'],
     }
     
+    # language -> (function pattern, decision keyword pattern), compiled on first use
+    _SCANNERS = {}
+    
     def __init__(self, language='python'):
         self.language = language.lower()
     
+    @classmethod
+    def _scanner_for(cls, language):
+        # Unknown languages use the Python scanner, under its key, so
+        # client-supplied names can't grow the cache
+        if language not in cls.FUNCTION_PATTERNS:
+            language = 'python'
+        scanner = cls._SCANNERS.get(language)
+        if scanner is None:
+            pattern = cls.FUNCTION_PATTERNS[language]
+            keywords = cls.CONTROL_FLOW[language]
+            # Keywords are whole words, so each match is exactly one keyword occurrence
+            keyword_pattern = r'\b(?:' + '|'.join(re.escape(kw) for kw in keywords) + r')\b'
+            scanner = (re.compile(pattern), re.compile(keyword_pattern))
+            cls._SCANNERS[language] = scanner
+        return scanner
+    
     def analyze(self, code):
+        """code is source text or a SourceBuffer shared with other analyzers"""
+        buffer = SourceBuffer.of(code)
         return {
-            'cyclomatic': self._cyclomatic(code),
-            'cognitive': self._cognitive(code),
-            'maintainability': self._maintainability(code),
-            'raw_metrics': self._metrics(code),
-            'heatmap': self._heatmap(code)
+            'cyclomatic': self._cyclomatic(buffer),
+            'cognitive': self._cognitive(buffer),
+            'maintainability': self._maintainability(buffer),
+            'raw_metrics': self._metrics(buffer),
+            'heatmap_rle': self._heatmap(buffer)
         }
     
-    def _cyclomatic(self, code):
-        lines = code.split('\n')
-        pattern = self.FUNCTION_PATTERNS.get(self.language, self.FUNCTION_PATTERNS['python'])
-        keywords = self.CONTROL_FLOW.get(self.language, self.CONTROL_FLOW['python'])
+    def _cyclomatic(self, buffer):
+        lines = buffer.lines
+        function_pattern, keyword_pattern = self._scanner_for(self.language)
         
         results = []
         func_name, func_line, complexity = None, 0, 1
         
         for i, line in enumerate(lines, 1):
-            if re.search(pattern, line):
+            match = function_pattern.search(line)
+            if match:
                 if func_name:
                     results.append({
                         'name': func_name, 'line': func_line, 'complexity': complexity,
                         'rank': self._rank(complexity), 'classification': self._classify(complexity)
                     })
-                match = re.search(pattern, line)
                 func_name = self._extract_name(match)
                 func_line, complexity = i, 1
             
             if func_name:
-                for kw in keywords:
-                    if re.search(rf'\b{kw}\b', line):
-                        complexity += 1
+                # Each distinct decision keyword on a line adds one
+                complexity += len(set(keyword_pattern.findall(line)))
                 complexity += line.count('&&') + line.count('||') + line.count(' and ') + line.count(' or ')
         
         if func_name:
@@ -87,35 +109,32 @@ class UniversalComplexityAnalyzer:
         
         return results if results else [{'name': 'main', 'line': 1, 'complexity': 5, 'rank': 'A', 'classification': 'Simple'}]
     
-    def _cognitive(self, code):
-        lines = code.split('\n')
-        max_nest = max((len(l) - len(l.lstrip())) // 4 for l in lines) if lines else 0
-        avg_nest = sum((len(l) - len(l.lstrip())) // 4 for l in lines) / len(lines) if lines else 0
+    def _cognitive(self, buffer):
+        levels = [indent // 4 for indent in buffer.indents]
+        max_nest = max(levels) if levels else 0
+        avg_nest = sum(levels) / len(levels) if levels else 0
         return {'max_nesting': max_nest, 'average_nesting': round(avg_nest, 2), 'functions': []}
     
-    def _maintainability(self, code):
-        m = self._metrics(code)
-        score = 100 - min(30, m['loc'] / 10) - min(20, len(code.split()) / 50) + min(20, m['comments'] * 10)
+    def _maintainability(self, buffer):
+        m = self._metrics(buffer)
+        score = 100 - min(30, m['loc'] / 10) - min(20, len(buffer.text.split()) / 50) + min(20, m['comments'] * 10)
         score = max(0, min(100, score))
         rank = 'A' if score >= 85 else 'B' if score >= 70 else 'C' if score >= 50 else 'D' if score >= 30 else 'F'
         classification = {'A': 'Excellent', 'B': 'Good', 'C': 'Fair', 'D': 'Poor', 'F': 'Critical'}[rank]
         return {'score': round(score, 2), 'rank': rank, 'classification': classification}
     
-    def _metrics(self, code):
-        lines = code.split('\n')
-        blank = sum(1 for l in lines if not l.strip())
-        comment_pattern = r'^\s*#' if self.language == 'python' else r'^\s*//'
-        comments = sum(1 for l in lines if re.match(comment_pattern, l))
+    def _metrics(self, buffer):
+        lines = buffer.lines
+        blank = sum(1 for end in buffer.ends if end == 0)
+        comments = sum(buffer.comment_mask(('#',) if self.language == 'python' else ('//',)))
         return {'loc': len(lines), 'sloc': len(lines) - blank, 'lloc': len(lines) - blank - comments, 'comments': comments, 'blank': blank, 'single_comments': comments, 'multi': 0}
     
-    def _heatmap(self, code):
-        lines = code.split('\n')
-        heatmap = []
-        for i, line in enumerate(lines, 1):
-            score = (3 if len(line) > 120 else 1 if len(line) > 80 else 0) + (3 if (len(line) - len(line.lstrip())) > 16 else 1 if (len(line) - len(line.lstrip())) > 8 else 0)
-            level = 'clean' if score == 0 else 'low' if score <= 2 else 'medium' if score <= 4 else 'high'
-            heatmap.append({'line': i, 'score': score, 'level': level, 'issues': []})
-        return heatmap
+    def _heatmap(self, buffer):
+        heatmap = Heatmap()
+        for line, indent in zip(buffer.lines, buffer.indents):
+            score = (3 if len(line) > 120 else 1 if len(line) > 80 else 0) + (3 if indent > 16 else 1 if indent > 8 else 0)
+            heatmap.append(score)
+        return heatmap.to_dict()
     
     def _extract_name(self, match):
         for g in match.groups():
@@ -1,9 +1,12 @@
 ﻿"""
 Universal Security Scanner for Multiple Languages
 """
+import bisect
 import re
 from typing import Dict, List
 
+from .source_buffer import SourceBuffer
+
 
 class UniversalSecurityScanner:
     SECURITY_PATTERNS = {
@@ -57,24 +60,90 @@ class UniversalSecurityScanner:
         }
     }
     
+    # Languages with at least one pattern; any other name shares the empty None entry
+    _PATTERN_LANGUAGES = frozenset(lang for config in SECURITY_PATTERNS.values() for lang in config['languages'])
+    
+    # (language, folded) -> ([(vuln_type, config, compiled pattern)], combined alternation)
+    _COMPILED = {}
+    
     def __init__(self, language='python'):
         self.language = language.lower()
     
+    @staticmethod
+    def _fold_pattern(pattern):
+        """Lowercase a pattern's literal letters, leaving escapes such as \\S alone"""
+        return re.sub(r'\\.|[A-Z]', lambda m: m.group() if m.group().startswith('\\') else m.group().lower(), pattern)
+    
+    @classmethod
+    def _compiled_for(cls, language, folded=False):
+        """Compile the language's patterns once per class: individually, and
+        as one alternation with a named group per vulnerability type.
+        
+        Folded patterns are matched case-sensitively against a lowercased
+        buffer, which the regex engine scans several times faster than an
+        IGNORECASE pattern.
+        """
+        # Keyed by known languages only, so client-supplied names can't grow the cache
+        if language not in cls._PATTERN_LANGUAGES:
+            language = None
+        compiled = cls._COMPILED.get((language, folded))
+        if compiled is None:
+            flags = 0 if folded else re.IGNORECASE
+            patterns = [
+                (vuln_type, config, cls._fold_pattern(config['pattern']) if folded else config['pattern'])
+                for vuln_type, config in cls.SECURITY_PATTERNS.items()
+                if language in config['languages']
+            ]
+            entries = [(vuln_type, config, re.compile(pattern, flags)) for vuln_type, config, pattern in patterns]
+            combined = None
+            if patterns:
+                combined = re.compile(
+                    '|'.join(f'(?P<{vuln_type}>{pattern})' for vuln_type, _, pattern in patterns),
+                    flags,
+                )
+            compiled = (entries, combined)
+            cls._COMPILED[(language, folded)] = compiled
+        return compiled
+    
     def scan(self, code):
-        vulnerabilities = []
-        lines = code.split('\n')
+        """code is source text or a SourceBuffer shared with other analyzers"""
+        buffer = SourceBuffer.of(code)
+        code = buffer.text
+        # Lowercasing only matches IGNORECASE semantics exactly for ASCII text
+        folded = code.isascii()
+        entries, combined = self._compiled_for(self.language, folded)
+        haystack = code.lower() if folded else code
+        hits = {vuln_type: [] for vuln_type, _, _ in entries}
         
-        for vuln_type, config in self.SECURITY_PATTERNS.items():
-            if self.language in config['languages']:
-                for i, line in enumerate(lines, 1):
-                    if re.search(config['pattern'], line, re.IGNORECASE):
-                        vulnerabilities.append({
-                            'line': i,
-                            'severity': config['severity'],
-                            'test_name': vuln_type.replace('_', ' ').title(),
-                            'message': config['message'],
-                            'code': line.strip()
-                        })
+        if combined is not None:
+            # One linear pass over the buffer; line numbers come from its line offsets
+            line_starts = buffer.line_starts
+            pos = 0
+            while pos <= len(code):
+                match = combined.search(haystack, pos)
+                if not match:
+                    break
+                index = bisect.bisect_right(line_starts, match.start()) - 1
+                line_start = line_starts[index]
+                line_end = line_start + len(buffer.lines[index])
+                line = haystack[line_start:line_end]
+                # The alternation only finds the line; every pattern is then
+                # checked on that line alone, as the per-line scan did
+                for vuln_type, _, pattern in entries:
+                    if pattern.search(line):
+                        hits[vuln_type].append((index + 1, buffer.lines[index]))
+                pos = line_end + 1
+        
+        vulnerabilities = []
+        for vuln_type, config, _ in entries:
+            for lineno, line in hits[vuln_type]:
+                vulnerabilities.append({
+                    'line': lineno,
+                    'severity': config['severity'],
+                    'test_name': vuln_type.replace('_', ' ').title(),
+                    'message': config['message'],
+                    'code': line.strip()
+                })
         
         # Calculate security score
         critical = sum(1 for v in vulnerabilities if v['severity'] == 'CRITICAL')
@@ -1,13 +1,23 @@
-from flask import Flask, request, render_template_string, jsonify
+from flask import Flask, Response, request, render_template_string, jsonify, stream_with_context
+from werkzeug.datastructures import ImmutableMultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
+import io
 import os
 from dotenv import load_dotenv
 from .detectors import RuleBasedDetector
 from .suggestion_engine import suggestions_for_smells
 from .ml_classifier import predict_code_quality, compute_quality_score
-from .auto_fixer import CodeAutoFixer
-from .complexity_analyzer import ComplexityAnalyzer
-from .security_scanner import SecurityScanner
-from .quality_scorer import QualityScorer
+from .orchestrator import run_analysis
+from .heatmap import with_heatmap_rows
+from .result_cache import ResultCache, get_result_cache, is_complete, model_fingerprint
+from .admission import ADMISSION_REJECTIONS, AdmissionRejected, body_limit, get_admission_controller
+from .jobs import JobManager, JobQueueFull, JobStoreUnavailable
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
+from .batch import (BatchError, BatchTooLarge, analyze_batch, batch_limits, files_from_archive, files_from_json,
+                    get_batch_executor, iter_batch)
+from .ndjson import NDJSON_MIMETYPE, iter_ndjson
+from .profiling import ProfilerBusy, profile_call, pstats_path_from_env
+from .sarif import SARIF_MIMETYPE, iter_sarif
 
 # Load environment variables from .env file
 load_dotenv()
@@ -890,8 +900,20 @@ input[type="text"]:focus {
         {% endif %}
       </div>
       
+      {% if analysis.degraded %}
+      <div class="section">
+        <p><i class="fas fa-bolt"></i> <strong>Fast analysis:</strong>
+        {% if analysis.degraded.reason == 'load' %}the server is busy{% else %}the snippet is large{% endif %},
+        so linters were skipped{% if analysis.degraded.skipped %}, as were: {{ analysis.degraded.skipped|join(', ') }}{% endif %}.
+        {% if analysis.degraded.partial %}Partial sections: {{ analysis.degraded.partial|join(', ') }}.{% endif %}</p>
+      </div>
+      {% endif %}
+      
       <div class="section">
         <h3><i class="fas fa-bug"></i> Code Smells ({{ analysis.smells|length }})</h3>
+        {% if analysis.errors and analysis.errors.smells %}
+        <p>⚠️ {{ analysis.errors.smells }}</p>
+        {% endif %}
         {% if analysis.smells %}
         {% for s in analysis.smells %}
         <div class="smell-item">
@@ -1410,6 +1432,68 @@ def create_app():
             # If download fails, just continue; ML predictions will be disabled
             pass
 
+    def resolve_model_path():
+        """MODEL_PATH, or the first model found in the usual locations"""
+        model_path = os.environ.get('MODEL_PATH')
+        if not model_path:
+            possible_paths = [
+                'models/code_quality_model.joblib',
+                '../models/code_quality_model.joblib',
+                os.path.join(os.path.dirname(__file__), '..', 'models', 'code_quality_model.joblib'),
+            ]
+            for path in possible_paths:
+                if os.path.exists(path):
+                    model_path = path
+                    break
+        return model_path
+
+    def model_key(model_path):
+        # A path with no readable model keys on the path itself, so a request
+        # naming it isn't served the entry cached for requests without a model
+        return model_fingerprint(model_path) or model_path
+
+    def web_analysis_key(code, lang, enable_autofix, enable_security, model_path):
+        return ResultCache.make_key(
+            code, lang,
+            {'view': 'index', 'autofix': enable_autofix, 'security': enable_security},
+            model_key(model_path),
+        )
+
+    admission = get_admission_controller()
+    app.extensions['admission'] = admission
+    # Oversized bodies are refused by werkzeug before they are read or parsed
+    app.config['MAX_CONTENT_LENGTH'] = admission.max_body_bytes
+
+    @app.errorhandler(RequestEntityTooLarge)
+    def body_too_large(e):
+        ADMISSION_REJECTIONS.inc(language='other', reason='too_large')
+        message = 'Request body is too large'
+        if request.path.startswith('/api/'):
+            return jsonify({'error': message}), 413
+        # The body was never read, so the page is rendered with an empty form
+        request.form = ImmutableMultiDict()
+        return render_template_string(TEMPLATE, analysis=None, error=message), 413
+
+    def admitted(code, lang, compute):
+        """compute(degraded) once code is admitted; raises AdmissionRejected.
+
+        degraded is the reason to run the fast profile (a huge snippet, or
+        every slot of lang busy), or None.
+        """
+        with admission.admit(lang, code) as degraded:
+            return compute(degraded)
+
+    def rejection_headers(e):
+        return {'Retry-After': str(e.retry_after)} if e.retry_after else {}
+
+    def served(fragment):
+        """An analysis (or section of one) as it is sent to clients. Analyses,
+        cached ones included, keep only the encoded heatmap; every response
+        gets the per-line one too."""
+        if fragment and 'complexity' in fragment:
+            return dict(fragment, complexity=with_heatmap_rows(fragment['complexity']))
+        return fragment
+
     @app.route('/', methods=['GET', 'POST'])
     def index():
         analysis = None
@@ -1425,95 +1509,73 @@ def create_app():
                 enable_autofix = request.form.get('autofix') == 'true'
                 enable_security = request.form.get('security') == 'true'
                 
-                # Try to find model in common locations
-                model_path = os.environ.get('MODEL_PATH')
-                if not model_path:
-                    possible_paths = [
-                        'models/code_quality_model.joblib',
-                        '../models/code_quality_model.joblib',
-                        os.path.join(os.path.dirname(__file__), '..', 'models', 'code_quality_model.joblib'),
-                    ]
-                    for path in possible_paths:
-                        if os.path.exists(path):
-                            model_path = path
-                            break
-                
-                # Basic detection
-                detector = RuleBasedDetector()
-                smells = detector.detect_all_languages(code, lang)
-                suggestions = suggestions_for_smells(smells)
-                
-                # ML Classification
-                ml_result = None
-                if model_path and os.path.exists(model_path):
-                    try:
-                        label, prob = predict_code_quality(code, model_path)
-                        ml_result = {'label': label, 'confidence': prob}
-                    except Exception as e:
-                        ml_result = {'error': f'ML prediction failed: {str(e)}'}
-                else:
-                    if model_path:
-                        ml_result = {'error': f'Model file not found: {model_path}'}
-                
-                # NEW: Complexity Analysis (All languages)
-                complexity_data = None
-                try:
-                    from .universal_complexity import UniversalComplexityAnalyzer
-                    complexity_analyzer = UniversalComplexityAnalyzer(language=lang)
-                    complexity_data = complexity_analyzer.analyze(code)
-                except Exception as e:
-                    app.logger.error(f'Complexity analysis error: {e}')
-                    complexity_data = {'error': f'Complexity analysis failed: {str(e)}'}
-                
-                # NEW: Security Scan (All languages)
-                security_data = None
-                if enable_security:
-                    try:
-                        from .universal_security import UniversalSecurityScanner
-                        security_scanner = UniversalSecurityScanner(language=lang)
-                        security_data = security_scanner.scan(code)
-                    except Exception as e:
-                        app.logger.error(f'Security scan error: {e}')
-                        security_data = {'error': f'Security scan failed: {str(e)}', 'vulnerabilities': []}
+                model_path = resolve_model_path()
+                admission.check_size(code, lang)
                 
-                # NEW: Auto-fix suggestions (All languages)
-                fixed_code = None
-                auto_fix_report = None
-                if enable_autofix:
-                    try:
-                        from .universal_autofixer import UniversalAutoFixer
-                        auto_fixer = UniversalAutoFixer(language=lang)
-                        fixed_code, fixes = auto_fixer.fix_all(code)
-                        auto_fix_report = {'fixed_code': fixed_code, 'fixes': fixes}
-                    except Exception as e:
-                        app.logger.error(f'Auto-fix error: {e}')
-                        auto_fix_report = {'error': f'Auto-fix failed: {str(e)}', 'fixes': []}
-                
-                # NEW: Enhanced Quality Score
-                quality_scorer = QualityScorer()
-                quality_score_data = quality_scorer.calculate_score(
-                    smells,
-                    complexity_data,
-                    security_data,
-                    auto_fix_report
+                # Identical submissions are served from the result cache
+                cache_key = web_analysis_key(code, lang, enable_autofix, enable_security, model_path)
+                # Detectors, ML, complexity, security and auto-fix run concurrently;
+                # only a cache miss needs one of the language's slots. Huge
+                # snippets, and requests that find every slot busy, get the fast profile
+                analysis = get_result_cache().get_or_compute(
+                    cache_key,
+                    lambda: admitted(code, lang, lambda degraded: run_analysis(
+                        code,
+                        lang,
+                        enable_autofix=enable_autofix,
+                        enable_security=enable_security,
+                        model_path=model_path,
+                        logger=app.logger,
+                        degraded=degraded,
+                    )),
+                    cacheable=is_complete,
                 )
-                
-                analysis = {
-                    'smells': [s.to_dict() for s in smells],
-                    'suggestions': suggestions,
-                    'ml_classification': ml_result,
-                    'quality_score': quality_score_data.get('total_score', 75),
-                    'quality_details': quality_score_data,
-                    'complexity': complexity_data,
-                    'security': security_data,
-                    'auto_fix': auto_fix_report,
-                }
+                analysis = served(analysis)
+            except AdmissionRejected as e:
+                return (render_template_string(TEMPLATE, analysis=None, error=str(e)),
+                        e.status, rejection_headers(e))
+            except RequestEntityTooLarge:
+                raise
             except Exception as e:
                 error = f'Error analyzing code: {str(e)}'
                 app.logger.error(f'Analysis error: {e}', exc_info=True)
         
         return render_template_string(TEMPLATE, analysis=analysis, error=error)
 
+    def api_analysis(code, model_path, degraded=None):
+        detector = RuleBasedDetector()
+        # The fast profile skips flake8, pylint and the model
+        smells = detector.detect_fast(code, 'python') if degraded else detector.detect_all(code)
+        suggestions = suggestions_for_smells(smells)
+        ml_result = None
+        
+        if model_path and os.path.exists(model_path) and not degraded:
+            try:
+                label, prob = predict_code_quality(code, model_path)
+                ml_result = {'label': label, 'confidence': prob}
+            except Exception as e:
+                ml_result = {'error': str(e)}
+        
+        score = compute_quality_score(
+            ml_result.get('label') if ml_result else None,
+            ml_result.get('confidence') if ml_result else None,
+            smells
+        )
+        
+        result = {
+            'smells': [s.to_dict() for s in smells],
+            'suggestions': suggestions,
+            'ml_classification': ml_result,
+            'quality_score': score,
+        }
+        if degraded:
+            result['degraded'] = {
+                'reason': degraded,
+                'partial': ['smells'],
+                'skipped': ['ml_classification'] if model_path else [],
+            }
+        return result
+
     @app.route('/api/analyze', methods=['POST'])
     def api_analyze():
         try:
@@ -1525,35 +1587,191 @@ def create_app():
             model_path = data.get('model')
             if not model_path:
                 model_path = os.environ.get('MODEL_PATH')
+            admission.check_size(code, 'python')
+            compute = lambda degraded: api_analysis(code, model_path, degraded)
             
-            detector = RuleBasedDetector()
-            smells = detector.detect_all(code)
-            suggestions = suggestions_for_smells(smells)
-            ml_result = None
-            
-            if model_path and os.path.exists(model_path):
+            if data.get('profile') in (True, 'true', '1') or request.args.get('profile') == 'true':
+                # Profiled runs skip the cache: a cached result has no cost to attribute
                 try:
-                    label, prob = predict_code_quality(code, model_path)
-                    ml_result = {'label': label, 'confidence': prob}
-                except Exception as e:
-                    ml_result = {'error': str(e)}
-            
-            score = compute_quality_score(
-                ml_result.get('label') if ml_result else None,
-                ml_result.get('confidence') if ml_result else None,
-                smells
-            )
+                    result, report = profile_call(lambda: admitted(code, 'python', compute),
+                                                  pstats_path=pstats_path_from_env(), blocking=False)
+                except ProfilerBusy as e:
+                    return jsonify({'error': str(e)}), 429, {'Retry-After': '5'}
+                result['profile'] = report
+                return jsonify(served(result))
             
-            return jsonify({
-                'smells': [s.to_dict() for s in smells],
-                'suggestions': suggestions,
-                'ml_classification': ml_result,
-                'quality_score': score,
-            })
+            cache_key = ResultCache.make_key(code, 'python', {'view': 'api'}, model_key(model_path))
+            result = get_result_cache().get_or_compute(
+                cache_key, lambda: admitted(code, 'python', compute),
+                cacheable=is_complete)
+            return jsonify(served(result))
+        except AdmissionRejected as e:
+            return jsonify({'error': str(e)}), e.status, rejection_headers(e)
+        except RequestEntityTooLarge:
+            raise
         except Exception as e:
             app.logger.error(f'API error: {e}', exc_info=True)
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/analyze/batch', methods=['POST'])
+    def api_analyze_batch():
+        """Analyze many files at once: a JSON {"files": [{path, language, code}]}
+        body, or a zip/tar archive uploaded as the 'archive' form field or as
+        the raw request body. With ?format=ndjson (or Accept:
+        application/x-ndjson) the per-file records are streamed as each file
+        finishes, followed by a final {summary, quality} record; ?format=sarif
+        (or Accept: application/sarif+json) streams a SARIF 2.1.0 log."""
+        # Batches carry up to BATCH_MAX_BYTES of source, not one snippet
+        request.max_content_length = body_limit(batch_limits()[1])
+        try:
+            if request.files:
+                upload = request.files.get('archive') or next(iter(request.files.values()))
+                files = files_from_archive(upload.stream)
+            elif request.is_json:
+                data = request.get_json(silent=True)
+                if not isinstance(data, dict):
+                    return jsonify({'error': 'Expected a JSON object'}), 400
+                files = files_from_json(data.get('files'))
+            else:
+                files = files_from_archive(io.BytesIO(request.get_data()))
+        except BatchTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except BatchError as e:
+            return jsonify({'error': str(e)}), 400
+        if not files:
+            return jsonify({'error': 'No supported source files provided'}), 400
+        # Only the server's own model: joblib.load unpickles whatever it is given
+        model_path = resolve_model_path()
+        try:
+            release_slot = admission.acquire_batch()
+        except AdmissionRejected as e:
+            return jsonify({'error': str(e)}), e.status, rejection_headers(e)
+
+        output = request.args.get('format') or \
+            {NDJSON_MIMETYPE: 'ndjson', SARIF_MIMETYPE: 'sarif'}.get(request.accept_mimetypes.best)
+        if output in ('ndjson', 'sarif'):
+            def records():
+                try:
+                    yield from iter_batch(files, get_batch_executor(), model_path)
+                except Exception as e:
+                    # The 200 is already sent; report the failure in-band
+                    app.logger.error(f'Batch API error: {e}', exc_info=True)
+                    yield {'error': str(e)}
+                finally:
+                    release_slot()
+            if output == 'sarif':
+                response = Response(iter_sarif(records()), mimetype=SARIF_MIMETYPE)
+            else:
+                response = Response(iter_ndjson(records()), mimetype=NDJSON_MIMETYPE)
+            # Released when the stream ends, or when the server closes it early
+            response.call_on_close(release_slot)
+            return response
+
+        try:
+            result = analyze_batch(files, get_batch_executor(), model_path)
+            return jsonify(result)
+        except Exception as e:
+            app.logger.error(f'Batch API error: {e}', exc_info=True)
+            return jsonify({'error': str(e)}), 500
+        finally:
+            release_slot()
+
+    def run_job(payload, on_section):
+        """Same analysis as the web form, streaming sections as they finish"""
+        # Never a client's path: joblib.load unpickles whatever it is given
+        model_path = resolve_model_path()
+        cache = get_result_cache()
+        cache_key = web_analysis_key(
+            payload['code'], payload['lang'], payload['autofix'], payload['security'], model_path)
+        # A cached analysis completes with just its final event
+        result = cache.get(cache_key)
+        if result is None:
+            result = run_analysis(
+                payload['code'],
+                payload['lang'],
+                enable_autofix=payload['autofix'],
+                enable_security=payload['security'],
+                model_path=model_path,
+                logger=app.logger,
+                on_section=lambda stage, fragment: on_section(stage, served(fragment)),
+                degraded=admission.degrade_reason(payload['code']),
+            )
+            if is_complete(result):
+                cache.put(cache_key, result)
+        return served(result)
+
+    try:
+        jobs = JobManager.from_env(run_job, logger=app.logger)
+        jobs_unavailable = None
+    except JobStoreUnavailable as e:
+        # The rest of the app works; the job endpoints say why they don't
+        app.logger.error(f'Analysis jobs disabled: {e}')
+        jobs, jobs_unavailable = None, str(e)
+    app.extensions['analysis_jobs'] = jobs
+
+    def jobs_disabled():
+        return jsonify({'error': f'Analysis jobs are disabled: {jobs_unavailable}'}), 503
+
+    @app.route('/api/jobs', methods=['POST'])
+    def api_create_job():
+        if jobs is None:
+            return jobs_disabled()
+        data = request.get_json(silent=True) or {}
+        code = (data.get('code') or '').strip()
+        if not code:
+            return jsonify({'error': 'No code provided'}), 400
+        try:
+            admission.check_size(code, data.get('lang', 'python'))
+        except AdmissionRejected as e:
+            return jsonify({'error': str(e)}), e.status
+        payload = {
+            'code': code,
+            'lang': data.get('lang', 'python'),
+            'autofix': bool(data.get('autofix', False)),
+            'security': bool(data.get('security', False)),
+        }
+        try:
+            job_id = jobs.submit(payload)
+        except JobQueueFull as e:
+            return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}',
+            'events_url': f'/api/jobs/{job_id}/events',
+        }), 202
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def api_get_job(job_id):
+        if jobs is None:
+            return jobs_disabled()
+        job = jobs.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        return jsonify(job)
+
+    @app.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def api_job_events(job_id):
+        """The job's events as Server-Sent Events, for at most JOB_STREAM_SECONDS"""
+        if jobs is None:
+            return jobs_disabled()
+        if jobs.get(job_id) is None:
+            return jsonify({'error': 'Unknown job'}), 404
+        try:
+            last_event_id = int(request.headers.get('Last-Event-ID', '0'))
+        except ValueError:
+            last_event_id = 0
+        return Response(
+            stream_with_context(jobs.stream(job_id, last_event_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Stage timings, cache and linter counters in Prometheus text format"""
+        return Response(render_metrics(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
     return app
 
 if __name__ == '__main__':
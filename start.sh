@@ -23,5 +23,34 @@ else
   echo "Warning: Model not found at $MODEL_PATH; ML predictions will be disabled"
 fi
 
-# Start Gunicorn on the provided port
-exec gunicorn code_quality_analyzer.wsgi:app -b 0.0.0.0:$PORT -w 4
+# Admission slots are shared by the workers through lock files here. Sized
+# for up to 4 workers x 8 threads below (32 requests in flight): one language
+# runs at most 4 analyses (1 for the slow rust/java/go linters) with 4 more
+# waiting, so a burst in one language leaves most threads to the others
+export ADMISSION_DIR=${ADMISSION_DIR:-/tmp/code_quality_admission}
+export ADMISSION_CONCURRENCY=${ADMISSION_CONCURRENCY:-4}
+export ADMISSION_LANGUAGE_LIMITS=${ADMISSION_LANGUAGE_LIMITS:-rust=1,java=1,go=1}
+export ADMISSION_QUEUE=${ADMISSION_QUEUE:-4}
+
+# Per-worker metric snapshots from a previous run would be summed into /metrics
+if [ -n "$METRICS_DIR" ]; then
+  rm -rf "$METRICS_DIR"
+  mkdir -p "$METRICS_DIR"
+fi
+
+# Worker processes; the app reads this too. Without JOBS_REDIS_URL, jobs
+# live in one process's memory, so a single worker is the default then
+if [ -n "$JOBS_REDIS_URL" ]; then
+  export WEB_CONCURRENCY=${WEB_CONCURRENCY:-4}
+else
+  export WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
+fi
+GUNICORN_THREADS=${GUNICORN_THREADS:-8}
+if [ "$WEB_CONCURRENCY" -gt 1 ] && [ -z "$JOBS_REDIS_URL" ]; then
+  echo "Warning: JOBS_REDIS_URL is not set; /api/jobs is disabled with $WEB_CONCURRENCY workers"
+fi
+
+# Start Gunicorn on the provided port. Threaded workers, so a job's event
+# stream holds one thread rather than a whole worker
+exec gunicorn code_quality_analyzer.wsgi:app -b 0.0.0.0:$PORT -w "$WEB_CONCURRENCY" \
+  -k gthread --threads "$GUNICORN_THREADS"
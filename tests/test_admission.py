@@ -0,0 +1,191 @@
+import os
+import threading
+
+import pytest
+
+from code_quality_analyzer.admission import (
+    AdmissionController, AdmissionQueueFull, AdmissionTimeout, PayloadTooLarge, fcntl)
+from code_quality_analyzer.webapp import create_app
+
+
+def _hold(controller, language, started, release):
+    with controller.admit(language):
+        started.set()
+        release.wait(5)
+
+
+def test_busy_language_queues_then_rejects():
+    controller = AdmissionController(concurrency=1, queue_size=1, wait_timeout=0.5, fast_on_queue=False)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=_hold, args=(controller, 'rust', started, release))
+    holder.start()
+    started.wait(5)
+    try:
+        # Other languages are unaffected
+        with controller.admit('python'):
+            pass
+        errors = []
+
+        def waiter():
+            try:
+                with controller.admit('rust'):
+                    pass
+            except AdmissionTimeout as e:
+                errors.append(e)
+
+        queued = threading.Thread(target=waiter)
+        queued.start()
+        # The one queue place is taken by the waiter
+        with pytest.raises(AdmissionQueueFull) as exc:
+            for _ in range(50):
+                with controller.admit('rust'):
+                    pass
+        assert exc.value.status == 429 and exc.value.retry_after == 1
+        queued.join()
+        assert errors and errors[0].status == 503
+    finally:
+        release.set()
+        holder.join()
+    with controller.admit('rust'):
+        pass
+
+
+@pytest.mark.skipif(fcntl is None, reason='needs flock')
+def test_file_slots_are_shared_between_controllers(tmp_path):
+    first = AdmissionController(concurrency=1, queue_size=0, directory=str(tmp_path))
+    second = AdmissionController(concurrency=1, queue_size=0, directory=str(tmp_path))
+    with first.admit('go'):
+        with pytest.raises(AdmissionQueueFull):
+            with second.admit('go'):
+                pass
+    with second.admit('go'):
+        pass
+
+
+def test_oversized_code_is_rejected(monkeypatch):
+    assert AdmissionController().slot_group('../../etc') == 'other'
+    with pytest.raises(PayloadTooLarge):
+        AdmissionController(max_code_bytes=10).check_size('é' * 6)
+    app = create_app()
+    monkeypatch.setattr(app.extensions['admission'], 'max_code_bytes', 10)
+    resp = app.test_client().post('/api/analyze', json={'code': 'x = 1\n' * 10})
+    assert resp.status_code == 413
+
+
+def test_large_inputs_get_the_fast_profile(monkeypatch):
+    controller = AdmissionController(fast_code_bytes=100)
+    assert controller.degrade_reason('x = 1\n') is None
+    assert controller.degrade_reason('x = 1\n' * 20) == 'large_input'
+    with controller.admit('python', 'x = 1\n' * 20) as degraded:
+        assert degraded == 'large_input'
+
+    app = create_app()
+    monkeypatch.setattr(app.extensions['admission'], 'fast_code_bytes', 100)
+    resp = app.test_client().post('/api/analyze', json={'code': 'import os\n' + 'x = 1\n' * 20})
+    assert resp.status_code == 200
+    assert resp.get_json()['degraded']['reason'] == 'large_input'
+    assert any(s['kind'] == 'unused_import' for s in resp.get_json()['smells'])
+
+
+def test_oversized_body_is_refused_before_parsing():
+    import json
+    app = create_app()
+    assert app.config['MAX_CONTENT_LENGTH'] == app.extensions['admission'].max_body_bytes
+    app.config['MAX_CONTENT_LENGTH'] = 1000
+    client = app.test_client()
+    body = json.dumps({'code': 'x = 1\n' * 1000})
+    resp = client.post('/api/analyze', data=body, content_type='application/json')
+    assert resp.status_code == 413 and resp.get_json() == {'error': 'Request body is too large'}
+    assert client.post('/', data={'code': 'x = 1\n' * 1000}).status_code == 413
+    # The batch endpoint has its own, larger limit
+    files = [{'path': 'a.py', 'language': 'python', 'code': 'x = 1\n' * 200}]
+    assert client.post('/api/analyze/batch', json={'files': files}).status_code == 200
+
+
+def _start_sh_admission_env():
+    import re
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, 'start.sh')) as fh:
+        return dict(re.findall(r'export (ADMISSION_\w+)=\$\{\1:-([^}]*)\}', fh.read()))
+
+
+def _hold_rust_slot(release):
+    with AdmissionController.from_env().admit('rust'):
+        release.wait(10)
+
+
+@pytest.mark.skipif(fcntl is None, reason='needs flock')
+def test_start_sh_limits_are_reachable_across_processes(tmp_path, monkeypatch):
+    import multiprocessing
+    import time
+    env = _start_sh_admission_env()
+    assert {'ADMISSION_CONCURRENCY', 'ADMISSION_LANGUAGE_LIMITS', 'ADMISSION_QUEUE'} <= set(env)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv('ADMISSION_DIR', str(tmp_path))
+    controller = AdmissionController.from_env()
+    running, waiting = controller.language_limits['rust'], controller.queue_size
+    # Fewer analyses than start.sh's 4 workers x 8 threads fill rust's slots and queue
+    assert running + waiting < 4 * 8
+
+    context = multiprocessing.get_context('fork')
+    release = context.Event()
+    workers = [context.Process(target=_hold_rust_slot, args=(release,)) for _ in range(running + waiting)]
+    for worker in workers:
+        worker.start()
+    try:
+        deadline = time.monotonic() + 10
+        while controller.usage('rust') != (running, waiting):
+            assert time.monotonic() < deadline, controller.usage('rust')
+            time.sleep(0.02)
+        with pytest.raises(AdmissionQueueFull):
+            with controller.admit('rust'):
+                pass
+        with controller.admit('python'):
+            pass
+    finally:
+        release.set()
+        for worker in workers:
+            worker.join(15)
+    assert [worker.exitcode for worker in workers] == [0] * len(workers)
+    assert controller.usage('rust') == (0, 0)
+
+
+def _hold_python_slot(release):
+    with AdmissionController.from_env().admit('python'):
+        release.wait(10)
+
+
+@pytest.mark.skipif(fcntl is None, reason='needs flock')
+def test_busy_language_gets_the_fast_profile_without_waiting(tmp_path, monkeypatch):
+    import multiprocessing
+    import time
+    from code_quality_analyzer import webapp
+    for name, value in _start_sh_admission_env().items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv('ADMISSION_DIR', str(tmp_path))
+    controller = AdmissionController.from_env()
+    monkeypatch.setattr(webapp, 'get_admission_controller', lambda: controller)
+    client = webapp.create_app().test_client()
+    code = 'import os\n\ndef load(path):\n    return path\n'
+    assert 'degraded' not in client.post('/api/analyze', json={'code': code}).get_json()
+
+    context = multiprocessing.get_context('fork')
+    release = context.Event()
+    workers = [context.Process(target=_hold_python_slot, args=(release,)) for _ in range(controller.concurrency)]
+    for worker in workers:
+        worker.start()
+    try:
+        deadline = time.monotonic() + 10
+        while controller.usage('python')[0] < controller.concurrency:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        start = time.monotonic()
+        resp = client.post('/api/analyze', json={'code': code + 'x = 1\n'})
+        assert time.monotonic() - start < controller.wait_timeout
+        assert resp.get_json()['degraded']['reason'] == 'load'
+        assert not any(s['kind'] in ('flake8', 'pylint') for s in resp.get_json()['smells'])
+    finally:
+        release.set()
+        for worker in workers:
+            worker.join(15)
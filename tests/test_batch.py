@@ -0,0 +1,158 @@
+import io
+import json
+import tarfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from code_quality_analyzer import batch
+from code_quality_analyzer.batch import BatchTooLarge, analyze_batch, files_from_archive, files_from_json, iter_batch
+from code_quality_analyzer.orchestrator import get_orchestrator
+from code_quality_analyzer.webapp import create_app
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, 'w') as zf:
+        for name, text in members.items():
+            zf.writestr(name, text)
+    buf.seek(0)
+    return buf
+
+
+def test_archive_members_are_filtered_like_a_project_scan():
+    buf = _zip({
+        'src/a.py': 'import os\n',
+        'src/b.js': 'var x = 1\n',
+        'node_modules/dep/index.js': 'x\n',
+        'README.md': '# readme\n',
+    })
+    assert [(f['path'], f['language']) for f in files_from_archive(buf)] == [
+        ('src/a.py', 'python'), ('src/b.js', 'javascript')]
+
+    tar_buf = io.BytesIO()
+    with tarfile.open(fileobj=tar_buf, mode='w:gz') as tf:
+        data = b'x = 1\n'
+        info = tarfile.TarInfo('pkg/mod.py')
+        info.size = len(data)
+        tf.addfile(info, io.BytesIO(data))
+    assert [f['path'] for f in files_from_archive(tar_buf)] == ['pkg/mod.py']
+
+
+def test_limits_are_enforced():
+    with pytest.raises(BatchTooLarge):
+        files_from_json([{'path': 'a.py', 'code': 'x = 1\n'}] * 3, limits=(2, 1000))
+    with pytest.raises(BatchTooLarge):
+        files_from_archive(_zip({'a.py': 'x = 1\n' * 100}), limits=(10, 100))
+
+
+def test_batch_endpoint_returns_files_and_summary():
+    client = create_app().test_client()
+    resp = client.post('/api/analyze/batch', json={'files': [
+        {'path': 'a.py', 'code': 'import os\n\ndef f():\n    return 1\n'},
+        {'path': 'b.js', 'language': 'javascript', 'code': 'function g() { return 1 }\n'},
+    ]})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert [f['file'] for f in data['files']] == ['a.py', 'b.js']
+    assert 'unused_import' in [s['kind'] for s in data['files'][0]['smells']]
+    assert data['summary']['files'] == 2
+    assert data['quality']['files'] == 2
+    assert set(data['quality']['components']) == {'style', 'maintainability', 'complexity', 'security', 'documentation'}
+
+    upload = client.post('/api/analyze/batch', data={'archive': (_zip({'m.py': 'x = 1\n'}), 'src.zip')})
+    assert upload.get_json()['summary']['files'] == 1
+
+
+def test_batch_endpoint_streams_ndjson():
+    client = create_app().test_client()
+    resp = client.post('/api/analyze/batch?format=ndjson', json={'files': [
+        {'path': 'a.py', 'code': 'import os\n'},
+        {'path': 'b.py', 'code': 'x = 1\n'},
+    ]})
+    assert resp.status_code == 200
+    assert resp.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+    assert sorted(r['file'] for r in records[:-1]) == ['a.py', 'b.py']
+    assert records[-1]['summary']['files'] == 2
+    assert records[-1]['quality']['files'] == 2
+
+
+def test_batch_endpoint_streams_sarif():
+    client = create_app().test_client()
+    resp = client.post('/api/analyze/batch', headers={'Accept': 'application/sarif+json'},
+                       json={'files': [{'path': 'a.py', 'code': 'import os\n'}]})
+    assert resp.mimetype == 'application/sarif+json'
+    run = json.loads(resp.get_data(as_text=True))['runs'][0]
+    assert 'smell/unused_import' in [r['ruleId'] for r in run['results']]
+    assert run['properties']['summary']['files'] == 1
+
+
+class _CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.most = 0
+
+    def submit(self, fn, *args):
+        with self.lock:
+            self.pending += 1
+            self.most = max(self.most, self.pending)
+        future = super().submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+
+def test_batches_run_on_their_own_bounded_pool(monkeypatch):
+    files = files_from_json([{'path': f'm{i}.py', 'code': f'x{i} = {i}\n'} for i in range(12)])
+    executor = _CountingExecutor()
+    result = analyze_batch(files, executor, window=3)
+    assert [r['file'] for r in result['files']] == [f['path'] for f in files]
+    assert executor.most <= 3
+    assert len(list(iter_batch(files, executor, window=2))) == len(files) + 1
+    assert executor.most <= 3
+
+    monkeypatch.setenv('BATCH_WORKERS', '1')
+    monkeypatch.setattr(batch, '_EXECUTOR', None)
+    assert batch.get_batch_executor() is not get_orchestrator().executor
+    seen = set()
+    monkeypatch.setattr(batch, 'analyze_source', lambda path, *args, **kwargs: seen.add(
+        threading.current_thread().name) or {'file': path})
+    resp = create_app().test_client().post('/api/analyze/batch', json={
+        'files': [{'path': f'n{i}.py', 'code': 'y = 1\n'} for i in range(4)]})
+    assert resp.status_code == 200
+    assert seen and all(name.startswith('batch') for name in seen)
+
+
+def test_batch_ignores_client_model_paths(monkeypatch, tmp_path):
+    monkeypatch.delenv('MODEL_PATH', raising=False)
+    evil = str(tmp_path / 'evil.joblib')
+    seen = []
+    monkeypatch.setattr(batch, '_predictions', lambda files, model_path: seen.append(model_path) or {})
+    resp = create_app().test_client().post(
+        '/api/analyze/batch', json={'files': [{'path': 'a.py', 'code': 'x = 1\n'}], 'model': evil})
+    assert resp.status_code == 200
+    assert len(seen) == 1 and seen[0] != evil
+
+
+def test_batches_take_an_admission_slot():
+    app = create_app()
+    client = app.test_client()
+    body = {'files': [{'path': 'a.py', 'code': 'x = 1\n'}]}
+    release = app.extensions['admission'].acquire_batch()
+    resp = client.post('/api/analyze/batch', json=body)
+    assert resp.status_code == 429 and resp.headers['Retry-After']
+    release()
+    assert client.post('/api/analyze/batch', json=body).status_code == 200
+    # A streamed batch gives its slot back once the response is closed
+    streamed = client.post('/api/analyze/batch?format=ndjson', json=body)
+    assert len(streamed.get_data(as_text=True).splitlines()) == 2
+    streamed.close()
+    assert client.post('/api/analyze/batch', json=body).status_code == 200
@@ -0,0 +1,49 @@
+from code_quality_analyzer.complexity_analyzer import ComplexityAnalyzer
+
+
+SOURCE = '''
+def f(a, b):
+    if a and b:
+        for x in a:
+            if x or b:
+                pass
+            elif x:
+                return f(x)
+            else:
+                pass
+    try:
+        pass
+    except ValueError:
+        while b:
+            pass
+
+
+def flat():
+    return 1
+'''
+
+
+def test_cognitive_complexity_per_function():
+    cognitive = ComplexityAnalyzer().analyze(SOURCE)['cognitive']
+    functions = {f['name']: f for f in cognitive['functions']}
+    # if+and (2), for (2), if+or (4), elif (1), recursion (1), else (1), except (1), while (2)
+    assert functions['f']['cognitive_complexity'] == 14
+    assert functions['f']['nesting_depth'] == 3
+    assert functions['flat'] == {'name': 'flat', 'line': 18, 'nesting_depth': 0, 'cognitive_complexity': 0}
+    assert cognitive['max_nesting'] == 3
+    assert cognitive['max_cognitive'] == 14
+
+
+def test_cognitive_complexity_handles_deep_nesting():
+    body = ''.join('    ' * (i + 1) + f'if x{i}:\n' for i in range(60)) + '    ' * 61 + 'pass\n'
+    cognitive = ComplexityAnalyzer().analyze('def deep():\n' + body)['cognitive']
+    assert cognitive['max_nesting'] == 60
+    assert cognitive['functions'][0]['cognitive_complexity'] == sum(range(1, 61))
+
+
+def test_analyze_without_parse_keeps_raw_metrics():
+    result = ComplexityAnalyzer().analyze('x = = 1\ny = 2\n')
+    assert result['cyclomatic'] == []
+    assert result['heatmap_rle']['lines'] == 0
+    assert result['maintainability']['score'] == 0
+    assert result['raw_metrics']['loc'] == 2
@@ -1,4 +1,5 @@
 import os
+import threading
 from code_quality_analyzer.detectors import RuleBasedDetector
 
 
@@ -34,3 +35,174 @@ def test_ml_train_and_predict(tmp_path):
     assert acc >= 0.0
     pred, prob = predict_code_quality('def add(a,b):\n    return a + b\n', model_path)
     assert pred in ['good', 'bad']
+
+
+def test_detect_all_parses_once(monkeypatch):
+    from code_quality_analyzer import detectors
+    this_dir = os.path.dirname(__file__)
+    bad = os.path.join(this_dir, '..', 'examples', 'bad_example.py')
+    with open(bad, 'r', encoding='utf8') as fh:
+        src = fh.read()
+    det = RuleBasedDetector(max_function_length=20, max_nesting=3)
+    separate = []
+    for detect in (det.detect_long_functions, det.detect_deep_nesting,
+                   det.detect_unused_imports, det.detect_poor_naming):
+        separate.extend(s.to_dict() for s in detect(src))
+
+    calls = []
+    real_parse = detectors.ast.parse
+    monkeypatch.setattr(detectors.ast, 'parse', lambda *a, **kw: calls.append(1) or real_parse(*a, **kw))
+    rules = [r for r in det.python_rules() if not isinstance(r, detectors.UnusedVariableRule)]
+    shared = [s.to_dict() for s in det.run_rules(src, rules)]
+    assert len(calls) == 1
+    assert shared == separate
+
+
+def test_model_registry_caches_and_reloads(tmp_path, monkeypatch):
+    from code_quality_analyzer import ml_classifier
+    ds = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'synthetic_dataset.csv')
+    model_path = str(tmp_path / 'm.joblib')
+    ml_classifier.train_model(ml_classifier.load_dataset(ds), model_path)
+
+    loads = []
+    real_load = ml_classifier.load_model
+    monkeypatch.setattr(ml_classifier, 'load_model', lambda p: loads.append(p) or real_load(p))
+    registry = ml_classifier.ModelRegistry(max_models=1)
+    first = registry.get(model_path)
+    assert registry.get(model_path) is first
+    assert len(loads) == 1
+
+    # Rewriting the file with identical bytes keeps the cached model
+    data = open(model_path, 'rb').read()
+    with open(model_path, 'wb') as fh:
+        fh.write(data)
+    os.utime(model_path, ns=(1, 1))
+    assert registry.get(model_path) is first
+    assert len(loads) == 1
+
+    # A second model evicts the first (max_models=1)
+    other_path = str(tmp_path / 'other.joblib')
+    with open(other_path, 'wb') as fh:
+        fh.write(data)
+    registry.get(other_path)
+    registry.get(model_path)
+    assert len(loads) == 3
+
+
+def test_ml_batch_matches_single(tmp_path):
+    from code_quality_analyzer.ml_classifier import (
+        load_dataset, train_model, predict_code_quality, predict_code_quality_batch)
+    ds = os.path.join(os.path.dirname(__file__), '..', 'datasets', 'synthetic_dataset.csv')
+    model_path = str(tmp_path / 'm.joblib')
+    train_model(load_dataset(ds), model_path)
+    codes = [
+        'def add(a,b):\n    return a + b\n',
+        'import os\n\ndef f():\n    x=1\n    if x:\n        if x:\n            return x\n',
+        'class Foo:\n    pass\n',
+    ]
+    batch = predict_code_quality_batch(codes, model_path)
+    assert batch == [predict_code_quality(code, model_path) for code in codes]
+    assert predict_code_quality_batch([], model_path) == []
+
+
+def test_inprocess_linters_match_subprocess():
+    src = 'import os\nx=1\ndef f(a):\n    return a\n'
+    inproc = RuleBasedDetector(inprocess_linters=True)
+    subproc = RuleBasedDetector(inprocess_linters=False)
+    flake8_in = [s.to_dict() for s in inproc.detect_with_flake8(src)]
+    assert flake8_in == [s.to_dict() for s in subproc.detect_with_flake8(src)]
+    assert any('[F401]' in s['message'] for s in flake8_in)
+    pylint_in = [s.to_dict() for s in inproc.detect_with_pylint(src)]
+    assert pylint_in == [s.to_dict() for s in subproc.detect_with_pylint(src)]
+
+
+def test_pylint_worker_restarts_after_timeout():
+    from code_quality_analyzer.inprocess_linters import PylintWorker
+    worker = PylintWorker(cache_limit=50)
+    try:
+        assert any('missing-function-docstring' in m for _, m in worker.run('def f():\n    return 1\n', 30))
+        try:
+            worker.run('x = 1\n', 0)
+            raise AssertionError('expected TimeoutError')
+        except TimeoutError:
+            pass
+        # A fresh process, and no result left over from the previous snippet
+        messages = worker.run('import os\n', 30)
+        assert any('unused-import' in m for _, m in messages)
+        assert not any('missing-function-docstring' in m for _, m in messages)
+    finally:
+        worker.stop()
+
+
+def test_pylint_worker_times_out_on_a_partial_reply(monkeypatch):
+    import subprocess
+    import sys
+    import time
+    from code_quality_analyzer.inprocess_linters import PylintWorker
+    worker = PylintWorker(cache_limit=50)
+    # A worker that starts its reply line but never finishes it
+    monkeypatch.setattr(worker, '_start', lambda: setattr(worker, '_process', subprocess.Popen(
+        [sys.executable, '-c', 'import sys, time; sys.stdout.write(\'{"messages": [\'); sys.stdout.flush(); '
+                               'time.sleep(30)'],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0)))
+    start = time.monotonic()
+    try:
+        worker.run('x = 1\n', 0.5)
+        raise AssertionError('expected TimeoutError')
+    except TimeoutError:
+        pass
+    finally:
+        worker.stop()
+    assert time.monotonic() - start < 5
+
+
+def test_pylint_worker_lints_the_string_without_a_file(monkeypatch, tmp_path):
+    from code_quality_analyzer.inprocess_linters import PylintWorker
+    monkeypatch.setenv('TMPDIR', str(tmp_path))
+    worker = PylintWorker(cache_limit=50)
+    try:
+        assert any('unused-import' in m for _, m in worker.run('import os\n', 30))
+    finally:
+        worker.stop()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_model_registry_loads_outside_its_lock(tmp_path, monkeypatch):
+    from code_quality_analyzer import ml_classifier
+    slow_path, fast_path = str(tmp_path / 'slow.joblib'), str(tmp_path / 'fast.joblib')
+    for path in (slow_path, fast_path):
+        with open(path, 'wb') as fh:
+            fh.write(path.encode())
+    loading, release = threading.Event(), threading.Event()
+    loads = []
+
+    def load_model(path):
+        loads.append(path)
+        if path == slow_path:
+            loading.set()
+            release.wait(5)
+        return path
+
+    monkeypatch.setattr(ml_classifier, 'load_model', load_model)
+    registry = ml_classifier.ModelRegistry(max_models=1)
+    slow = [threading.Thread(target=registry.get, args=(slow_path,)) for _ in range(2)]
+    for thread in slow:
+        thread.start()
+    try:
+        assert loading.wait(5)
+        # Neither loading nor hashing another model waits for the slow load
+        assert registry.get(fast_path) == fast_path
+        assert registry.model_hash(fast_path)
+    finally:
+        release.set()
+        for thread in slow:
+            thread.join(5)
+    assert loads.count(slow_path) == 1
+
+    # Hashes are bounded like the models
+    for i in range(5):
+        path = str(tmp_path / f'{i}.joblib')
+        with open(path, 'wb') as fh:
+            fh.write(b'%d' % i)
+        registry.model_hash(path)
+    assert len(registry._hashes) == 1
@@ -0,0 +1,61 @@
+import json
+import time
+
+from code_quality_analyzer.heatmap import Heatmap, heatmap_rows, run_length_encode
+from code_quality_analyzer.universal_complexity import UniversalComplexityAnalyzer
+from code_quality_analyzer.webapp import create_app
+
+
+def test_run_length_encoding_round_trips():
+    heatmap = Heatmap()
+    for score in [0, 0, 0, 3, 3, 7, 0]:
+        heatmap.append(score, ['long_line'] if score == 7 else None)
+    data = json.loads(json.dumps(heatmap.to_dict()))
+    assert data['scores'] == [0, 3, 3, 2, 7, 1, 0, 1]
+    assert data['levels'] == ['clean', 3, 'medium', 2, 'high', 1, 'clean', 1]
+    assert data['issues'] == [[6, ['long_line']]]
+    assert Heatmap.from_dict(data).to_dict() == data
+    assert run_length_encode([]) == []
+
+
+def test_heatmap_rows_expand_to_per_line_dicts():
+    code = 'x = 1\n' + ' ' * 20 + 'y = 2\n'
+    rows = heatmap_rows(UniversalComplexityAnalyzer('python').analyze(code)['heatmap_rle'])
+    assert rows == [
+        {'line': 1, 'score': 0, 'level': 'clean', 'issues': []},
+        {'line': 2, 'score': 3, 'level': 'medium', 'issues': []},
+        {'line': 3, 'score': 0, 'level': 'clean', 'issues': []},
+    ]
+
+
+def test_job_api_serves_per_line_heatmap_next_to_rle():
+    client = create_app().test_client()
+    code = 'def f(x):\n    if x:\n        return 1\n    return 2\n'
+    for _ in range(2):
+        # Second run is answered from the cache, which keeps only the encoded form
+        job_id = client.post('/api/jobs', json={'code': code}).get_json()['job_id']
+        deadline = time.time() + 30
+        while client.get(f'/api/jobs/{job_id}').get_json()['status'] not in ('done', 'failed'):
+            assert time.time() < deadline
+            time.sleep(0.05)
+        job = client.get(f'/api/jobs/{job_id}').get_json()
+        complexity = job['result']['complexity']
+        assert complexity['heatmap'] == heatmap_rows(complexity['heatmap_rle'])
+        assert [row['line'] for row in complexity['heatmap']] == [1, 2, 3, 4]
+        assert all(isinstance(row['score'], int) for row in complexity['heatmap'])
+
+
+def test_index_page_gets_per_line_heatmap_from_cache_too(monkeypatch):
+    import code_quality_analyzer.webapp as webapp
+    rendered = []
+    monkeypatch.setattr(webapp, 'render_template_string',
+                        lambda template, **context: rendered.append(context) or '')
+    client = create_app().test_client()
+    code = 'def g(y):\n    while y:\n        y -= 1\n    return y\n'
+    for _ in range(2):
+        client.post('/', data={'code': code, 'lang': 'python'})
+    assert len(rendered) == 2
+    for context in rendered:
+        complexity = context['analysis']['complexity']
+        assert complexity['heatmap'] == heatmap_rows(complexity['heatmap_rle'])
+        assert [row['line'] for row in complexity['heatmap']] == [1, 2, 3, 4]
@@ -0,0 +1,111 @@
+import os
+import subprocess
+
+from code_quality_analyzer import incremental
+from code_quality_analyzer.incremental import AnalysisIndex, blob_hash, scan_incremental
+
+
+def _write(root, name, text):
+    path = os.path.join(root, name)
+    with open(path, 'w') as fh:
+        fh.write(text)
+    return path
+
+
+def test_blob_hash_matches_git(tmp_path):
+    path = _write(str(tmp_path), 'a.py', 'x = 1\n')
+    expected = subprocess.run(['git', 'hash-object', path], capture_output=True, text=True).stdout.strip()
+    assert blob_hash(b'x = 1\n') == expected
+
+
+def test_only_changed_files_are_reanalyzed(tmp_path, monkeypatch):
+    root = str(tmp_path / 'repo')
+    os.makedirs(root)
+    _write(root, 'a.py', 'import os\n')
+    _write(root, 'b.py', 'x = 1\nprint(x)\n')
+    index_path = str(tmp_path / 'index.json')
+
+    analyzed = []
+    real_scan = incremental.scan_files
+    monkeypatch.setattr(incremental, 'scan_files',
+                        lambda files, *a, **kw: real_scan(analyzed.extend(files) or files, *a, **kw))
+
+    first = list(scan_incremental(root, AnalysisIndex(index_path, 'fp'), workers=1))
+    assert len(analyzed) == 2
+
+    analyzed.clear()
+    _write(root, 'b.py', 'import sys\n')
+    index = AnalysisIndex(index_path, 'fp')
+    second = list(scan_incremental(root, index, workers=1))
+    assert [os.path.basename(p) for p, _ in analyzed] == ['b.py']
+    assert (index.reused, index.analyzed) == (1, 1)
+    assert second[0] == first[0]
+    assert second[1]['smells'][0]['kind'] == 'unused_import'
+
+    # A new fingerprint (analyzer version / model) invalidates the index
+    analyzed.clear()
+    list(scan_incremental(root, AnalysisIndex(index_path, 'other'), workers=1))
+    assert len(analyzed) == 2
+
+
+def test_base_ref_never_reuses_stale_results(tmp_path, monkeypatch):
+    root = str(tmp_path / 'repo')
+    os.makedirs(root)
+
+    def git(*args):
+        subprocess.run(['git', '-C', root, '-c', 'user.name=t', '-c', 'user.email=t@t'] + list(args),
+                       check=True, capture_output=True)
+
+    git('init', '-q')
+    _write(root, 'a.py', 'x = 1\nprint(x)\n')
+    _write(root, 'é.py', 'y = 2\nprint(y)\n')
+    git('add', '.')
+    git('commit', '-qm', 'one')
+    index_path = str(tmp_path / 'index.json')
+    analyzed = []
+    real_scan = incremental.scan_files
+    monkeypatch.setattr(incremental, 'scan_files',
+                        lambda files, *a, **kw: real_scan(analyzed.extend(files) or files, *a, **kw))
+
+    def scan():
+        analyzed.clear()
+        results = list(scan_incremental(root, AnalysisIndex(index_path, 'fp'), workers=1, base_ref='HEAD'))
+        return sorted(os.path.basename(p) for p, _ in analyzed), results
+
+    assert scan()[0] == ['a.py', 'é.py']
+    # Committed since the index was built: unchanged relative to the new base
+    _write(root, 'a.py', 'import os\n')
+    git('commit', '-qam', 'two')
+    names, results = scan()
+    assert names == ['a.py']
+    assert any(s['kind'] == 'unused_import' for r in results for s in r['smells'])
+    # An uncommitted edit to a non-ASCII path is seen as changed
+    _write(root, 'é.py', 'import sys\n')
+    assert scan()[0] == ['é.py']
+    assert scan()[0] == []
+
+
+def test_same_content_in_another_language_is_analyzed_again(tmp_path):
+    root = str(tmp_path / 'repo')
+    os.makedirs(root)
+    _write(root, 'a.py', 'x = 1\n')
+    index_path = str(tmp_path / 'index.json')
+    list(scan_incremental(root, AnalysisIndex(index_path, 'fp'), workers=1))
+    _write(root, 'b.js', 'x = 1\n')
+    index = AnalysisIndex(index_path, 'fp')
+    results = list(scan_incremental(root, index, workers=1))
+    assert (index.reused, index.analyzed) == (1, 1)
+    assert sorted(r['language'] for r in results) == ['javascript', 'python']
+
+
+def test_base_ref_outside_a_repository_falls_back_to_hashing(tmp_path):
+    root = str(tmp_path / 'plain')
+    os.makedirs(root)
+    _write(root, 'a.py', 'x = 1\nprint(x)\n')
+    index_path = str(tmp_path / 'index.json')
+    index = AnalysisIndex(index_path, 'fp')
+    assert len(list(scan_incremental(root, index, workers=1, base_ref='HEAD'))) == 1
+    assert 'HEAD' in index.warning and index.analyzed == 1
+    index = AnalysisIndex(index_path, 'fp')
+    list(scan_incremental(root, index, workers=1, base_ref='no-such-ref'))
+    assert index.reused == 1
@@ -0,0 +1,258 @@
+import threading
+import time
+
+from code_quality_analyzer.jobs import JobManager, JobQueueFull, JobStoreUnavailable, RedisJobStore
+from code_quality_analyzer.webapp import create_app
+
+
+def _bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode()
+
+
+class FakeRedis:
+    """The few Redis commands the job store uses, with bytes replies like redis-py"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.lists = {}
+        self.changed = threading.Condition()
+        self.after_lrange = None  # called once after the next lrange, to interleave a writer
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self.changed:
+            fields = self.hashes.setdefault(key, {})
+            for k, v in (mapping or {field: value}).items():
+                fields[_bytes(k)] = _bytes(v)
+
+    def hget(self, key, field):
+        with self.changed:
+            return self.hashes.get(key, {}).get(_bytes(field))
+
+    def hgetall(self, key):
+        with self.changed:
+            return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, seconds):
+        pass
+
+    def rpush(self, key, value):
+        with self.changed:
+            items = self.lists.setdefault(key, [])
+            items.append(_bytes(value))
+            self.changed.notify_all()
+            return len(items)
+
+    def lrem(self, key, count, value):
+        with self.changed:
+            self.lists.get(key, []).remove(_bytes(value))
+
+    def blpop(self, keys, timeout=0):
+        deadline = time.monotonic() + timeout
+        with self.changed:
+            while True:
+                for key in keys:
+                    if self.lists.get(key):
+                        return _bytes(key), self.lists[key].pop(0)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.changed.wait(remaining)
+
+    def delete(self, *keys):
+        with self.changed:
+            for key in keys:
+                self.hashes.pop(key, None)
+                self.lists.pop(key, None)
+
+    def lrange(self, key, start, end):
+        with self.changed:
+            items = self.lists.get(key, [])
+            result = items[start:] if end == -1 else items[start:end + 1]
+        hook, self.after_lrange = self.after_lrange, None
+        if hook:
+            hook()
+        return list(result)
+
+
+class FakePipeline:
+    """Queued commands applied together on execute(), like a MULTI/EXEC pipeline"""
+
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        with self.client.changed:
+            return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+def _wait_done(get, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('job did not finish')
+
+
+def test_job_streams_sections_then_result():
+    def runner(payload, on_section):
+        on_section('smells', {'smells': []})
+        on_section('complexity', {'complexity': {'n': payload['n']}})
+        return {'total': payload['n']}
+
+    manager = JobManager(runner, workers=1, queue_size=0)
+    job_id = manager.submit({'n': 3})
+    job = _wait_done(manager.get, job_id)
+    assert job['sections'] == {'smells': [], 'complexity': {'n': 3}}
+    assert job['result'] == {'total': 3}
+
+    events = list(manager.stream(job_id))
+    assert [e.split('\n')[1] for e in events] == ['event: section', 'event: section', 'event: done']
+    # Resuming after the second event only replays the rest
+    assert len(list(manager.stream(job_id, last_event_id=2))) == 1
+
+
+def test_full_queue_is_rejected():
+    import threading
+    release = threading.Event()
+    manager = JobManager(lambda payload, on_section: release.wait(5) and {}, workers=1, queue_size=0)
+    manager.submit({})
+    try:
+        manager.submit({})
+        raise AssertionError('expected JobQueueFull')
+    except JobQueueFull:
+        pass
+    finally:
+        release.set()
+
+
+def test_jobs_api_runs_analysis():
+    client = create_app().test_client()
+    resp = client.post('/api/jobs', json={'code': 'import os\n\ndef f():\n    return 1\n'})
+    assert resp.status_code == 202
+    job_id = resp.get_json()['job_id']
+    job = _wait_done(lambda jid: client.get(f'/api/jobs/{jid}').get_json(), job_id)
+    assert job['status'] == 'done'
+    assert 'unused_import' in [s['kind'] for s in job['result']['smells']]
+    stream = client.get(f'/api/jobs/{job_id}/events').get_data(as_text=True)
+    assert stream.rstrip().split('\n')[-2] == 'event: done'
+    assert client.get('/api/jobs/missing').status_code == 404
+
+
+def test_event_stream_is_capped():
+    import threading
+    release = threading.Event()
+    manager = JobManager(lambda payload, on_section: release.wait(5) and {}, workers=1, stream_seconds=0.1)
+    job_id = manager.submit({})
+    try:
+        events = list(manager.stream(job_id, heartbeat=0.05))
+    finally:
+        release.set()
+    assert events[-1] == 'event: timeout\ndata: {"status": "running"}\n\n'
+
+
+def test_memory_store_is_refused_with_several_workers(monkeypatch):
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    monkeypatch.delenv('JOBS_REDIS_URL', raising=False)
+    try:
+        JobManager.from_env(lambda payload, on_section: {})
+        raise AssertionError('expected JobStoreUnavailable')
+    except JobStoreUnavailable:
+        pass
+    client = create_app().test_client()
+    resp = client.post('/api/jobs', json={'code': 'x = 1\n'})
+    assert resp.status_code == 503 and 'JOBS_REDIS_URL' in resp.get_json()['error']
+    assert client.post('/api/analyze', json={'code': 'x = 1\n'}).status_code == 200
+
+
+def test_redis_stream_keeps_the_done_event_that_lands_between_reads():
+    client = FakeRedis()
+    store = RedisJobStore(client, poll_interval=0.01)
+    store.create('j')
+    store.set_status('j', 'running')
+    store.add_event('j', 'section', {'stage': 'smells', 'data': {'smells': []}})
+    manager = JobManager(lambda payload, on_section: {}, store=store)
+    stream = manager.stream('j', last_event_id=1, heartbeat=0.05)
+    # The job finishes right after the store has read its (still empty) events
+    client.after_lrange = lambda: store.add_event('j', 'done', {'total': 1})
+    events = list(stream)
+    assert [e.split('\n')[1] for e in events] == ['event: done']
+    assert manager.get('j')['result'] == {'total': 1}
+
+
+def test_redis_store_records_jobs_and_events():
+    store = RedisJobStore(FakeRedis())
+    assert store.get('missing') is None
+    store.create('j')
+    store.set_status('j', 'running')
+    store.add_event('j', 'section', {'stage': 'smells', 'data': {'smells': []}})
+    store.add_event('j', 'done', {'total': 1})
+    job = store.get('j')
+    assert job['status'] == 'done'
+    assert [(e['id'], e['event']) for e in job['events']] == [(1, 'section'), (2, 'done')]
+    assert [e['id'] for e in store.wait_events('j', 1, timeout=0)] == [2]
+    assert store.wait_events('j', 2, timeout=0) == []
+
+
+def test_redis_queue_is_pulled_by_any_worker():
+    client = FakeRedis()
+    # Another worker process took the request and queued the job
+    producer = RedisJobStore(client)
+    producer.create('j')
+    assert producer.enqueue('j', {'n': 2}, limit=4)
+
+    ran_in = []
+
+    def runner(payload, on_section):
+        ran_in.append(threading.current_thread().name)
+        on_section('smells', {'smells': []})
+        return {'total': payload['n']}
+
+    consumer = JobManager(runner, store=RedisJobStore(client), workers=1)
+    job = _wait_done(consumer.get, 'j')
+    assert job['result'] == {'total': 2} and ran_in == ['job-0']
+    job_id = consumer.submit({'n': 5})
+    assert _wait_done(JobManager(runner, store=producer).get, job_id)['result'] == {'total': 5}
+
+
+def test_redis_queue_is_bounded():
+    client = FakeRedis()
+    store = RedisJobStore(client)
+    release = threading.Event()
+    manager = JobManager(lambda payload, on_section: release.wait(5) and {}, store=store,
+                         workers=1, queue_size=0)
+    try:
+        running = manager.submit({})
+        while store.get(running)['status'] != 'running':
+            time.sleep(0.01)
+        waiting = manager.submit({})
+        try:
+            manager.submit({})
+            raise AssertionError('expected JobQueueFull')
+        except JobQueueFull:
+            pass
+        assert len(client.lists[RedisJobStore.QUEUE_KEY]) == 1
+        assert sorted(k for k in client.hashes if k.startswith('cqa:job:')) == sorted(
+            [f'cqa:job:{running}', f'cqa:job:{waiting}'])
+    finally:
+        release.set()
+
+
+def test_jobs_ignore_client_model_paths(monkeypatch, tmp_path):
+    from code_quality_analyzer import webapp
+    monkeypatch.delenv('MODEL_PATH', raising=False)
+    evil = str(tmp_path / 'evil.joblib')
+    seen = []
+    monkeypatch.setattr(webapp, 'run_analysis', lambda *args, **kwargs: seen.append(kwargs['model_path']) or {})
+    client = create_app().test_client()
+    job_id = client.post('/api/jobs', json={'code': 'x = 1\n', 'model': evil}).get_json()['job_id']
+    _wait_done(lambda jid: client.get(f'/api/jobs/{jid}').get_json(), job_id)
+    assert len(seen) == 1 and seen[0] != evil
@@ -0,0 +1,119 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from code_quality_analyzer.linter_pool import LinterDaemon, LinterPool, LinterPoolFull
+
+
+def _cat(path):
+    return [sys.executable, '-c', 'import sys; print(open(sys.argv[1]).read())', path]
+
+
+def test_pool_reuses_worker_workspace():
+    pool = LinterPool(workers=1, queue_size=2, timeout=30)
+    paths = []
+    try:
+        for source in ('first', 'second'):
+            proc = pool.run('demo', 'snippet.txt', source,
+                            lambda path: paths.append(path) or _cat(path))
+            assert proc.stdout.strip() == source
+        assert paths[0] == paths[1]
+    finally:
+        pool.shutdown()
+    assert not os.path.exists(paths[0])
+
+
+def test_pool_timeout_and_bounded_queue():
+    pool = LinterPool(workers=1, queue_size=0, timeout=0.5)
+    sleep = lambda path: [sys.executable, '-c', 'import time; time.sleep(5)']
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            pool.run('demo', 'snippet.txt', '', sleep)
+
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocker(path):
+            started.set()
+            release.wait(5)
+            return _cat(path)
+
+        worker = threading.Thread(target=pool.run, args=('demo', 'snippet.txt', 'x', blocker))
+        worker.start()
+        started.wait(5)
+        with pytest.raises(LinterPoolFull):
+            pool.run('demo', 'snippet.txt', 'y', _cat)
+        release.set()
+        worker.join(5)
+        assert pool.run('demo', 'snippet.txt', 'z', _cat).stdout.strip() == 'z'
+    finally:
+        pool.shutdown()
+
+
+def test_forked_child_gets_its_own_slots():
+    pool = LinterPool(workers=1, queue_size=0, timeout=30)
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocker(path):
+        started.set()
+        release.wait(10)
+        return _cat(path)
+
+    worker = threading.Thread(target=pool.run, args=('demo', 'snippet.txt', 'x', blocker))
+    worker.start()
+    try:
+        started.wait(5)
+        pid = os.fork()
+        if pid == 0:
+            # The parent's job holds the only slot, but never finishes here
+            try:
+                ok = pool.run('demo', 'snippet.txt', 'child', _cat).stdout.strip() == 'child'
+            except BaseException:
+                ok = False
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+    finally:
+        release.set()
+        worker.join(5)
+        pool.shutdown()
+
+
+def _fake_daemon(tmp_path, monkeypatch, body):
+    client = tmp_path / 'fake_d'
+    client.write_text(f'#!{sys.executable}\nimport sys, time\n{body}\n')
+    client.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{tmp_path}{os.pathsep}{os.environ.get('PATH', '')}")
+    log = tmp_path / 'calls.log'
+    return LinterDaemon(
+        'fake_d',
+        lambda path: ['fake_d', 'lint', path],
+        [sys.executable, '-c', f'open({str(log)!r}, "a").write("stop\\n")']), log
+
+
+def test_pool_prefers_an_installed_daemon(tmp_path, monkeypatch):
+    daemon, _ = _fake_daemon(tmp_path, monkeypatch, 'print("daemon", open(sys.argv[2]).read())')
+    pool = LinterPool(workers=1, queue_size=0, timeout=30)
+    try:
+        proc = pool.run('demo', 'snippet.txt', 'x', _cat, daemon=daemon)
+        assert proc.stdout.strip() == 'daemon x'
+        missing = LinterDaemon('no-such-linter-daemon', lambda path: ['no-such-linter-daemon'], [])
+        proc = pool.run('other', 'snippet.txt', 'y', _cat, daemon=missing)
+        assert proc.stdout.strip() == 'y'
+    finally:
+        pool.shutdown()
+
+
+def test_pool_stops_a_hung_daemon(tmp_path, monkeypatch):
+    daemon, log = _fake_daemon(tmp_path, monkeypatch, 'time.sleep(5)')
+    pool = LinterPool(workers=1, queue_size=0, timeout=0.5)
+    try:
+        with pytest.raises(subprocess.TimeoutExpired):
+            pool.run('demo', 'snippet.txt', 'x', _cat, daemon=daemon)
+        assert log.read_text() == 'stop\n'
+    finally:
+        pool.shutdown()
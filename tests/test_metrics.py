@@ -0,0 +1,85 @@
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from code_quality_analyzer.metrics import MetricsRegistry
+
+
+def _registry(directory=None):
+    registry = MetricsRegistry(directory, flush_interval=0)
+    hits = registry.counter('t_hits_total', 'Hits', ('result',))
+    seconds = registry.histogram('t_seconds', 'Durations', ('stage',), buckets=(0.1, 1.0))
+    return registry, hits, seconds
+
+
+def test_render_prometheus_text():
+    registry, hits, seconds = _registry()
+    hits.inc(result='hit')
+    hits.inc(2, result='miss')
+    seconds.observe(0.05, stage='parse')
+    seconds.observe(0.5, stage='parse')
+    seconds.observe(5, stage='parse')
+    text = registry.render()
+    assert '# TYPE t_hits_total counter\n' in text
+    assert 't_hits_total{result="miss"} 2\n' in text
+    assert '# TYPE t_seconds histogram\n' in text
+    assert 't_seconds_bucket{stage="parse",le="0.1"} 1\n' in text
+    assert 't_seconds_bucket{stage="parse",le="1"} 2\n' in text
+    assert 't_seconds_bucket{stage="parse",le="+Inf"} 3\n' in text
+    assert 't_seconds_sum{stage="parse"} 5.55\n' in text
+    assert 't_seconds_count{stage="parse"} 3\n' in text
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_directory_sums_every_process(tmp_path):
+    registry, hits, seconds = _registry(str(tmp_path))
+    hits.inc(result='hit')
+
+    def worker():
+        # The forked child starts from empty series and reports only its own
+        hits.inc(3, result='hit')
+        seconds.observe(0.5, stage='lint')
+        registry.flush()
+
+    child = multiprocessing.get_context('fork').Process(target=worker)
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert len(list(tmp_path.glob('metrics-*.json'))) == 2
+    text = registry.render()
+    assert 't_hits_total{result="hit"} 4\n' in text
+    assert 't_seconds_count{stage="lint"} 1\n' in text
+
+
+def test_client_languages_cannot_mint_series():
+    from code_quality_analyzer.metrics import REGISTRY, language_label
+    from code_quality_analyzer.orchestrator import run_analysis
+    assert language_label('Python') == 'python'
+    assert language_label('') == ''
+    for i in range(3):
+        run_analysis('x = 1\n', f'made-up-{i}', degraded='load')
+    text = REGISTRY.render()
+    assert 'made-up' not in text
+    assert 'stage="parse",language="other"' in text
+    assert 'cqa_degraded_analyses_total{language="other",reason="load"}' in text
+
+
+def test_snapshots_are_written_off_the_request_thread(tmp_path):
+    registry, hits, _ = _registry(str(tmp_path))
+    writes = []
+    write = registry._write_snapshot
+
+    def recording_write(snapshot, pid):
+        writes.append((threading.current_thread() is threading.main_thread(), registry._lock.locked()))
+        write(snapshot, pid)
+
+    registry._write_snapshot = recording_write
+    hits.inc(result='hit')
+    deadline = time.monotonic() + 5
+    while not writes:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert writes[0] == (False, False)
+    assert len(list(tmp_path.glob('metrics-*.json'))) == 1
@@ -0,0 +1,90 @@
+import sys
+import threading
+import time
+
+from code_quality_analyzer.linter_pool import LinterPool
+from code_quality_analyzer.orchestrator import AnalysisOrchestrator, StageTimeout, run_analysis
+
+
+def test_stage_timeout_degrades_only_that_stage():
+    orchestrator = AnalysisOrchestrator(max_workers=4, stage_timeout=0.2)
+    failures = {}
+
+    def record(name):
+        return lambda e: failures.setdefault(name, e) and None
+
+    results = orchestrator.run_stages(
+        {'fast': lambda: 'ok', 'slow': lambda: time.sleep(1) or 'late', 'broken': lambda: 1 / 0},
+        {name: record(name) for name in ('fast', 'slow', 'broken')},
+    )
+    assert results['fast'] == 'ok'
+    assert isinstance(failures['slow'], StageTimeout)
+    assert isinstance(failures['broken'], ZeroDivisionError)
+
+
+def test_run_analysis_merges_sections():
+    code = 'import os\n\ndef f(a):\n    x = 1\n    return a\n'
+    analysis = run_analysis(code, 'python', enable_autofix=True, enable_security=True)
+    kinds = [s['kind'] for s in analysis['smells']]
+    assert 'unused_import' in kinds
+    assert analysis['complexity']['cyclomatic']
+    assert 'vulnerabilities' in analysis['security']
+    assert 'fixes' in analysis['auto_fix']
+    assert 'total_score' in analysis['quality_details']
+    assert 'errors' not in analysis
+
+
+def test_run_analysis_reports_sections_as_they_finish():
+    sections = {}
+    analysis = run_analysis('def f():\n    return 1\n', 'python', enable_security=True,
+                            on_section=lambda stage, fragment: sections.setdefault(stage, fragment))
+    assert set(sections) == {'smells', 'ml', 'complexity', 'security'}
+    assert sections['smells']['smells'] == analysis['smells']
+    assert sections['security']['security'] == analysis['security']
+
+
+def test_degraded_analysis_runs_the_fast_profile():
+    code = 'import os\n\ndef f(a):\n    x = 1\n    return a\n'
+    sections = {}
+    analysis = run_analysis(code, 'python', enable_autofix=True, enable_security=True,
+                            model_path='missing.joblib', degraded='large_input',
+                            on_section=lambda stage, fragment: sections.setdefault(stage, fragment))
+    assert set(sections) == {'smells', 'complexity', 'security'}
+    kinds = {s['kind'] for s in analysis['smells']}
+    assert 'unused_import' in kinds and not kinds & {'flake8', 'pylint'}
+    assert analysis['complexity']['cyclomatic']
+    assert 'vulnerabilities' in analysis['security']
+    assert analysis['ml_classification'] is None
+    assert analysis['degraded'] == {'reason': 'large_input', 'partial': ['smells'],
+                                    'skipped': ['ml_classification', 'auto_fix']}
+
+
+def test_stage_timeout_starts_when_the_stage_starts():
+    orchestrator = AnalysisOrchestrator(max_workers=1, stage_timeout=0.5)
+    # Run back to back on one thread: together they take longer than the timeout
+    results = orchestrator.run_stages(
+        {'first': lambda: time.sleep(0.3) or 'a', 'second': lambda: time.sleep(0.3) or 'b'},
+        {'first': lambda e: e, 'second': lambda e: e},
+    )
+    assert results == {'first': 'a', 'second': 'b'}
+
+
+def test_timed_out_stage_stops_its_linters():
+    pool = LinterPool(workers=1, queue_size=0, timeout=30)
+    stopped = threading.Event()
+
+    def lint():
+        try:
+            return pool.run('demo', 'snippet.txt', '',
+                            lambda path: [sys.executable, '-c', 'import time; time.sleep(10)'])
+        finally:
+            stopped.set()
+
+    orchestrator = AnalysisOrchestrator(max_workers=1, stage_timeout=0.3)
+    try:
+        results = orchestrator.run_stages({'lint': lint}, {'lint': lambda e: e})
+        assert isinstance(results['lint'], StageTimeout)
+        # The linter is cut off at the stage deadline and the thread is freed
+        assert stopped.wait(3)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,37 @@
+import pstats
+
+import pytest
+
+from code_quality_analyzer import profiling
+from code_quality_analyzer.profiling import ProfilerBusy, profile_call
+from code_quality_analyzer.webapp import create_app
+
+
+def _work():
+    return [str(i) * 10 for i in range(20000)]
+
+
+def test_profile_call_reports_functions_allocations_and_pstats(tmp_path):
+    path = str(tmp_path / 'run.pstats')
+    result, report = profile_call(_work, limit=5, pstats_path=path)
+    assert len(result) == 20000
+    assert '_work' in [f['function'] for f in report['top_functions']]
+    assert len(report['top_allocations']) <= 5
+    assert report['top_allocations'][0]['size_bytes'] > 0
+    assert report['peak_memory_bytes'] > 0
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_profiler_is_exclusive():
+    with profiling._PROFILE_LOCK:
+        with pytest.raises(ProfilerBusy):
+            profile_call(_work, blocking=False)
+
+
+def test_api_profile_bypasses_cache():
+    client = create_app().test_client()
+    body = {'code': 'import os\n\ndef f():\n    return 1\n', 'model': 'missing.joblib'}
+    assert 'profile' not in client.post('/api/analyze', json=body).get_json()
+    profiled = client.post('/api/analyze', json=dict(body, profile=True)).get_json()
+    assert profiled['profile']['top_functions']
+    assert 'unused_import' in [s['kind'] for s in profiled['smells']]
@@ -0,0 +1,45 @@
+import os
+
+from code_quality_analyzer.project_scanner import ProjectSummary, iter_source_files, scan_directory
+
+
+def _make_tree(root):
+    os.makedirs(os.path.join(root, 'pkg'))
+    os.makedirs(os.path.join(root, 'node_modules', 'dep'))
+    with open(os.path.join(root, 'pkg', 'mod.py'), 'w') as fh:
+        fh.write('import os\n\ndef f(a):\n    x = 1\n    return a\n')
+    with open(os.path.join(root, 'pkg', 'broken.py'), 'w') as fh:
+        fh.write('def f(:\n')
+    with open(os.path.join(root, 'app.js'), 'w') as fh:
+        fh.write('function add(a, b) {\n  return a + b;\n}\n')
+    with open(os.path.join(root, 'node_modules', 'dep', 'index.js'), 'w') as fh:
+        fh.write('module.exports = 1;\n')
+    with open(os.path.join(root, 'README.md'), 'w') as fh:
+        fh.write('# readme\n')
+
+
+def test_iter_source_files_skips_vendored_and_unknown(tmp_path):
+    _make_tree(str(tmp_path))
+    found = [(os.path.relpath(p, str(tmp_path)), lang) for p, lang in iter_source_files(str(tmp_path))]
+    assert found == [
+        ('app.js', 'javascript'),
+        (os.path.join('pkg', 'broken.py'), 'python'),
+        (os.path.join('pkg', 'mod.py'), 'python'),
+    ]
+
+
+def test_scan_directory_pool_matches_serial(tmp_path):
+    _make_tree(str(tmp_path))
+    serial = list(scan_directory(str(tmp_path), workers=1))
+    pooled = list(scan_directory(str(tmp_path), workers=2, chunksize=2))
+    assert serial == pooled
+
+    summary = ProjectSummary()
+    for result in pooled:
+        summary.add(result)
+    report = summary.to_dict()
+    assert report['files'] == 3
+    assert report['failed'] == 1
+    assert report['languages'] == {'javascript': 1, 'python': 2}
+    assert report['smells_by_kind']['unused_import'] == 1
+    assert len(report['worst_files']) == 2
@@ -0,0 +1,62 @@
+from code_quality_analyzer.result_cache import ResultCache, is_complete
+
+
+def test_key_covers_source_language_and_options():
+    key = ResultCache.make_key('x = 1', 'python', {'security': True}, 'abc')
+    assert key == ResultCache.make_key('x = 1', 'python', {'security': True}, 'abc')
+    assert key != ResultCache.make_key('x = 2', 'python', {'security': True}, 'abc')
+    assert key != ResultCache.make_key('x = 1', 'ruby', {'security': True}, 'abc')
+    assert key != ResultCache.make_key('x = 1', 'python', {'security': False}, 'abc')
+    assert key != ResultCache.make_key('x = 1', 'python', {'security': True}, 'def')
+
+
+def test_memory_lru_and_shared_disk_tier(tmp_path):
+    db_path = str(tmp_path / 'cache.sqlite')
+    cache = ResultCache(max_entries=1, db_path=db_path)
+    cache.put('a', {'score': 1})
+    cache.put('b', {'score': 2})
+    assert list(cache._memory) == ['b']
+    # 'a' fell out of memory but is still on disk
+    assert cache.get('a') == {'score': 1}
+
+    other_worker = ResultCache(max_entries=4, db_path=db_path)
+    assert other_worker.get('b') == {'score': 2}
+    assert other_worker.get('missing') is None
+
+
+def test_get_or_compute_skips_incomplete_results():
+    cache = ResultCache()
+    calls = []
+    compute = lambda: calls.append(1) or {'complexity': {'error': 'timed out'}}
+    cache.get_or_compute('k', compute, cacheable=is_complete)
+    cache.get_or_compute('k', compute, cacheable=is_complete)
+    assert len(calls) == 2
+
+
+def test_webapp_serves_repeat_submission_from_cache(monkeypatch):
+    from code_quality_analyzer import result_cache
+    from code_quality_analyzer.detectors import RuleBasedDetector
+    from code_quality_analyzer.webapp import create_app
+    monkeypatch.setattr(result_cache, '_RESULT_CACHE', ResultCache())
+    monkeypatch.setenv('MODEL_PATH', '/nonexistent/model.joblib')
+    calls = []
+    real = RuleBasedDetector.detect_all
+    monkeypatch.setattr(RuleBasedDetector, 'detect_all', lambda self, src: calls.append(1) or real(self, src))
+    client = create_app().test_client()
+    first = client.post('/api/analyze', json={'code': 'import os\nx = 1\n'}).get_json()
+    second = client.post('/api/analyze', json={'code': 'import os\nx = 1\n'}).get_json()
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_model_fingerprint_only_stamps_regular_files(tmp_path):
+    from code_quality_analyzer.result_cache import model_fingerprint
+    from code_quality_analyzer.webapp import create_app
+    model = tmp_path / 'model.joblib'
+    model.write_bytes(b'not a model')
+    assert model_fingerprint(str(model)) and model_fingerprint(str(model)) == model_fingerprint(str(model))
+    assert model_fingerprint(str(tmp_path)) is None
+    assert model_fingerprint(str(tmp_path / 'missing')) is None
+    resp = create_app().test_client().post('/api/analyze', json={'code': 'x = 1\n', 'model': str(tmp_path)})
+    assert resp.status_code == 200
+    assert 'error' in resp.get_json()['ml_classification']
@@ -0,0 +1,65 @@
+import io
+import json
+import sys
+
+from code_quality_analyzer import cli
+from code_quality_analyzer.sarif import SARIFWriter, iter_sarif
+
+
+def _record(path, **extra):
+    return dict({'file': path, 'language': 'python', 'smells': [], 'security': {'vulnerabilities': []},
+                 'complexity': {}}, **extra)
+
+
+def test_writer_maps_smells_security_and_complexity():
+    out = io.StringIO()
+    writer = SARIFWriter(out, root='/src')
+    writer.write(_record('/src/a.py', smells=[{'kind': 'long_line', 'message': 'too long', 'lineno': 3}]))
+    writer.write(_record('/src/pkg/b.py',
+                         security={'vulnerabilities': [
+                             {'test_id': 'B602', 'test_name': 'subprocess_popen_with_shell_equals_true',
+                              'severity': 'HIGH', 'confidence': 'HIGH', 'line': 7, 'message': 'shell=True'},
+                             {'test_name': 'Unsafe Eval', 'severity': 'LOW', 'line': 9, 'message': 'eval'}]},
+                         complexity={'cyclomatic': [
+                             {'name': 'ok', 'line': 1, 'complexity': 2, 'rank': 'A'},
+                             {'name': 'big', 'line': 20, 'complexity': 25, 'rank': 'D'}]}))
+    writer.write(_record('/src/c.py', error='SyntaxError: bad'))
+    writer.write({'root': '/src', 'summary': {'files': 3}})
+    writer.close()
+
+    run = json.loads(out.getvalue())['runs'][0]
+    rules = [rule['id'] for rule in run['tool']['driver']['rules']]
+    assert rules == ['smell/long_line', 'B602', 'security/unsafe-eval', 'complexity/cyclomatic']
+    found = [(r['ruleId'], r['level'], r['locations'][0]['physicalLocation']['artifactLocation']['uri'],
+              r['locations'][0]['physicalLocation']['region']['startLine']) for r in run['results']]
+    assert found == [
+        ('smell/long_line', 'warning', 'a.py', 3),
+        ('B602', 'error', 'pkg/b.py', 7),
+        ('security/unsafe-eval', 'note', 'pkg/b.py', 9),
+        ('complexity/cyclomatic', 'warning', 'pkg/b.py', 20),
+    ]
+    assert all(rules[r['ruleIndex']] == r['ruleId'] for r in run['results'])
+    assert run['originalUriBaseIds']['SRCROOT']['uri'] == 'file:///src/'
+    assert run['invocations'][0]['toolExecutionNotifications'][0]['message']['text'] == '/src/c.py: SyntaxError: bad'
+    assert run['properties']['summary'] == {'files': 3}
+
+
+def test_empty_and_failed_runs_are_valid_documents():
+    run = json.loads(''.join(iter_sarif([])))['runs'][0]
+    assert run['results'] == [] and run['tool']['driver']['rules'] == []
+    run = json.loads(''.join(iter_sarif([_record('a.py'), {'error': 'pool died'}])))['runs'][0]
+    assert run['invocations'][0]['executionSuccessful'] is False
+
+
+def test_cli_stream_stays_valid_when_the_model_fails(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'mod.py'
+    path.write_text('import os\n')
+    # A directory is no model: predicting with it raises
+    monkeypatch.setattr(sys, 'argv', ['cqa', 'analyze', '--file', str(path), '--model', str(tmp_path),
+                                      '--format', 'ndjson'])
+    cli.main()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert 'error' in record['ml_classification']
+    assert 'quality_score' in record
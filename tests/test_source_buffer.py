@@ -0,0 +1,23 @@
+from code_quality_analyzer.source_buffer import SourceBuffer
+
+
+def test_buffer_indexes_lines_once():
+    text = 'def f():\n    x = 1   \n\n  # note\n'
+    buffer = SourceBuffer(text)
+    assert buffer.lines == tuple(text.split('\n'))
+    assert [text[start:start + len(line)] for start, line in zip(buffer.line_starts, buffer.lines)] == list(buffer.lines)
+    assert list(buffer.indents) == [0, 4, 0, 2, 0]
+    assert buffer.stripped(1) == 'x = 1'
+    assert buffer.is_blank(2) and not buffer.is_blank(3)
+    assert list(buffer.comment_mask(('#',))) == [0, 0, 0, 1, 0]
+    assert buffer.line_count == len(text.splitlines())
+    assert SourceBuffer.of(buffer) is buffer
+
+
+def test_crlf_lines_match_splitlines_for_generic_analysis():
+    from code_quality_analyzer.detectors import RuleBasedDetector
+    text = 'fun main() {  \r\n' * 6 + 'x' * 130 + '\r\n'
+    smells = RuleBasedDetector()._generic_code_analysis(SourceBuffer(text), 'kotlin')
+    kinds = {s.kind: s for s in smells}
+    assert kinds['trailing_whitespace'].message == 'Found 6 lines with trailing whitespace'
+    assert kinds['long_line'].message == 'Line 7 exceeds 120 characters (130 chars)'
@@ -0,0 +1,25 @@
+from code_quality_analyzer.universal_complexity import UniversalComplexityAnalyzer
+
+
+def test_cyclomatic_counts_distinct_keywords_per_line():
+    code = (
+        'function first(a) {\n'
+        '  if (a && b || c) { return 1 } else if (a) { return 2 }\n'
+        '  for (x of y) { elsewhere(x) }\n'
+        '}\n'
+        'function second() {\n'
+        '  return 0\n'
+        '}\n'
+    )
+    results = UniversalComplexityAnalyzer('javascript').analyze(code)['cyclomatic']
+    # first: 1 + if/else (2) + && and || (2) + for (1)
+    assert [(r['name'], r['line'], r['complexity']) for r in results] == [('first', 1, 6), ('second', 5, 1)]
+
+
+def test_unknown_languages_use_the_cached_python_scanner():
+    code = 'def f(x):\n    if x:\n        return 1\n'
+    expected = UniversalComplexityAnalyzer('python').analyze(code)['cyclomatic']
+    size = len(UniversalComplexityAnalyzer._SCANNERS)
+    for i in range(20):
+        assert UniversalComplexityAnalyzer(f'made-up-{i}').analyze(code)['cyclomatic'] == expected
+    assert len(UniversalComplexityAnalyzer._SCANNERS) == size
@@ -0,0 +1,28 @@
+from code_quality_analyzer.universal_security import UniversalSecurityScanner
+
+
+def test_scan_reports_every_pattern_on_a_line():
+    code = 'x = 1\nPASSWORD = "hunter2"; os.system(cmd)\n\nresult = eval(data)\n'
+    report = UniversalSecurityScanner(language='python').scan(code)
+    found = sorted((v['test_name'], v['line']) for v in report['vulnerabilities'])
+    assert found == [
+        ('Command Injection', 2),
+        ('Hardcoded Credentials', 2),
+        ('Unsafe Eval', 4),
+    ]
+    assert report['vulnerabilities'][1]['code'] == 'PASSWORD = "hunter2"; os.system(cmd)'
+
+
+def test_scan_non_ascii_source_matches_case_insensitively():
+    code = '# café\nRuntime.EXEC(cmd)\n'
+    report = UniversalSecurityScanner(language='java').scan(code)
+    assert [(v['test_name'], v['line']) for v in report['vulnerabilities']] == [('Command Injection', 2)]
+
+
+def test_unknown_languages_share_one_cache_entry():
+    code = 'PASSWORD = "hunter2"\n'
+    UniversalSecurityScanner(language='made-up-0').scan(code)
+    size = len(UniversalSecurityScanner._COMPILED)
+    for i in range(1, 20):
+        assert UniversalSecurityScanner(language=f'made-up-{i}').scan(code)['vulnerabilities'] == []
+    assert len(UniversalSecurityScanner._COMPILED) == size